@@ -0,0 +1,52 @@
+"""add interaction_extraction checkpoints and interaction_rule unique key
+
+Revision ID: 4e6b0c2d8a71
+Revises: d3a7c5e19f08
+Create Date: 2026-10-19 17:42:11.906354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e6b0c2d8a71'
+down_revision: Union[str, None] = 'd3a7c5e19f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "interaction_extraction",
+        sa.Column("chunk_hash", sa.String(length=64), nullable=False),
+        sa.Column("prompt_version", sa.String(), nullable=False),
+        sa.Column("chunk_id", sa.Integer(), nullable=False),
+        sa.Column("a_rx_cui", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("rules_found", sa.Integer(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("chunk_hash", "prompt_version"),
+    )
+
+    # earlier runs checked for duplicates row by row; drop any that slipped through
+    op.execute("""
+        DELETE FROM interaction_rule r
+        USING interaction_rule d
+        WHERE r.a_rx_cui = d.a_rx_cui
+          AND r.b_rx_cui = d.b_rx_cui
+          AND md5(r.mechanism) = md5(d.mechanism)
+          AND r.id > d.id
+    """)
+    op.create_index(
+        "uq_interaction_rule_key", "interaction_rule",
+        ["a_rx_cui", "b_rx_cui", sa.text("md5(mechanism)")], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_interaction_rule_key", table_name="interaction_rule")
+    op.drop_table("interaction_extraction")
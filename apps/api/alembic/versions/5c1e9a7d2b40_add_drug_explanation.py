@@ -0,0 +1,41 @@
+"""add drug_explanation
+
+Revision ID: 5c1e9a7d2b40
+Revises: 33ec755a108a
+Create Date: 2026-10-19 10:12:41.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d2b40'
+down_revision: Union[str, None] = '33ec755a108a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "drug_explanation",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("rx_cui", sa.String(), nullable=False),
+        sa.Column("question_template", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("corpus_version", sa.String(), nullable=False),
+        sa.Column("response", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "rx_cui", "question_template", "model", "corpus_version",
+            name="uq_drug_explanation_key",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("drug_explanation")
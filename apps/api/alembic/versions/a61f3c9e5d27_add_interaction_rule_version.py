@@ -0,0 +1,50 @@
+"""add interaction_rule_version counter and trigger
+
+Revision ID: a61f3c9e5d27
+Revises: 4e6b0c2d8a71
+Create Date: 2026-10-19 19:08:37.214470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61f3c9e5d27'
+down_revision: Union[str, None] = '4e6b0c2d8a71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "interaction_rule_version",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.CheckConstraint("id = 1", name="ck_interaction_rule_version_single_row"),
+    )
+    op.execute("INSERT INTO interaction_rule_version (id, version) VALUES (1, 0)")
+
+    # every writer (extractor, backfills, manual SQL) moves the counter, once per statement
+    op.execute("""
+        CREATE FUNCTION bump_interaction_rule_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE interaction_rule_version SET version = version + 1 WHERE id = 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER interaction_rule_version_bump
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON interaction_rule
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_interaction_rule_version()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS interaction_rule_version_bump ON interaction_rule")
+    op.execute("DROP FUNCTION IF EXISTS bump_interaction_rule_version()")
+    op.drop_table("interaction_rule_version")
@@ -0,0 +1,94 @@
+"""store each interaction pair once, in canonical order
+
+Revision ID: c2d84e7b1f36
+Revises: a61f3c9e5d27
+Create Date: 2026-10-19 19:52:14.630118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2d84e7b1f36'
+down_revision: Union[str, None] = 'a61f3c9e5d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# keep in sync with services/interaction_graph.SEVERITY_RANK
+_RANK = """
+    CASE lower(trim(severity))
+        WHEN 'contraindicated' THEN 4
+        WHEN 'major' THEN 3
+        WHEN 'moderate' THEN 2
+        WHEN 'minor' THEN 1
+        ELSE 0
+    END
+"""
+
+
+def upgrade() -> None:
+    op.add_column("interaction_rule", sa.Column("severity_rank", sa.SmallInteger(), server_default="0", nullable=False))
+    op.add_column(
+        "interaction_rule",
+        sa.Column("evidence_ids", postgresql.ARRAY(sa.Integer()), server_default="{}", nullable=False),
+    )
+    op.execute(f"UPDATE interaction_rule SET severity_rank = {_RANK}")
+
+    op.drop_index("uq_interaction_rule_key", table_name="interaction_rule")
+    op.drop_index("ix_interaction_rule_a_rx_cui", table_name="interaction_rule")
+    op.drop_index("ix_interaction_rule_b_rx_cui", table_name="interaction_rule")
+
+    # one row per unordered pair: keep the most severe rule (then the oldest).
+    # Order is byte order (COLLATE "C"), the same as Python's str comparison
+    # used by the extractor, whatever the database collation.
+    op.execute("DELETE FROM interaction_rule WHERE a_rx_cui = b_rx_cui")
+    op.execute("""
+        DELETE FROM interaction_rule WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY LEAST(a_rx_cui COLLATE "C", b_rx_cui COLLATE "C"),
+                                 GREATEST(a_rx_cui COLLATE "C", b_rx_cui COLLATE "C")
+                    ORDER BY severity_rank DESC, id
+                ) AS rn
+                FROM interaction_rule
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.execute("""
+        UPDATE interaction_rule
+        SET a_rx_cui = b_rx_cui, b_rx_cui = a_rx_cui
+        WHERE a_rx_cui COLLATE "C" > b_rx_cui COLLATE "C"
+    """)
+
+    op.create_check_constraint(
+        "ck_interaction_rule_canonical", "interaction_rule", 'a_rx_cui COLLATE "C" < b_rx_cui COLLATE "C"',
+    )
+    # (a, b) and (b, a) lookups are both index-only scans that can order by severity
+    op.create_index(
+        "uq_interaction_rule_pair", "interaction_rule", ["a_rx_cui", "b_rx_cui"],
+        unique=True, postgresql_include=["severity_rank"],
+    )
+    op.create_index(
+        "ix_interaction_rule_b_a", "interaction_rule", ["b_rx_cui", "a_rx_cui"],
+        postgresql_include=["severity_rank"],
+    )
+
+
+def downgrade() -> None:
+    # merged rules are not restored
+    op.drop_index("ix_interaction_rule_b_a", table_name="interaction_rule")
+    op.drop_index("uq_interaction_rule_pair", table_name="interaction_rule")
+    op.drop_constraint("ck_interaction_rule_canonical", "interaction_rule", type_="check")
+    op.create_index("ix_interaction_rule_a_rx_cui", "interaction_rule", ["a_rx_cui"])
+    op.create_index("ix_interaction_rule_b_rx_cui", "interaction_rule", ["b_rx_cui"])
+    op.create_index(
+        "uq_interaction_rule_key", "interaction_rule",
+        ["a_rx_cui", "b_rx_cui", sa.text("md5(mechanism)")], unique=True,
+    )
+    op.drop_column("interaction_rule", "evidence_ids")
+    op.drop_column("interaction_rule", "severity_rank")
@@ -0,0 +1,41 @@
+"""add llm_response
+
+Revision ID: d3a7c5e19f08
+Revises: 8b2f4d61c9e3
+Create Date: 2026-10-19 16:21:05.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a7c5e19f08'
+down_revision: Union[str, None] = '8b2f4d61c9e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "llm_response",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("task", sa.String(), nullable=False),
+        sa.Column("provider", sa.String(), nullable=False),
+        sa.Column("model", sa.String(), nullable=False),
+        sa.Column("prompt_version", sa.String(), nullable=False),
+        sa.Column("response", sa.Text(), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("last_used_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index("ix_llm_response_last_used_at", "llm_response", ["last_used_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llm_response_last_used_at", table_name="llm_response")
+    op.drop_table("llm_response")
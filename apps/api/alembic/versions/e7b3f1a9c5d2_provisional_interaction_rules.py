@@ -0,0 +1,29 @@
+"""add interaction_rule.provisional for LLM-assessed pairs
+
+Revision ID: e7b3f1a9c5d2
+Revises: c2d84e7b1f36
+Create Date: 2026-10-19 21:42:10.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3f1a9c5d2'
+down_revision: Union[str, None] = 'c2d84e7b1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "interaction_rule",
+        sa.Column("provisional", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("interaction_rule", "provisional")
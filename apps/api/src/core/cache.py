@@ -1,18 +1,48 @@
 from typing import Any, Optional, Dict, Tuple
+from threading import Lock
 from time import time
 
-_TTL = 60 * 60  
-_STORE: Dict[str, Tuple[float, Any]] = {}
+_TTL = 60 * 60
+# key -> (fresh_until, stale_until, value)
+_STORE: Dict[str, Tuple[float, float, Any]] = {}
+_LOCK = Lock()
 
 def get_cached(key: str) -> Optional[Any]:
+    val, stale = get_cached_swr(key)
+    return None if stale else val
+
+def get_cached_swr(key: str) -> Tuple[Optional[Any], bool]:
+    """
+    Stale-while-revalidate lookup. Returns (value, is_stale); a stale value is
+    one past its TTL but still inside its stale window.
+    """
     now = time()
     hit = _STORE.get(key)
-    if not hit: return None
-    ts, val = hit
-    if now - ts > _TTL:
+    if not hit: return None, False
+    fresh_until, stale_until, val = hit
+    if now > stale_until:
         _STORE.pop(key, None)
-        return None
-    return val
+        return None, False
+    return val, now > fresh_until
+
+def set_cached(key: str, value: Any, ttl: Optional[float] = None, stale_ttl: float = 0) -> None:
+    """
+    ttl: seconds the value is fresh (defaults to one hour).
+    stale_ttl: extra seconds the value may still be served stale via get_cached_swr.
+    """
+    fresh_until = time() + (_TTL if ttl is None else ttl)
+    _STORE[key] = (fresh_until, fresh_until + stale_ttl, value)
+
+def add_cached(key: str, value: Any, ttl: Optional[float] = None) -> bool:
+    """
+    Set `key` only if it is not already present (memcached-style `add`).
+    Returns True if this call stored the value. Used for short-lived locks.
+    """
+    with _LOCK:
+        if get_cached(key) is not None:
+            return False
+        set_cached(key, value, ttl)
+        return True
 
-def set_cached(key: str, value: Any) -> None:
-    _STORE[key] = (time(), value)
+def delete_cached(key: str) -> None:
+    _STORE.pop(key, None)
@@ -14,7 +14,27 @@ class Settings(BaseSettings):
     database_url: str = Field(alias="DATABASE_URL")
 
     # LLM
-    llm_provider: Literal["gemini", "hf"] = Field(default="gemini", alias="LLM_PROVIDER")
+    llm_provider: Literal["gemini", "hf", "stub", "record", "replay"] = Field(default="gemini", alias="LLM_PROVIDER")
+
+    # LLM_PROVIDER=record/replay: where Gemini responses are stored, and what a replay miss does
+    llm_record_dir: str = Field(default="./llm_recordings", alias="LLM_RECORD_DIR")
+    llm_replay_miss: Literal["error", "stub"] = Field(default="error", alias="LLM_REPLAY_MISS")
+
+    # LLM_PROVIDER=stub: synthetic latency (median/mean ms, spread) and answer size
+    llm_stub_latency_dist: Literal["fixed", "uniform", "lognormal"] = Field(default="lognormal", alias="LLM_STUB_LATENCY_DIST")
+    llm_stub_latency_ms: float = Field(default=800.0, alias="LLM_STUB_LATENCY_MS")
+    llm_stub_latency_spread: float = Field(default=0.5, alias="LLM_STUB_LATENCY_SPREAD")
+    llm_stub_output_tokens: int = Field(default=200, alias="LLM_STUB_OUTPUT_TOKENS")
+    llm_stub_ms_per_token: float = Field(default=0.0, alias="LLM_STUB_MS_PER_TOKEN")
+    llm_stub_error_rate: float = Field(default=0.0, alias="LLM_STUB_ERROR_RATE")
+    llm_stub_seed: int = Field(default=0, alias="LLM_STUB_SEED")
+
+    # Durable LLM response store (table llm_response) in front of gemini/hf
+    llm_store_enabled: bool = Field(default=True, alias="LLM_STORE_ENABLED")
+    llm_store_max_mb: float = Field(default=256.0, alias="LLM_STORE_MAX_MB")
+    llm_store_prune_every: int = Field(default=500, alias="LLM_STORE_PRUNE_EVERY")
+    # bump to invalidate every stored response at once (per task: PROMPT_VERSIONS in providers.py)
+    llm_store_version: str = Field(default="v1", alias="LLM_STORE_VERSION")
 
     # Gemini
     gemini_api_key: Optional[str] = Field(default=None, alias="GEMINI_API_KEY")
@@ -22,6 +42,87 @@ class Settings(BaseSettings):
 
     # HF local
     hf_model: str = Field(default="mistralai/Mistral-7B-Instruct-v0.2", alias="HF_MODEL")
+    hf_quantize_int8: bool = Field(default=False, alias="HF_QUANTIZE_INT8")
+    hf_max_batch_size: int = Field(default=8, alias="HF_MAX_BATCH_SIZE")
+    hf_batch_wait_ms: int = Field(default=20, alias="HF_BATCH_WAIT_MS")
+    hf_max_new_tokens: int = Field(default=500, alias="HF_MAX_NEW_TOKENS")
+
+    # Dedicated threads for CPU-bound embedding on the async request path
+    embed_workers: int = Field(default=2, alias="EMBED_WORKERS")
+
+    # Bump when label chunks are re-ingested so precomputed answers are regenerated
+    corpus_version: str = Field(default="v1", alias="CORPUS_VERSION")
+
+    # LLM call deadlines, per-model circuit breakers and hedging
+    llm_deadline_s: float = Field(default=20.0, alias="LLM_DEADLINE_S")
+    llm_attempt_timeout_s: float = Field(default=12.0, alias="LLM_ATTEMPT_TIMEOUT_S")
+    llm_slow_call_s: float = Field(default=10.0, alias="LLM_SLOW_CALL_S")
+    llm_breaker_failures: int = Field(default=5, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_open_s: float = Field(default=30.0, alias="LLM_BREAKER_OPEN_S")
+    llm_hedging_enabled: bool = Field(default=False, alias="LLM_HEDGING_ENABLED")
+    llm_hedge_min_delay_s: float = Field(default=1.0, alias="LLM_HEDGE_MIN_DELAY_S")
+    llm_hedge_default_delay_s: float = Field(default=4.0, alias="LLM_HEDGE_DEFAULT_DELAY_S")
+
+    # Medication-overview prompt: citation token budgets and near-duplicate cutoff
+    med_context_total_tokens: int = Field(default=1200, alias="MED_CONTEXT_TOTAL_TOKENS")
+    med_context_per_drug_tokens: int = Field(default=240, alias="MED_CONTEXT_PER_DRUG_TOKENS")
+    med_context_min_snippet_tokens: int = Field(default=60, alias="MED_CONTEXT_MIN_SNIPPET_TOKENS")
+    med_context_dedupe_threshold: float = Field(default=0.8, alias="MED_CONTEXT_DEDUPE_THRESHOLD")
+
+    # Medication overview: per-drug summaries (rx_cui, model, corpus_version) and composed overviews
+    med_summary_cache_ttl_s: float = Field(default=24 * 60 * 60, alias="MED_SUMMARY_CACHE_TTL_S")
+    med_summary_concurrency: int = Field(default=4, alias="MED_SUMMARY_CONCURRENCY")
+    med_overview_memo_ttl_s: float = Field(default=60 * 60, alias="MED_OVERVIEW_MEMO_TTL_S")
+
+    # Postgres job queue (python -m src.services.jobs.worker)
+    job_worker_concurrency: int = Field(default=2, alias="JOB_WORKER_CONCURRENCY")
+    job_poll_interval_s: float = Field(default=1.0, alias="JOB_POLL_INTERVAL_S")
+    job_lease_s: float = Field(default=300.0, alias="JOB_LEASE_S")
+    job_max_attempts: int = Field(default=3, alias="JOB_MAX_ATTEMPTS")
+    # finished jobs are deleted after this long (the newest done job per key is kept)
+    job_retention_s: float = Field(default=24 * 60 * 60, alias="JOB_RETENTION_S")
+    # recompute the overview in the background whenever a medication is added/removed
+    overview_recompute_on_change: bool = Field(default=True, alias="OVERVIEW_RECOMPUTE_ON_CHANGE")
+
+    # Interaction extractor (python -m src.services.etl.interaction_from_labels): LLM calls in flight
+    interaction_extract_concurrency: int = Field(default=8, alias="INTERACTION_EXTRACT_CONCURRENCY")
+    # chunks packed into one prompt: label text token budget (0 = one chunk per call) and max chunks
+    interaction_batch_max_tokens: int = Field(default=3000, alias="INTERACTION_BATCH_MAX_TOKENS")
+    interaction_batch_max_chunks: int = Field(default=8, alias="INTERACTION_BATCH_MAX_CHUNKS")
+    # In-memory interaction graph: seconds between checks of interaction_rule_version
+    interaction_graph_check_s: float = Field(default=5.0, alias="INTERACTION_GRAPH_CHECK_S")
+    # POST /interactions: LLM assessment of pairs without a stored rule (stored as provisional rules)
+    interaction_assess_enabled: bool = Field(default=True, alias="INTERACTION_ASSESS_ENABLED")
+    interaction_assess_max_pairs: int = Field(default=6, alias="INTERACTION_ASSESS_MAX_PAIRS")
+    interaction_assess_context_tokens: int = Field(default=1500, alias="INTERACTION_ASSESS_CONTEXT_TOKENS")
+    # GET /me/interactions: seconds a user's cached med list is trusted (bounds staleness in other processes)
+    me_interactions_cache_ttl_s: float = Field(default=60.0, alias="ME_INTERACTIONS_CACHE_TTL_S")
+
+    # Pill labels: the local parser's result is used as-is at or above this confidence
+    pill_local_confidence_threshold: float = Field(default=0.8, alias="PILL_LOCAL_CONFIDENCE_THRESHOLD")
+    # /ai/parse-pill-labels: labels per request and concurrent LLM escalations per request
+    pill_batch_max_labels: int = Field(default=30, alias="PILL_BATCH_MAX_LABELS")
+    pill_batch_concurrency: int = Field(default=4, alias="PILL_BATCH_CONCURRENCY")
+    # Per-user fuzzy cache of parsed labels (SimHash over OCR tokens, max differing bits of 64)
+    pill_cache_enabled: bool = Field(default=True, alias="PILL_CACHE_ENABLED")
+    pill_cache_max_hamming: int = Field(default=5, alias="PILL_CACHE_MAX_HAMMING")
+    pill_cache_ttl_s: float = Field(default=24 * 60 * 60, alias="PILL_CACHE_TTL_S")
+    pill_cache_max_per_user: int = Field(default=50, alias="PILL_CACHE_MAX_PER_USER")
+
+    # Request coalescing (single-flight) for expensive LLM-backed endpoints
+    singleflight_timeout_s: float = Field(default=30.0, alias="SINGLEFLIGHT_TIMEOUT_S")
+    singleflight_lock_ttl_s: float = Field(default=60.0, alias="SINGLEFLIGHT_LOCK_TTL_S")
+
+    # /explain cache policy per outcome (seconds)
+    explain_cache_ttl_s: float = Field(default=60 * 60, alias="EXPLAIN_CACHE_TTL_S")
+    explain_cache_stale_s: float = Field(default=24 * 60 * 60, alias="EXPLAIN_CACHE_STALE_S")
+    explain_cache_empty_ttl_s: float = Field(default=5 * 60, alias="EXPLAIN_CACHE_EMPTY_TTL_S")
+    explain_cache_error_ttl_s: float = Field(default=30, alias="EXPLAIN_CACHE_ERROR_TTL_S")
+
+    # Semantic (paraphrase) cache for /explain questions
+    semantic_cache_enabled: bool = Field(default=True, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_threshold: float = Field(default=0.88, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_max_per_drug: int = Field(default=200, alias="SEMANTIC_CACHE_MAX_PER_DRUG")
 
     # JWT/ Auth
     JWT_SECRET_KEY: str = "change_me_in_env"   # override in .env
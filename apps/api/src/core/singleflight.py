@@ -0,0 +1,121 @@
+# apps/api/src/core/singleflight.py
+# Collapse concurrent calls for the same key into a single upstream computation.
+#
+# Within a worker, the first caller (the "leader") starts the computation as a
+# task and every concurrent caller awaits that same task. Across workers, the leader also
+# takes a short-lived lock in the shared cache and publishes its result there
+# for a few seconds, so other workers can pick it up instead of recomputing.
+
+import asyncio
+import logging
+import uuid
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache import add_cached, delete_cached, get_cached, set_cached
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# callers all run on the event loop; no lock needed, they never run concurrently
+_INFLIGHT_ASYNC: Dict[str, asyncio.Task] = {}
+# callers currently awaiting each in-flight task
+_WAITERS_ASYNC: Dict[str, int] = {}
+
+_RESULT_TTL = 10.0
+_POLL_INTERVAL = 0.1
+
+
+def _lock_key(key: str) -> str:
+    return f"singleflight:lock:{key}"
+
+
+def _result_key(key: str) -> str:
+    return f"singleflight:result:{key}"
+
+
+async def _run_as_leader_async(key: str, fn: Callable[[], Awaitable[Any]], timeout: float, lock_ttl: float) -> Any:
+    """
+    Take the cross-worker lock and compute. If another worker already holds
+    the lock, wait for its published result (up to `timeout`) and only compute
+    ourselves if it never shows up.
+    """
+    token = uuid.uuid4().hex
+    if not add_cached(_lock_key(key), token, ttl=lock_ttl):
+        deadline = monotonic() + timeout
+        while monotonic() < deadline:
+            published = get_cached(_result_key(key))
+            if published is not None:
+                return published
+            if get_cached(_lock_key(key)) is None:
+                break
+            await asyncio.sleep(_POLL_INTERVAL)
+        published = get_cached(_result_key(key))
+        if published is not None:
+            return published
+        logger.info("singleflight: no result from other worker for %s, computing", key)
+        add_cached(_lock_key(key), token, ttl=lock_ttl)
+
+    try:
+        result = await fn()
+        if result is not None:
+            set_cached(_result_key(key), result, ttl=_RESULT_TTL)
+        return result
+    finally:
+        if get_cached(_lock_key(key)) == token:
+            delete_cached(_lock_key(key))
+
+
+def _finish_async(key: str, task: "asyncio.Task") -> None:
+    if _INFLIGHT_ASYNC.get(key) is task:
+        _INFLIGHT_ASYNC.pop(key, None)
+        _WAITERS_ASYNC.pop(key, None)
+    if not task.cancelled():
+        # mark retrieved so an unobserved failure doesn't log "exception never retrieved"
+        task.exception()
+
+
+async def do_async(
+    key: str,
+    fn: Callable[[], Awaitable[Any]],
+    timeout: Optional[float] = None,
+    lock_ttl: Optional[float] = None,
+) -> Any:
+    """
+    Await `fn()` once per `key` among concurrent callers and return its
+    result to all of them. Followers wait at most `timeout` seconds for the
+    leader, then fall back to calling `fn` themselves. Exceptions raised by
+    the leader are re-raised in every follower.
+
+    The computation runs in its own task that every caller (the first one
+    included) awaits shielded, so a cancelled caller, e.g. a client that went
+    away, doesn't take the result away from the others; the task is only
+    cancelled when its last caller is.
+    """
+    timeout = settings.singleflight_timeout_s if timeout is None else timeout
+    lock_ttl = settings.singleflight_lock_ttl_s if lock_ttl is None else lock_ttl
+
+    task = _INFLIGHT_ASYNC.get(key)
+    leader = task is None or task.done()
+    if leader:
+        task = asyncio.ensure_future(_run_as_leader_async(key, fn, timeout, lock_ttl))
+        _INFLIGHT_ASYNC[key] = task
+        _WAITERS_ASYNC[key] = 0
+        task.add_done_callback(lambda t, key=key: _finish_async(key, t))
+    _WAITERS_ASYNC[key] += 1
+
+    try:
+        if leader:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("singleflight: timed out waiting for %s after %.1fs", key, timeout)
+            return await fn()
+    except asyncio.CancelledError:
+        if _INFLIGHT_ASYNC.get(key) is task and _WAITERS_ASYNC.get(key) == 1:
+            task.cancel()
+        raise
+    finally:
+        if _INFLIGHT_ASYNC.get(key) is task:
+            _WAITERS_ASYNC[key] -= 1
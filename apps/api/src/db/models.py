@@ -4,11 +4,16 @@
 # - drug
 # - interaction rule
 # - label chunk
+# - drug explanation (precomputed /explain answers)
+# - background job (Postgres-backed work queue, see services/jobs)
+# - llm response (durable LLM answer store, see services/llm/response_store.py)
+# - interaction extraction (extractor checkpoints, see services/etl/interaction_from_labels.py)
+# - interaction rule version (change counter for the in-memory graph, see services/interaction_graph.py)
 
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Integer, String, Column, DateTime, Text, func, ForeignKey
+from sqlalchemy import BigInteger, Boolean, CheckConstraint, Integer, SmallInteger, String, Column, DateTime, Text, func, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -26,18 +31,67 @@ class Drug(Base):
 
 
 class InteractionRule(Base):
+    """
+    One row per unordered drug pair, stored in canonical order
+    (a_rx_cui < b_rx_cui), so either direction is a single index lookup.
+    """
     __tablename__ = "interaction_rule"
+    __table_args__ = (
+        # byte order, same as Python str comparison (services/interaction_graph.pair_key)
+        CheckConstraint('a_rx_cui COLLATE "C" < b_rx_cui COLLATE "C"', name="ck_interaction_rule_canonical"),
+        # lets the extractor upsert with ON CONFLICT (a_rx_cui, b_rx_cui); both lookups are index-only
+        Index("uq_interaction_rule_pair", "a_rx_cui", "b_rx_cui", unique=True, postgresql_include=["severity_rank"]),
+        Index("ix_interaction_rule_b_a", "b_rx_cui", "a_rx_cui", postgresql_include=["severity_rank"]),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
 
-    # the two drugs involved in the interaction (stored by RxCUI or name for now)
-    a_rx_cui: Mapped[str] = mapped_column(String, index=True)
-    b_rx_cui: Mapped[str] = mapped_column(String, index=True)
+    # the two drugs involved in the interaction (RxCUI, or a class name such as "NSAIDs")
+    a_rx_cui: Mapped[str] = mapped_column(String)
+    b_rx_cui: Mapped[str] = mapped_column(String)
 
     severity: Mapped[str] = mapped_column(String)
+    # for ORDER BY: contraindicated 4, major 3, moderate 2, minor 1, anything else 0
+    severity_rank: Mapped[int] = mapped_column(SmallInteger, nullable=False, default=0, server_default="0")
     mechanism: Mapped[str] = mapped_column(Text)
     guidance: Mapped[str] = mapped_column(Text)
+    # label_chunk ids the rule was extracted from
+    evidence_ids: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False, default=[], server_default="{}")
+    # written by the /interactions LLM fallback (services/interaction_assessment.py)
+    # rather than extracted from a label; severity "none" records a pair assessed
+    # as not interacting. An extracted rule for the pair replaces it.
+    provisional: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False, server_default="false")
+
+
+class InteractionRuleVersion(Base):
+    """
+    Single-row counter bumped by a statement trigger on every write to
+    interaction_rule; API processes reload their interaction graph when it moves.
+    """
+    __tablename__ = "interaction_rule_version"
+    __table_args__ = (CheckConstraint("id = 1", name="ck_interaction_rule_version_single_row"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, default=1)
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class InteractionExtraction(Base):
+    """
+    Checkpoint of the interaction extractor (services/etl/interaction_from_labels.py):
+    one row per label chunk text and prompt version. Chunks with a "done" row
+    for the current version are skipped on the next run.
+    """
+    __tablename__ = "interaction_extraction"
 
+    chunk_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    prompt_version: Mapped[str] = mapped_column(String, primary_key=True)
+    chunk_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    a_rx_cui: Mapped[str] = mapped_column(String, nullable=False)
+    # done | failed
+    status: Mapped[str] = mapped_column(String, nullable=False)
+    rules_found: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    error: Mapped[str | None] = mapped_column(Text)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
 class LabelChunk(Base):
@@ -49,6 +103,78 @@ class LabelChunk(Base):
     chunk_text: Mapped[str] = mapped_column(Text)
 
 
+class DrugExplanation(Base):
+    """
+    Precomputed /explain responses for popular drugs, filled offline by
+    services/etl/precompute_explanations.py and read before calling the LLM.
+    """
+    __tablename__ = "drug_explanation"
+    __table_args__ = (
+        UniqueConstraint(
+            "rx_cui", "question_template", "model", "corpus_version",
+            name="uq_drug_explanation_key",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    rx_cui: Mapped[str] = mapped_column(String, nullable=False)
+    question_template: Mapped[str] = mapped_column(String, nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    corpus_version: Mapped[str] = mapped_column(String, nullable=False)
+    response: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class BackgroundJob(Base):
+    """
+    A unit of work for the job worker (python -m src.services.jobs.worker).
+    Workers claim queued rows with SELECT ... FOR UPDATE SKIP LOCKED. At most
+    one job per (kind, dedupe_key) can be queued at a time.
+    """
+    __tablename__ = "background_job"
+    __table_args__ = (
+        Index("ix_background_job_claim", "status", "run_after"),
+        Index(
+            "uq_background_job_queued", "kind", "dedupe_key",
+            unique=True, postgresql_where=text("status = 'queued'"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String, nullable=False)
+    dedupe_key: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False, default={})
+    # queued -> running -> done | failed (running jobs whose lease expires are requeued)
+    status: Mapped[str] = mapped_column(String, nullable=False, default="queued")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    result: Mapped[dict | None] = mapped_column(JSONB)
+    error: Mapped[str | None] = mapped_column(Text)
+    run_after: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_at: Mapped[str | None] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+
+class LLMResponse(Base):
+    """
+    One stored LLM answer, content-addressed by a hash of (provider, model,
+    system prompt, prompt, generation config, prompt version). Least recently
+    used rows are evicted once the table exceeds LLM_STORE_MAX_MB.
+    """
+    __tablename__ = "llm_response"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    task: Mapped[str] = mapped_column(String, nullable=False)
+    provider: Mapped[str] = mapped_column(String, nullable=False)
+    model: Mapped[str] = mapped_column(String, nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String, nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -11,14 +11,15 @@ SEED_DRUGS = [
     {"rx_cui": "723",  "generic_name": "amoxicillin", "brand_names": ["Amoxil"]},
 ]
 
+# pairs are stored in canonical order (a_rx_cui < b_rx_cui)
 SEED_RULES = [
     {
-        "a_rx_cui": "5640",
-        "b_rx_cui": "1191",
+        "a_rx_cui": "1191",
+        "b_rx_cui": "5640",
         "severity": "moderate",
+        "severity_rank": 2,
         "mechanism": "Ibuprofen may reduce aspirin’s antiplatelet effect.",
         "guidance": "Avoid routine co-use; if needed, separate dosing.",
-        "evidence_ids": ["d1", "d2"],
     }
 ]
 
@@ -1,5 +1,7 @@
 from contextlib import contextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from src.core.config import settings
 
@@ -17,3 +19,17 @@ def get_session():
 def get_db():
     with get_session() as db:
         yield db
+
+
+# ---------- async (asyncpg) for LLM-bound endpoints ----------
+
+def _async_url(url: str) -> str:
+    # same database, asyncpg driver: postgresql[+psycopg]://... -> postgresql+asyncpg://...
+    return make_url(url).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+async_engine = create_async_engine(_async_url(settings.database_url), pool_pre_ping=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False, autoflush=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -3,19 +3,19 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..core.security import decode_access_token
-from ..db.session import get_db
+from ..db.session import get_db, get_async_db
 from ..db.models import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+def _user_id_from_token(token: str):
     payload = decode_access_token(token)
     if payload is None or "sub" not in payload:
         raise HTTPException(
@@ -23,8 +23,10 @@ def get_current_user(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user_id = payload["sub"]
-    user: Optional[User] = db.query(User).filter(User.id == user_id).first()
+    return payload["sub"]
+
+
+def _require_user(user: Optional[User]) -> User:
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,3 +34,44 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     return user
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    user_id = _user_id_from_token(token)
+    user: Optional[User] = db.query(User).filter(User.id == user_id).first()
+    return _require_user(user)
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """Same as get_current_user, for async endpoints (asyncpg session)."""
+    user_id = _user_id_from_token(token)
+    user: Optional[User] = (
+        await db.execute(select(User).where(User.id == user_id))
+    ).scalars().first()
+    return _require_user(user)
+
+
+def get_admin_user(user: User = Depends(get_current_user)) -> User:
+    """get_current_user, restricted to role "admin" (operational/audit endpoints)."""
+    if user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin role required")
+    return user
+
+
+def get_optional_user_id(token: Optional[str] = Depends(optional_oauth2_scheme)) -> Optional[str]:
+    """
+    User id from the bearer token if one is sent and valid, else None. For
+    public endpoints that only personalise (e.g. per-user caching); no DB hit.
+    """
+    if not token:
+        return None
+    payload = decode_access_token(token)
+    if payload is None or "sub" not in payload:
+        return None
+    return str(payload["sub"])
@@ -1,13 +1,38 @@
 from fastapi import FastAPI
-from src.routers import health, drug, explain, interactions, auth, medications, med_overview, pill_label
+from src.routers import health, drug, explain, interactions, auth, medications, med_overview, me_interactions, pill_label, metrics
 from fastapi.middleware.cors import CORSMiddleware
+from src.core.config import settings
 
 # these modules live in src/routers/
 from src.routers.drugs import router as drugs_router  # <-- new line
 
 app = FastAPI()
 
+
+@app.on_event("startup")
+def load_local_llm():
+    # load the local model once per worker instead of on the first request
+    if settings.llm_provider == "hf":
+        from src.services.llm.hf_runtime import warm_up
+        warm_up()
+
+
+@app.on_event("startup")
+def load_rxcui_index():
+    # drug name -> RxCUI lookups for /interactions; an unreachable DB leaves it empty and retried later
+    from src.services.retrieval.rxcui_index import get_rxcui_index
+    get_rxcui_index()
+
+
+@app.on_event("startup")
+def load_interaction_graph():
+    # all interaction rules in memory for /interactions; reloaded when interaction_rule_version moves
+    from src.services.interaction_graph import get_interaction_graph
+    get_interaction_graph()
+
+
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(drug.router)
 app.include_router(explain.router)
 app.include_router(interactions.router)
@@ -17,6 +42,7 @@ app.include_router(drugs_router)
 app.include_router(auth.router)
 app.include_router(medications.router)
 app.include_router(med_overview.router)
+app.include_router(me_interactions.router)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
@@ -1,83 +1,173 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.exc import SQLAlchemyError
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+import asyncio
+import json
 import logging
 
-from src.schemas.explain import ExplainRequest, ExplainResponse, Citation
-from src.services.retrieval.retrieve import retrieve_with_citations
-from src.services.llm.explainer import explain_with_llm
-from src.core.cache import get_cached, set_cached
+from src.schemas.explain import ExplainRequest, ExplainResponse
+from src.services.explanation_service import (
+    build_response,
+    current_model,
+    db_error_response,
+    empty_response,
+    generate_explanation_async,
+    get_precomputed_async,
+    retrieval_query,
+    rx_cui_from_drug_id,
+    save_precomputed_async,
+)
+from src.services.llm import metrics, semantic_cache
+from src.services.llm.explainer import stream_explain_with_llm, parse_explain_output
+from src.services.llm.json_stream import ArrayStringStream
+from src.services.retrieval.retrieve import retrieve_with_citations_async
+from src.services.etl.embed import EMBED_EXECUTOR
+from src.db.session import AsyncSessionLocal
+from src.core.cache import get_cached_swr, set_cached, add_cached, delete_cached
 from src.core.config import settings
+from src.core import singleflight
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/explain", tags=["Explain"])
 
 
+def _cache_policy(outcome: str) -> dict:
+    """
+    TTLs per outcome. Good answers live long and may be served stale while a
+    background refresh runs; errors and empty results expire quickly so a
+    transient outage is not pinned in the cache.
+    """
+    if outcome == "ok":
+        return {"ttl": settings.explain_cache_ttl_s, "stale_ttl": settings.explain_cache_stale_s}
+    if outcome == "empty":
+        return {"ttl": settings.explain_cache_empty_ttl_s, "stale_ttl": 0}
+    return {"ttl": settings.explain_cache_error_ttl_s, "stale_ttl": 0}
+
+
+def _cache_key(drug_id: str, q: str) -> str:
+    return f"explain:v3:{settings.llm_provider}:{current_model()}:{drug_id}:{q or '_'}"
+
+
+def _semantic_scope(drug_id: str) -> str:
+    return f"{settings.llm_provider}:{current_model()}:{drug_id}"
+
+
+async def _in_embed_pool(fn, *args):
+    # semantic-cache lookups/stores embed the question; keep that off the event loop
+    return await asyncio.get_running_loop().run_in_executor(EMBED_EXECUTOR, fn, *args)
+
+
+async def _load_precomputed(drug_id: str):
+    rx_cui = await asyncio.to_thread(rx_cui_from_drug_id, drug_id)
+    if not rx_cui:
+        return None
+    try:
+        async with AsyncSessionLocal() as db:
+            return await get_precomputed_async(db, rx_cui)
+    except SQLAlchemyError as e:
+        logger.warning("drug_explanation lookup failed, falling back to LLM: %s", e)
+        return None
+
+
+async def _store_precomputed(drug_id: str, resp: dict) -> None:
+    rx_cui = await asyncio.to_thread(rx_cui_from_drug_id, drug_id)
+    if not rx_cui:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            await save_precomputed_async(db, rx_cui, resp)
+    except SQLAlchemyError as e:
+        logger.warning("drug_explanation write-through failed: %s", e)
+
+
+async def _remember(drug_id: str, q: str, cache_key: str, resp: dict, outcome: str, refresh: bool = False) -> None:
+    # a failed background refresh keeps the stale good answer instead of replacing it
+    if outcome == "ok" or not refresh:
+        set_cached(cache_key, resp, **_cache_policy(outcome))
+    if outcome == "ok":
+        if q:
+            await _in_embed_pool(semantic_cache.store, _semantic_scope(drug_id), q, resp)
+        else:
+            # share key-facts answers with other workers and future deploys
+            await _store_precomputed(drug_id, resp)
+
+
+async def _lookup(drug_id: str, q: str, cache_key: str) -> Tuple[Optional[Dict], bool]:
+    """
+    Everything we can answer without calling the LLM, cheapest first.
+    Returns (response or None, is_stale).
+    """
+    cached, stale = get_cached_swr(cache_key)
+    metrics.cache_lookup("explain", bool(cached))
+    if cached:
+        return cached, stale
+
+    # Key-facts calls for popular drugs are precomputed offline
+    if not q:
+        precomputed = await _load_precomputed(drug_id)
+        metrics.cache_lookup("explain_precomputed", bool(precomputed))
+        if precomputed:
+            resp = {**precomputed, "drugId": drug_id}
+            set_cached(cache_key, resp, **_cache_policy("ok"))
+            return resp, False
+
+    # Paraphrases of an already-answered question reuse its answer
+    if q:
+        similar = await _in_embed_pool(semantic_cache.lookup, _semantic_scope(drug_id), q)
+        metrics.cache_lookup("explain_semantic", bool(similar))
+        if similar:
+            return {**similar, "question": q}, False
+
+    return None, False
+
+
+async def _build_explanation(drug_id: str, q: str, cache_key: str, refresh: bool = False):
+    """
+    Retrieve context, call the LLM and cache the response. Runs once per
+    cache_key among concurrent requests (see core.singleflight).
+    """
+    resp, outcome = await generate_explanation_async(drug_id, q)
+    await _remember(drug_id, q, cache_key, resp, outcome, refresh)
+    return resp
+
+
+async def _refresh_explanation(drug_id: str, q: str, cache_key: str) -> None:
+    """
+    Background revalidation of a stale entry, for both /explain and
+    /explain/stream. Only one refresh per key runs at a time; the stale value
+    keeps being served until it lands.
+    """
+    refresh_key = f"refresh:{cache_key}"
+    if not add_cached(refresh_key, True, ttl=settings.singleflight_lock_ttl_s):
+        return
+    try:
+        await singleflight.do_async(cache_key, lambda: _build_explanation(drug_id, q, cache_key, refresh=True))
+    except Exception as e:
+        logger.exception("Background refresh failed for %s: %s", cache_key, e)
+    finally:
+        delete_cached(refresh_key)
+
+
 @router.post("", response_model=ExplainResponse)
-def explain(payload: ExplainRequest):
+async def explain(payload: ExplainRequest, background_tasks: BackgroundTasks):
     try:
         drug_id = (payload.drugId or "").strip()
         if not drug_id:
             raise HTTPException(status_code=400, detail="drugId is required")
         q = (payload.question or "").strip()
 
-        cache_key = (
-            f"explain:v3:{settings.llm_provider}:"
-            f"{(settings.gemini_model if settings.llm_provider=='gemini' else settings.hf_model)}:"
-            f"{drug_id}:{q or '_'}"
-        )
-        cached = get_cached(cache_key)
-        if cached:
-            return cached
-
-        retrieval_query = q if q else f"key facts and warnings about {drug_id}"
-        try:
-            retrieved = retrieve_with_citations(retrieval_query, k=4)
-            citations = retrieved.get("citations", [])
-        except SQLAlchemyError as e:
-            # Log the real DB error and surface it to the client for debugging
-            logger.exception("DB error in retrieve_with_citations: %s", e)
-            msg = f"Database error: {type(e).__name__}: {e}"
-            resp = ExplainResponse(
-                drugId=drug_id,
-                question=q or None,
-                summary=[
-                    msg,
-                    "Check that the label_chunk table exists and pgvector is configured."
-                ],
-                citations=[],
-            ).model_dump()
-            set_cached(cache_key, resp)
-            return JSONResponse(resp, status_code=200)
-
-        if not citations:
-            # No DB error; just no chunks found
-            resp = ExplainResponse(
-                drugId=drug_id,
-                question=q or None,
-                summary=[f"No context available for '{drug_id}'. Try loading chunks first."],
-                citations=[],
-            ).model_dump()
-            set_cached(cache_key, resp)
-            return resp
-
-        llm = explain_with_llm(drug_id, q, citations)
-        keep = citations
-        if llm.get("used_ids"):
-            idx = {c["id"]: c for c in citations}
-            sel = [idx[i] for i in llm["used_ids"] if i in idx]
-            if sel:
-                keep = sel
-
-        resp = ExplainResponse(
-            drugId=drug_id,
-            question=q or None,
-            summary=(llm.get("bullets") or [f"{drug_id}: explanation unavailable from current context."]),
-            citations=[Citation(**c) for c in keep],
-        ).model_dump()
-        set_cached(cache_key, resp)
-        return resp
+        cache_key = _cache_key(drug_id, q)
+        found, stale = await _lookup(drug_id, q, cache_key)
+        if found:
+            if stale:
+                background_tasks.add_task(_refresh_explanation, drug_id, q, cache_key)
+            return found
+
+        return await singleflight.do_async(cache_key, lambda: _build_explanation(drug_id, q, cache_key))
 
     except HTTPException:
         raise
@@ -94,3 +184,95 @@ def explain(payload: ExplainRequest):
             },
             status_code=500
         )
+
+
+# ---------------- Server-Sent Events ----------------
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _replay_events(resp: Dict) -> Iterator[str]:
+    """Stream an already-complete response using the same event sequence."""
+    yield _sse("citations", resp.get("citations") or [])
+    for i, bullet in enumerate(resp.get("summary") or []):
+        yield _sse("bullet", {"index": i, "text": bullet})
+    yield _sse("done", resp)
+
+
+async def _stream_events(drug_id: str, q: str, cache_key: str) -> AsyncIterator[str]:
+    try:
+        retrieved = await retrieve_with_citations_async(retrieval_query(drug_id, q), k=4)
+        citations = retrieved.get("citations", [])
+    except SQLAlchemyError as e:
+        resp = db_error_response(drug_id, q, e)
+        await _remember(drug_id, q, cache_key, resp, "error")
+        for event in _replay_events(resp):
+            yield event
+        return
+
+    if not citations:
+        resp = empty_response(drug_id, q)
+        await _remember(drug_id, q, cache_key, resp, "empty")
+        for event in _replay_events(resp):
+            yield event
+        return
+
+    # 1. citations right after retrieval
+    yield _sse("citations", citations)
+
+    # 2. each bullet as soon as the model closes its string
+    parser = ArrayStringStream("bullets")
+    chunks = []
+    sent = 0
+    try:
+        # provider streaming is blocking; pull chunks on a worker thread
+        async for text in iterate_in_threadpool(stream_explain_with_llm(drug_id, q, citations)):
+            chunks.append(text)
+            for bullet in parser.feed(text):
+                yield _sse("bullet", {"index": sent, "text": bullet})
+                sent += 1
+    except Exception as e:
+        logger.exception("Streaming LLM call failed for %s: %s", cache_key, e)
+        yield _sse("error", {"message": f"{type(e).__name__}: {e}"})
+        return
+
+    # 3. final result with the used-citation mapping
+    llm = parse_explain_output("".join(chunks))
+    resp, outcome = build_response(drug_id, q, citations, llm)
+    for i, bullet in enumerate(resp["summary"][sent:], start=sent):
+        yield _sse("bullet", {"index": i, "text": bullet})
+    await _remember(drug_id, q, cache_key, resp, outcome)
+    yield _sse("done", resp)
+
+
+@router.post("/stream")
+async def explain_stream(payload: ExplainRequest):
+    """
+    SSE variant of /explain. Events, in order:
+      citations  – retrieved citations, sent as soon as retrieval finishes
+      bullet     – {"index", "text"} for each bullet as the model completes it
+      done       – the full ExplainResponse (summary, used citations, usedCitationIds)
+      error      – {"message"} if the LLM call fails mid-stream
+    Cached and precomputed answers are replayed with the same events.
+    """
+    drug_id = (payload.drugId or "").strip()
+    if not drug_id:
+        raise HTTPException(status_code=400, detail="drugId is required")
+    q = (payload.question or "").strip()
+
+    cache_key = _cache_key(drug_id, q)
+    found, stale = await _lookup(drug_id, q, cache_key)
+    if found:
+        events = _replay_events(found)
+        background = BackgroundTask(_refresh_explanation, drug_id, q, cache_key) if stale else None
+    else:
+        events = _stream_events(drug_id, q, cache_key)
+        background = None
+
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
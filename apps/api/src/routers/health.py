@@ -1,7 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel
 from time import perf_counter
 from src.core.config import settings
-from src.services.llm.explainer import explain_with_llm
+from src.services.llm.explainer import explain_with_llm_async
+from src.services.explanation_service import current_model
+from src.services.interaction_graph import get_interaction_graph
+from src.services.llm import label_cache, metrics, semantic_cache, resilience
+from src.dependencies.users import get_admin_user
 
 router = APIRouter(prefix="/health", tags=["Health"])
 
@@ -10,10 +15,10 @@ def health_root():
     return {"ok": True, "provider": settings.llm_provider}
 
 @router.get("/llm")
-def health_llm():
+async def health_llm():
     t0 = perf_counter()
     try:
-        resp = explain_with_llm(
+        resp = await explain_with_llm_async(
             "metformin",
             "key facts",
             [{"id":1,"snippet":"Metformin helps lower blood glucose.","section":"overview","rx_cui":"6809"}]
@@ -23,5 +28,41 @@ def health_llm():
     except Exception as e:
         ok, err = False, str(e)
     dt = int((perf_counter() - t0) * 1000)
-    model = settings.gemini_model if settings.llm_provider=="gemini" else settings.hf_model
-    return {"provider": settings.llm_provider, "model": model, "ok": ok, "latency_ms": dt, "error": err}
+    return {"provider": settings.llm_provider, "model": current_model(), "ok": ok, "latency_ms": dt, "error": err}
+
+@router.get("/llm/breakers")
+def health_llm_breakers():
+    """Per-model circuit breaker state, timeouts and hedging counters."""
+    return resilience.stats()
+
+@router.get("/llm/metrics")
+def health_llm_metrics():
+    """Latency histograms, token counts, fallbacks, JSON failures and cache hits (JSON view of /metrics)."""
+    return metrics.snapshot()
+
+@router.get("/semantic-cache")
+def health_semantic_cache():
+    return semantic_cache.stats()
+
+@router.get("/pill-cache")
+def health_pill_cache():
+    return label_cache.stats()
+
+@router.get("/interaction-graph")
+def health_interaction_graph():
+    return get_interaction_graph().stats()
+
+class FalseHitIn(BaseModel):
+    drugId: str
+    question: str
+
+@router.post("/semantic-cache/false-hit", dependencies=[Depends(get_admin_user)])
+def report_semantic_false_hit(payload: FalseHitIn):
+    """
+    Audit hook: flag a semantic-cache hit that returned the wrong answer.
+    Counts it and evicts the stored entry it matched. Admins only, since it
+    evicts cached answers.
+    """
+    scope = f"{settings.llm_provider}:{current_model()}:{payload.drugId.strip()}"
+    evicted = semantic_cache.report_false_hit(scope, payload.question)
+    return {"evicted": evicted, "false_hits": semantic_cache.stats()["false_hits"]}
@@ -1,9 +1,16 @@
+import asyncio
+from itertools import combinations
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from ..db.base import get_db
-from ..db.models import InteractionRule
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, List, Optional
+from ..core.config import settings
+from ..db.models import LabelChunk
+from ..db.session import get_async_db
+from ..services.interaction_assessment import assess_pairs
+from ..services.interaction_graph import NO_INTERACTION, Rule, get_interaction_graph, get_interaction_graph_async
+from ..services.retrieval.rxcui_index import RxCuiIndex, get_rxcui_index
 
 
 router = APIRouter()
@@ -15,60 +22,90 @@ class DrugIn(BaseModel):
 class InteractionsIn(BaseModel):
     drugs: List[DrugIn]
 
+
+def _rx_cui(index: RxCuiIndex, d: DrugIn) -> str:
+    # ids are usually "rxn:<rxcui>"; a drug name in id or name is resolved through the catalog index
+    return index.resolve(d.id) or index.resolve(d.name or "") or d.id.replace("rxn:", "").strip()
+
+
+def _interaction(rule: Rule) -> dict:
+    if rule.provisional:
+        confidence = {"score": 0.5, "rationale": "LLM assessment of label text, not yet a curated rule"}
+    else:
+        confidence = {"score": 0.7, "rationale": "seed rule"}
+    return {
+        "pair": [{"id": f"rxn:{rule.a_rx_cui}"}, {"id": f"rxn:{rule.b_rx_cui}"}],
+        "severity": rule.severity,
+        "mechanism": rule.mechanism,
+        "guidance": rule.guidance,
+        "confidence": confidence,
+        "provisional": rule.provisional,
+        "evidenceIds": [f"chunk:{i}" for i in rule.evidence_ids],
+    }
+
+
+async def _citations(db: AsyncSession, rules: Iterable[Rule]) -> List[dict]:
+    """The label chunks behind the rules' evidenceIds, in id order."""
+    ids = sorted({i for r in rules for i in r.evidence_ids})
+    if not ids:
+        return []
+    rows = (await db.execute(
+        select(LabelChunk.id, LabelChunk.rx_cui, LabelChunk.section, LabelChunk.chunk_text)
+        .where(LabelChunk.id.in_(ids))
+        .order_by(LabelChunk.id)
+    )).all()
+    return [
+        {
+            "id": f"chunk:{chunk_id}",
+            "source": "DailyMed",
+            "rx_cui": rx_cui,
+            "section": section,
+            "snippet": (chunk_text or "")[:450],
+        }
+        for chunk_id, rx_cui, section, chunk_text in rows
+    ]
+
+
 @router.post("/interactions")
-def interactions(payload: InteractionsIn, db: Session = Depends(get_db)):
+async def interactions(payload: InteractionsIn, db: AsyncSession = Depends(get_async_db)):
     if len(payload.drugs) < 2:
         return {"error": "Need at least 2 drugs"}
     
-    rx_ids = [d.id.replace("rxn:", "").strip() for d in payload.drugs]
-
-    rule = (db.query(InteractionRule).filter(InteractionRule.a_rx_cui.in_(rx_ids),
-                                             InteractionRule.b_rx_cui.in_(rx_ids)).first())
-    if rule:
-        # found a db backed rule, return it to frontend
-        return {
-            "normalized": [{"id": f"rxn:{i}"} for i in rx_ids],
-            "interactions": [
-                {
-                    "pair": [{"id": f"rxn:{rule.a_rx_cui}"}, {"id": f"rxn:{rule.b_rx_cui}"}],
-                    "severity": rule.severity,
-                    "mechanism": rule.mechanism,
-                    "guidance": rule.guidance,
-                    "confidence": {"score": 0.7, "rationale": "seed rule"},
-                    "evidenceIds": rule.evidence_ids or [],
-                }
-            ],
-            "citations": [{"id": "d1", "source": "DailyMed", "section": "Drug Interactions", "snippet": "..."}],
-            "disclaimer": "Educational use only. Not medical advice.",
-        }
-    # no db rule found, return mock response
+    # the index (re)loads from the Drug table; keep that off the event loop
+    index = await asyncio.to_thread(get_rxcui_index)
+    rx_ids = [_rx_cui(index, d) for d in payload.drugs]
+
+    # every interacting pair in the list (either direction), most severe first
+    graph = await get_interaction_graph_async()
+    found = [r.facing(a) for a, _, rules in graph.pairs_among(rx_ids) for r in rules]
+
+    # pairs of catalog drugs with no rule yet: ask the LLM once per pair (stored as a provisional rule)
+    if settings.interaction_assess_enabled:
+        catalog = index.rx_cuis
+        unknown = [
+            (a, b) for a, b in combinations(sorted(set(rx_ids)), 2)
+            if a in catalog and b in catalog and not graph.known(a, b)
+        ]
+        if unknown:
+            assessed = [r for r in await assess_pairs(unknown) if r.severity != NO_INTERACTION]
+            found = sorted(found + assessed, key=lambda r: -r.rank)
+
     return {
         "normalized": [{"id": f"rxn:{i}"} for i in rx_ids],
-        "interactions": [
-            {
-                "pair": [{"id": "rxn:5640", "name": "ibuprofen"}, {"id": "rxn:1191", "name": "aspirin"}],
-                "severity": "moderate",
-                "mechanism": "Ibuprofen may reduce aspirin’s antiplatelet effect.",
-                "guidance": "Avoid routine co-use; separate dosing if needed.",
-                "confidence": {"score": 0.5, "rationale": "mock fallback"},
-                "evidenceIds": ["d1", "d2"],
-            }
-        ],
-        "citations": [{"id": "d1", "source": "DailyMed", "section": "Drug Interactions", "snippet": "..."}],
+        "interactions": [_interaction(r) for r in found],
+        "citations": await _citations(db, found),
         "disclaimer": "Educational use only. Not medical advice.",
     }
 
 @router.get("/interactions/{rx_cui}")
-def get_interactions_for_drug(rx_cui: str, db: Session = Depends(get_db)):
+def get_interactions_for_drug(rx_cui: str):
     """
-    Return all interaction rules where this drug is the 'source' (a_rx_cui).
+    Return all interaction rules involving this drug, as either side of the
+    stored rule, with it as a_rx_cui; most severe first.
     Used by your Next.js interactions page.
     """
-    rules = (
-        db.query(InteractionRule)
-        .filter(InteractionRule.a_rx_cui == rx_cui)
-        .all()
-    )
+    rx_cui = get_rxcui_index().resolve(rx_cui) or rx_cui
+    rules = get_interaction_graph().for_drug(rx_cui)
 
     # FastAPI will JSON-encode whatever we return.
     return [
@@ -81,4 +118,4 @@ def get_interactions_for_drug(rx_cui: str, db: Session = Depends(get_db)):
             "guidance": r.guidance,
         }
         for r in rules
-    ]
\ No newline at end of file
+    ]
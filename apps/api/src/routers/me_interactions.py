@@ -0,0 +1,21 @@
+# apps/api/src/routers/me_interactions.py
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.session import get_async_db
+from ..db import models
+from ..dependencies.users import get_current_user_async
+from ..schemas.interactions import UserInteractionsResponse
+from ..services.med_interactions_service import user_interactions
+
+router = APIRouter(prefix="/me", tags=["interactions"])
+
+
+@router.get("/interactions", response_model=UserInteractionsResponse)
+async def get_my_interactions(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+) -> UserInteractionsResponse:
+    # every interacting pair in the user's medication list, with the severity summary
+    return await user_interactions(db, current_user.id)
@@ -1,118 +1,92 @@
 # apps/api/src/routers/med_overview.py
 
 from typing import List, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db.session import get_db
+from ..db.session import get_async_db
 from ..db import models
-from ..schemas.med_overview import MedListOverviewResponse, MedOverviewCitation
-from ..services.llm.explainer import explain_med_list_with_llm
-from ..services.retrieval.retrieve import retrieve_with_citations
-from ..dependencies.users import get_current_user  
+from ..schemas.med_overview import MedListOverviewResponse, OverviewJobOut
+from ..services.med_overview_service import (
+    OVERVIEW_JOB,
+    build_overview,
+    cached_overview,
+    empty_overview,
+    load_med_list,
+    med_list_fingerprint,
+    overview_job_key,
+)
+from ..services.jobs import queue
+from ..dependencies.users import get_current_user_async
+from ..core import singleflight
 
 router = APIRouter(prefix="/me/medications", tags=["medications"])
 
 
-@router.get("/overview", response_model=MedListOverviewResponse)
-def get_med_list_overview(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+@router.get(
+    "/overview",
+    response_model=MedListOverviewResponse,
+    responses={202: {"model": OverviewJobOut, "description": "Queued; poll the job"}},
+)
+async def get_med_list_overview(
+    background: bool = Query(
+        default=False,
+        description="Return 202 with a job id instead of computing in the request when nothing is ready",
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
 ) -> MedListOverviewResponse:
 
-    # 1. Get user meds
-    user_meds: List[models.UserMedication] = (
-        db.query(models.UserMedication)
-        .filter(models.UserMedication.user_id == current_user.id)
-        .all()
-    )
-
-    # 2. If none → simple fallback
-    if not user_meds:
-        return MedListOverviewResponse(
-            overview_bullets=[
-                "We couldn't find any medications on your profile yet.",
-                "Add medications to your tracker to see an overview here.",
-            ],
-            per_drug=[],
-            citations=[],
-            used_citation_ids=[],
-        )
-
-    # 3. Build med list & citations
-    med_list: List[Dict[str, Any]] = []
-    all_citations: List[Dict[str, Any]] = []
-    citation_id_counter = 1
-
-    for med in user_meds:
-        med_entry = {
-            "id": med.id,
-            "name": med.display_name or med.rx_cui,
-            "rx_cui": med.rx_cui,
-        }
-        med_list.append(med_entry)
-
-        retrieval = retrieve_with_citations(med_entry["name"], k=3)
-        for c in retrieval.get("citations", []):
-            all_citations.append({
-                "id": citation_id_counter,
-                "rx_cui": c.get("rx_cui"),
-                "section": c.get("section"),
-                "source_url": c.get("source_url"),
-                "snippet": c.get("snippet") or "",
-                "drug_name": med_entry["name"],
-            })
-            citation_id_counter += 1
-
-    # 4. Call LLM to generate summaries
-    llm_result = explain_med_list_with_llm(med_list, all_citations)
-
-    overview_bullets = llm_result.get("overview_bullets") or []
-    per_drug_raw = llm_result.get("per_drug") or []
-    used_ids = set(llm_result.get("used_citation_ids") or [])
-
-    # 5. Normalize per-drug section
-    per_drug = []
-    for entry in per_drug_raw:
-        med_id = entry.get("medication_id")
-        name = entry.get("name")
-
-        if not med_id and name:
-            for m in med_list:
-                if m["name"].lower() == name.lower():
-                    med_id = m["id"]
-                    break
-
-        if not med_id:
-            continue
-
-        rx_cui = next((m["rx_cui"] for m in med_list if m["id"] == med_id), None)
-
-        per_drug.append({
-            "medication_id": med_id,
-            "name": name or f"Medication {med_id}",
-            "rx_cui": rx_cui,
-            "summary": entry.get("summary") or "",
-            "used_citation_ids": entry.get("used_citation_ids") or [],
-        })
-
-    # 6. Build citations list
-    citations_for_response = [
-        MedOverviewCitation(
-            id=c["id"],
-            rxCui=c.get("rx_cui"),
-            section=c.get("section"),
-            sourceUrl=c.get("source_url"),
-            snippet=c.get("snippet") or "",
-            used=(c["id"] in used_ids),
+    # 1-3. Get user meds as a plain list
+    med_list: List[Dict[str, Any]] = await load_med_list(db, current_user.id)
+
+    # If none → simple fallback
+    if not med_list:
+        return empty_overview()
+
+    fingerprint = med_list_fingerprint(med_list)
+
+    if background:
+        ready = cached_overview(med_list)
+        if ready:
+            return ready
+        job_key = overview_job_key(current_user.id)
+        done = await queue.latest_done(db, OVERVIEW_JOB, job_key)
+        if done and (done.result or {}).get("fingerprint") == fingerprint:
+            return MedListOverviewResponse(**done.result["overview"])
+        job_id = await queue.enqueue_async(db, OVERVIEW_JOB, job_key, {"user_id": str(current_user.id)})
+        return JSONResponse(
+            OverviewJobOut(job_id=job_id, status=queue.QUEUED).model_dump(by_alias=True),
+            status_code=status.HTTP_202_ACCEPTED,
         )
-        for c in all_citations
-    ]
 
-    # 7. Final return (must use field names, not aliases)
-    return MedListOverviewResponse(
-        overview_bullets=overview_bullets,
-        per_drug=per_drug,
-        citations=citations_for_response,
-        used_citation_ids=list(used_ids),
+    # Concurrent requests for the same user + med list share one computation
+    key = f"overview:{current_user.id}:{fingerprint}"
+    return await singleflight.do_async(key, lambda: build_overview(med_list))
+
+
+@router.get(
+    "/overview/jobs/{job_id}",
+    response_model=OverviewJobOut,
+    responses={202: {"model": OverviewJobOut, "description": "Still queued or running"}},
+)
+async def get_med_list_overview_job(
+    job_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async),
+) -> OverviewJobOut:
+    job = await queue.get_job(db, job_id)
+    if job is None or job.kind != OVERVIEW_JOB or (job.payload or {}).get("user_id") != str(current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if job.status in (queue.QUEUED, queue.RUNNING):
+        response.status_code = status.HTTP_202_ACCEPTED
+    return OverviewJobOut(
+        job_id=job.id,
+        status=job.status,
+        attempts=job.attempts,
+        error=job.error if job.status == queue.FAILED else None,
+        result=(job.result or {}).get("overview") if job.status == queue.DONE else None,
     )
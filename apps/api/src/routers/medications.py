@@ -1,19 +1,38 @@
 # apps/api/src/routers/medications.py
+import logging
 from typing import List
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, status, HTTPException, Query
 from pydantic import BaseModel
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from ..core.config import settings
 from ..db.session import get_db
 from ..dependencies.users import get_current_user
 from ..db.models import User, UserMedication, MedicationIntakeLog
 from ..schemas.medication import UserMedicationOut, MedicationIntakeLogOut
+from ..services.jobs.queue import enqueue
+from ..services.med_interactions_service import invalidate_user_interactions
+from ..services.med_overview_service import OVERVIEW_JOB, overview_job_key
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/me/medications", tags=["medications"])
 
 
+def _recompute_overview(db: Session, user: User) -> None:
+    # the worker picks this up; repeated edits collapse into one queued job
+    if not settings.overview_recompute_on_change:
+        return
+    try:
+        enqueue(db, OVERVIEW_JOB, overview_job_key(user.id), {"user_id": str(user.id)})
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.warning("could not enqueue overview recompute for %s: %s", user.id, e)
+
+
 class AddMedicationRequest(BaseModel):
     rx_cui: str
     display_name: str
@@ -52,6 +71,8 @@ def add_my_medication(
     db.add(med)
     db.commit()
     db.refresh(med)
+    invalidate_user_interactions(current_user.id)
+    _recompute_overview(db, current_user)
     return med
 
 # Helper function to get a medication owned by the current user
@@ -75,6 +96,18 @@ def _get_owned_medication(
         )
     return med
 
+@router.delete("/{medication_id}", status_code=status.HTTP_204_NO_CONTENT)
+def remove_my_medication(
+    medication_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    med = _get_owned_medication(db, current_user, medication_id)
+    db.delete(med)
+    db.commit()
+    invalidate_user_interactions(current_user.id)
+    _recompute_overview(db, current_user)
+
 # mark that a user took a medication
 @router.post(
     "/{medication_id}/log",
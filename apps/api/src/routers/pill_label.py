@@ -1,16 +1,24 @@
 # apps/api/src/routers/pill_label.py
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from ..db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..core.config import settings
+from ..dependencies.users import get_optional_user_id
 from ..schemas.pill_label import (
+    PillLabelBatchRequest,
+    PillLabelBatchResponse,
     PillLabelParseRequest,
     PillLabelParseResponse,
 )
-from ..services.llm.pill_parser import parse_pill_label_with_llm
-# If you want this protected later, you can add get_current_user, but REMOVE it for now:
-# from ..core.deps import get_current_user
+from ..services.llm import label_cache
+from ..services.llm.pill_parser import parse_pill_label_with_llm_async
+from ..core import singleflight
 
 router = APIRouter(
     prefix="/ai",
@@ -18,25 +26,113 @@ router = APIRouter(
 )
 
 
+def _cacheable(result: Dict[str, Any]) -> bool:
+    # a low-confidence local parse means the LLM failed; let a rescan retry it
+    return result.get("source") == "llm" or (result.get("confidence") or 0) >= settings.pill_local_confidence_threshold
+
+
+def _to_response(result: Dict[str, Any]) -> PillLabelParseResponse:
+    return PillLabelParseResponse(
+        drugName=result.get("drug_name"),
+        strength=result.get("strength"),
+        rawSig=result.get("raw_sig"),
+        directionsSummary=result.get("directions_summary"),
+        notes=result.get("notes"),
+        confidence=result.get("confidence"),
+        rxCui=result.get("rx_cui"),
+        source=result.get("source"),
+    )
+
+
+async def _parse(
+    ocr_text: str, user_id: Optional[str], llm_slots: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    result = label_cache.lookup(user_id, ocr_text) if user_id else None
+    if result is None:
+        # Retries of the same scan while the first parse is still running share it
+        key = "pill-label:" + hashlib.sha256(ocr_text.encode("utf-8")).hexdigest()
+        result = await singleflight.do_async(key, lambda: parse_pill_label_with_llm_async(ocr_text, llm_slots))
+        if user_id and _cacheable(result):
+            label_cache.store(user_id, ocr_text, result)
+    return result
+
+
 @router.post(
     "/parse-pill-label",
     response_model=PillLabelParseResponse,
 )
-def parse_pill_label(
+async def parse_pill_label(
     payload: PillLabelParseRequest,
-    db: Session = Depends(get_db),
-    # current_user=Depends(get_current_user),  # leave this OUT for now
+    # sent by the web client when logged in; the endpoint itself stays public
+    user_id: Optional[str] = Depends(get_optional_user_id),
 ) -> PillLabelParseResponse:
     """
     Parse OCR text from a pill bottle label into structured fields.
     """
-    result = parse_pill_label_with_llm(payload.ocr_text)
+    return _to_response(await _parse(payload.ocr_text, user_id))
 
-    return PillLabelParseResponse(
-        drugName=result.get("drug_name"),
-        strength=result.get("strength"),
-        rawSig=result.get("raw_sig"),
-        directionsSummary=result.get("directions_summary"),
-        notes=result.get("notes"),
-        confidence=result.get("confidence"),
-    )
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _parse_batch(ocr_texts, user_id: Optional[str]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (index, result) as each label finishes; confident local parses come first."""
+    llm_slots = asyncio.Semaphore(max(1, settings.pill_batch_concurrency))
+
+    async def one(i: int, text: str) -> Tuple[int, Dict[str, Any]]:
+        return i, await _parse(text, user_id, llm_slots)
+
+    tasks = [asyncio.create_task(one(i, t)) for i, t in enumerate(ocr_texts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # client went away (streaming) or a parse raised: don't leave LLM calls running.
+        # A call another request is also waiting on keeps running (see singleflight.do_async).
+        for t in tasks:
+            t.cancel()
+
+
+async def _stream_events(ocr_texts, user_id: Optional[str]) -> AsyncIterator[str]:
+    async for i, result in _parse_batch(ocr_texts, user_id):
+        yield _sse("result", {"index": i, "result": _to_response(result).model_dump(by_alias=True)})
+    yield _sse("done", {"count": len(ocr_texts)})
+
+
+@router.post(
+    "/parse-pill-labels",
+    response_model=PillLabelBatchResponse,
+)
+async def parse_pill_labels(
+    payload: PillLabelBatchRequest,
+    stream: bool = Query(False, description="Send each result as an SSE event as soon as it is ready"),
+    user_id: Optional[str] = Depends(get_optional_user_id),
+):
+    """
+    Parse several pill bottle labels at once (e.g. onboarding a new patient).
+    Every label gets the local parser right away; at most
+    PILL_BATCH_CONCURRENCY of them escalate to the LLM at a time.
+
+    With stream=true the response is text/event-stream:
+      result  – {"index", "result"} per label, in completion order
+      done    – {"count"} once every label has been sent
+    Otherwise results are returned in input order.
+    """
+    if len(payload.ocr_texts) > settings.pill_batch_max_labels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.pill_batch_max_labels} labels per request",
+        )
+
+    if stream:
+        return StreamingResponse(
+            _stream_events(payload.ocr_texts, user_id),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(payload.ocr_texts)
+    async for i, result in _parse_batch(payload.ocr_texts, user_id):
+        results[i] = result
+    return PillLabelBatchResponse(results=[_to_response(r) for r in results])
@@ -0,0 +1,47 @@
+# apps/api/src/schemas/interactions.py
+
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class InteractingMedication(BaseModel):
+    medication_id: int = Field(alias="medicationId")
+    rx_cui: str = Field(alias="rxCui")
+    name: str
+
+    class Config:
+        populate_by_name = True
+
+
+class UserInteraction(BaseModel):
+    medications: List[InteractingMedication]
+    severity: str
+    mechanism: str
+    guidance: str
+    evidence_ids: List[str] = Field(default_factory=list, alias="evidenceIds")
+    # LLM assessment of label text (POST /interactions fallback), not an extracted rule
+    provisional: bool = False
+
+    class Config:
+        populate_by_name = True
+
+
+class InteractionSeveritySummary(BaseModel):
+    total: int = 0
+    # highest severity found, None when nothing interacts
+    highest: Optional[str] = None
+    by_severity: Dict[str, int] = Field(default_factory=dict, alias="bySeverity")
+
+    class Config:
+        populate_by_name = True
+
+
+class UserInteractionsResponse(BaseModel):
+    medications: int
+    pairs_checked: int = Field(alias="pairsChecked")
+    interactions: List[UserInteraction] = Field(default_factory=list)
+    summary: InteractionSeveritySummary
+    disclaimer: str = "Educational use only. Not medical advice."
+
+    class Config:
+        populate_by_name = True
@@ -26,12 +26,40 @@ class MedOverviewPerDrug(BaseModel):
         populate_by_name = True
 
 
+class MedOverviewContextStats(BaseModel):
+    medications: int
+    input_snippets: int = Field(alias="inputSnippets")
+    input_tokens: int = Field(alias="inputTokens")
+    kept_snippets: int = Field(alias="keptSnippets")
+    packed_tokens: int = Field(alias="packedTokens")
+    total_budget: int = Field(alias="totalBudget")
+    per_drug_budget: int = Field(alias="perDrugBudget")
+    deduped: int
+    dropped_over_budget: int = Field(alias="droppedOverBudget")
+    truncated: int
+
+    class Config:
+        populate_by_name = True
+
+
 class MedListOverviewResponse(BaseModel):
     overview_bullets: List[str] = Field(alias="overviewBullets")
     per_drug: List[MedOverviewPerDrug] = Field(alias="perDrug")
     citations: List[MedOverviewCitation] = Field(default_factory=list)
     used_citation_ids: List[int] = Field(default_factory=list, alias="usedCitationIds")
+    context_stats: Optional[MedOverviewContextStats] = Field(default=None, alias="contextStats")
     disclaimer: str = "Educational use only. Not medical advice."
 
     class Config:
         populate_by_name = True
+
+
+class OverviewJobOut(BaseModel):
+    job_id: int = Field(alias="jobId")
+    status: str
+    attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[MedListOverviewResponse] = None
+
+    class Config:
+        populate_by_name = True
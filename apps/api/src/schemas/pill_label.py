@@ -1,7 +1,7 @@
 # apps/api/src/schemas/pill_label.py
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class PillLabelParseRequest(BaseModel):
@@ -17,6 +17,16 @@ class PillLabelParseResponse(BaseModel):
     )  # short plain-language summary
     notes: Optional[str] = None  # any extra useful info
     confidence: Optional[float] = None  # 0–1 rough confidence estimate
+    rx_cui: Optional[str] = Field(None, alias="rxCui")  # Drug catalog match, if any
+    source: Optional[str] = None  # "local" or "llm"
 
     class Config:
         populate_by_name = True
+
+
+class PillLabelBatchRequest(BaseModel):
+    ocr_texts: List[str] = Field(..., alias="ocrTexts", min_length=1)
+
+
+class PillLabelBatchResponse(BaseModel):
+    results: List[PillLabelParseResponse]  # same order as ocrTexts
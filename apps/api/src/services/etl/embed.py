@@ -2,10 +2,17 @@
 # model used: 'sentence-transformers/all-MiniLM-L6-v2'
 # output: 384 dim vector
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from functools import lru_cache
 import numpy as np
 
+from src.core.config import settings
+
+# CPU-bound encoding runs here, not on the event loop or AnyIO's request threadpool
+EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=settings.embed_workers, thread_name_prefix="embed")
+
 @lru_cache(maxsize=1)
 def _model():
     from sentence_transformers import SentenceTransformer
@@ -13,10 +20,14 @@ def _model():
 
 def embed_text(text: str) -> List[float]:
     m = _model()
-    v = m.encode([text], normalize_embeddings=True)[0]  
+    v = m.encode([text], normalize_embeddings=True)[0]
     return v.astype(np.float32).tolist()
 
 def embed_texts(texts: List[str]) -> List[List[float]]:
     m = _model()
-    M = m.encode(texts, normalize_embeddings=True)    
-    return M.astype(np.float32).tolist()
\ No newline at end of file
+    M = m.encode(texts, normalize_embeddings=True)
+    return M.astype(np.float32).tolist()
+
+async def embed_texts_async(texts: List[str]) -> List[List[float]]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(EMBED_EXECUTOR, embed_texts, texts)
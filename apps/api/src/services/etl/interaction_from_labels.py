@@ -1,49 +1,88 @@
 # apps/api/src/services/etl/interaction_from_labels.py
-
-import os
+# Extract drug-drug interaction rules from label_chunk rows (section
+# "drug_interactions") with the LLM.
+#
+# Runs as a resumable job:
+# - every chunk is first scanned with an Aho-Corasick automaton over all Drug
+#   generic/brand names plus common drug classes; chunks that mention no
+#   other drug never reach the LLM, and the names found are passed into the
+#   prompt as candidates;
+# - chunks are packed into multi-chunk prompts (up to --batch-tokens of label
+#   text, --batch-size chunks) so the instruction block is sent once per batch
+#   instead of once per chunk; --batch-tokens 0 sends one chunk per call;
+# - LLM calls are async, at most --concurrency in flight;
+# - every processed chunk gets an interaction_extraction checkpoint keyed on
+#   (hash of rx_cui + chunk text, prompt version), so a rerun skips finished
+#   chunks and retries failed ones; editing the prompt or bumping
+#   PROMPT_VERSIONS["interactions"] re-extracts everything;
+# - an extracted other_drug is kept only if the automaton finds it in the
+#   chunk's candidates (same RxCUI or same name), which drops interactions
+#   the LLM invents from general knowledge;
+# - other_drug is stored as its RxCUI when the RxCUI index resolves it (class
+#   names such as "NSAIDs" stay text); rules of older runs are canonicalized
+#   by services/etl/normalize_interactions.py;
+# - interaction_rule holds one row per unordered pair; rules from a batch are
+#   written with one multi-row INSERT ... ON CONFLICT (a_rx_cui, b_rx_cui)
+#   DO UPDATE (the more severe rule's text wins, evidence chunk ids
+#   accumulate), in the same transaction as the checkpoints;
+# - progress, throughput and ETA are printed every few seconds.
+#
+#   python -m src.services.etl.interaction_from_labels --concurrency 8
+#
+# or enqueue background_job kind "extract_interactions" for the job worker.
+
+import argparse
+import asyncio
+import hashlib
 import json
-from typing import List, Dict
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.db.session import SessionLocal
-from src.db.models import LabelChunk, InteractionRule
 from src.core.config import settings
-
-try:
-    import google.generativeai as genai
-
-    GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if GEMINI_API_KEY or settings.gemini_api_key:
-        genai.configure(api_key=GEMINI_API_KEY or settings.gemini_api_key)
-        GEMINI_MODEL = genai.GenerativeModel("gemini-2.5-flash")  # or your chosen model
-    else:
-        GEMINI_MODEL = None
-except ImportError:
-    GEMINI_MODEL = None
-
-
-def call_llm_to_extract_interactions(a_rx_cui: str, chunk_text: str) -> List[Dict]:
-    """
-    Call Gemini (or another LLM) to extract structured interactions from text.
-
-    Returns a list of dicts like:
-    [
-      {
-        "other_drug": "warfarin",
-        "severity": "major",
-        "mechanism": "...",
-        "guidance": "..."
-      }
-    ]
-    """
-
-    # If Gemini isn't configured yet, just return empty result
-    if GEMINI_MODEL is None:
-        print("⚠️ GEMINI_MODEL is not configured; returning [] from call_llm_to_extract_interactions")
-        return []
-
-    prompt = f"""
+from src.db.session import AsyncSessionLocal
+from src.db.models import InteractionExtraction, InteractionRule, LabelChunk
+from src.services.llm import metrics
+from src.services.llm.context_packer import count_tokens
+from src.services.llm.providers import PROMPT_VERSIONS, ProviderUnavailable, TASK_INTERACTIONS, get_provider
+from src.services.interaction_graph import pair_key, severity_rank
+from src.services.retrieval.drug_matcher import DrugMatcher, Match, catalog_entries, normalize
+from src.services.retrieval.rxcui_index import RxCuiIndex, refresh as refresh_rxcui_index
+
+# background_job kind (see services/jobs/worker.py)
+EXTRACT_INTERACTIONS_JOB = "extract_interactions"
+
+DONE, FAILED = "done", "failed"
+
+# Interactants that labels name by class rather than by drug. Matched like
+# catalog names (whole words, case-insensitive) but carry no RxCUI.
+DRUG_CLASS_NAMES = (
+    "anticoagulant", "anticoagulants", "oral anticoagulants", "antiplatelet agents", "antiplatelet drugs",
+    "nsaid", "nsaids", "nonsteroidal anti-inflammatory drugs",
+    "mao inhibitors", "maois", "monoamine oxidase inhibitors",
+    "ssris", "selective serotonin reuptake inhibitors", "snris", "serotonergic drugs",
+    "tricyclic antidepressants", "triptans", "opioids", "opioid analgesics", "benzodiazepines",
+    "cns depressants", "sedatives", "hypnotics", "antipsychotics", "anticonvulsants", "antiepileptic drugs",
+    "cyp3a4 inhibitors", "strong cyp3a4 inhibitors", "cyp3a inhibitors", "strong cyp3a inhibitors",
+    "cyp3a4 inducers", "cyp3a inducers", "cyp2d6 inhibitors", "cyp2c9 inhibitors", "cyp2c19 inhibitors",
+    "p-gp inhibitors", "p-glycoprotein inhibitors",
+    "diuretics", "thiazide diuretics", "loop diuretics", "potassium-sparing diuretics", "potassium supplements",
+    "ace inhibitors", "angiotensin receptor blockers", "arbs", "beta blockers", "beta-blockers",
+    "calcium channel blockers", "nitrates", "pde5 inhibitors", "antihypertensives", "antiarrhythmics",
+    "qt prolonging drugs", "statins", "hmg-coa reductase inhibitors",
+    "antacids", "proton pump inhibitors", "ppis", "h2 blockers", "h2-receptor antagonists",
+    "corticosteroids", "oral contraceptives", "hormonal contraceptives", "estrogens",
+    "insulin", "sulfonylureas", "antidiabetic agents", "hypoglycemic agents",
+    "macrolide antibiotics", "macrolides", "fluoroquinolones", "quinolones", "azole antifungals",
+    "protease inhibitors", "hiv protease inhibitors", "live vaccines", "immunosuppressants",
+    "alcohol", "grapefruit juice", "st. john's wort",
+)
+
+INTERACTION_PROMPT = """
 You are a clinical NLP assistant. Your job is to extract structured drug-drug
 interactions from FDA drug label text.
 
@@ -71,157 +110,548 @@ Rules:
 - Do not add any keys beyond those specified.
 - Output MUST be valid JSON. Do not wrap it in code fences.
 
+Drug and drug-class names found in the text: {candidates}
+Only these can be "other_drug"; use the name as written.
+
 
 TEXT:
 {chunk_text}
 """
 
-    # 1. Call Gemini with error handling for 500s
-    try:
-        response = GEMINI_MODEL.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.1,
-            },
-        )
+BATCH_INTERACTION_PROMPT = """
+You are a clinical NLP assistant. Your job is to extract structured drug-drug
+interactions from FDA drug label text.
+
+Below are several excerpts from drug labels. Each starts with a header line
+"=== <chunk id> (source drug RxCUI: <rxcui>) ===" and a "Candidates:" line
+listing the drug and drug-class names found in it. For EACH excerpt, identify
+any other drugs that have drug-drug interactions with that excerpt's source
+drug. Return ONLY a JSON object with one key per chunk id:
+
+{{
+  "<chunk id>": [
+    {{
+      "other_drug": "<name of the other interacting drug>",
+      "severity": "<one of: minor | moderate | major | unknown>",
+      "mechanism": "<short explanation of why or how they interact>",
+      "guidance": "<short, practical clinical guidance (e.g., avoid, monitor, adjust dose)>"
+    }}
+  ]
+}}
+
+Rules:
+- Include every chunk id. If an excerpt has no interactions, its value is [].
+- Judge each excerpt on its own text only; never move an interaction from one
+  excerpt to another.
+- Only report interactions that are explicitly described in the excerpt.
+- "other_drug" MUST be a drug name that literally appears in that excerpt,
+  and only that excerpt's candidates can be "other_drug"; use the name as written.
+- Do NOT infer interactions from general medical knowledge if they are not in the text.
+- "other_drug" should be a simple drug name, not a full sentence.
+- Be conservative; only include interactions clearly implied by the text.
+- Do not add any keys beyond those specified.
+- Output MUST be valid JSON. Do not wrap it in code fences.
+
+
+{chunks}
+"""
+
+# prompt text changes invalidate checkpoints on their own
+EXTRACTION_VERSION = "{}:{}".format(
+    PROMPT_VERSIONS[TASK_INTERACTIONS],
+    hashlib.sha256((INTERACTION_PROMPT + BATCH_INTERACTION_PROMPT).encode("utf-8")).hexdigest()[:8],
+)
+
+
+def build_interaction_matcher(entries: Optional[List[Tuple[str, str, str, bool]]] = None) -> DrugMatcher:
+    """Automaton over the Drug catalog (or `entries`) plus DRUG_CLASS_NAMES."""
+    entries = catalog_entries() if entries is None else entries
+    return DrugMatcher(list(entries) + [(c, "", c, False) for c in DRUG_CLASS_NAMES])
+
+
+def _key(name: str) -> str:
+    return " ".join(normalize(name).split())
+
+
+def find_candidates(matcher: DrugMatcher, a_rx_cui: str, chunk_text: str) -> List[Match]:
+    """
+    Other drugs and drug classes mentioned in the chunk, one Match per
+    distinct name, mentions of the source drug itself excluded. Label text
+    is clean, so only exact (OCR-folded) matches count.
+    """
+    seen: Set[str] = set()
+    out = []
+    for m in matcher.find(chunk_text or "", fuzzy=False):
+        key = _key(m.matched)
+        if (m.rx_cui and m.rx_cui == a_rx_cui) or key in seen:
+            continue
+        seen.add(key)
+        out.append(m)
+    return out
+
+
+def _candidate_list(candidates: List[Match]) -> str:
+    return ", ".join(m.matched for m in candidates)
 
-    except Exception as e:
-        # This will catch InternalServerError and similar
-        print(f"❌ Gemini API error for rx_cui={a_rx_cui}: {repr(e)}")
-        return []
 
-    raw = (response.text or "").strip()
+def _interaction_prompt(a_rx_cui: str, chunk_text: str, candidates: List[Match]) -> str:
+    return INTERACTION_PROMPT.format(
+        a_rx_cui=a_rx_cui, chunk_text=chunk_text, candidates=_candidate_list(candidates),
+    )
 
-    # 2. Strip ```json ... ``` fences if present
+
+def _batch_prompt(chunks: List[Tuple[str, str, str, List[Match]]]) -> str:
+    """chunks: (chunk id, source rx_cui, text, candidates)."""
+    return BATCH_INTERACTION_PROMPT.format(chunks="\n\n".join(
+        f"=== {cid} (source drug RxCUI: {a_rx_cui}) ===\nCandidates: {_candidate_list(cands)}\n{chunk_text}"
+        for cid, a_rx_cui, chunk_text, cands in chunks
+    ))
+
+
+def _strip_fences(raw: str) -> str:
+    raw = (raw or "").strip()
     if raw.startswith("```"):
-        # remove leading/trailing backticks
-        raw_stripped = raw.strip("`").strip()
-        # drop leading 'json' or 'JSON'
-        if raw_stripped.lower().startswith("json"):
-            raw_stripped = raw_stripped[4:].lstrip()
-        raw = raw_stripped
-
-    # 3. Try to load as-is first
+        # remove leading/trailing backticks and a leading 'json' tag
+        raw = raw.strip("`").strip()
+        if raw.lower().startswith("json"):
+            raw = raw[4:].lstrip()
+    return raw
+
+
+def parse_interactions(raw: str) -> List[Dict]:
+    """
+    The JSON array from an LLM answer. Falls back to the text between the
+    first '[' and the last ']'. Raises ValueError if there is no usable array.
+    """
+    raw = _strip_fences(raw)
     try:
         data = json.loads(raw)
-        if isinstance(data, list):
-            return data
-        else:
-            print("⚠️ LLM returned non-list JSON, ignoring:", raw[:200])
-            return []
     except json.JSONDecodeError:
-        # 4. As a fallback, try to extract the JSON array between first '[' and last ']'
-        start = raw.find("[")
-        end = raw.rfind("]")
-        if start != -1 and end != -1 and end > start:
-            sliced = raw[start : end + 1]
-            try:
-                data = json.loads(sliced)
-                if isinstance(data, list):
-                    return data
-                else:
-                    print("⚠️ Fallback JSON was not a list, ignoring:", sliced[:200])
-                    return []
-            except json.JSONDecodeError:
-                print("⚠️ Failed to parse JSON from LLM after fallback:", sliced[:200])
-                return []
-        else:
-            print("⚠️ Failed to parse JSON from LLM:", raw[:200])
-            return []
-
-
-def extract_interactions_for_all_drugs() -> None:
+        start, end = raw.find("["), raw.rfind("]")
+        if start == -1 or end <= start:
+            metrics.json_parse_failure(TASK_INTERACTIONS, recovered=False)
+            raise ValueError(f"no JSON array in LLM answer: {raw[:200]!r}")
+        try:
+            data = json.loads(raw[start:end + 1])
+        except json.JSONDecodeError as e:
+            metrics.json_parse_failure(TASK_INTERACTIONS, recovered=False)
+            raise ValueError(f"unparseable JSON array in LLM answer: {raw[start:start + 200]!r}") from e
+        metrics.json_parse_failure(TASK_INTERACTIONS, recovered=True)
+    if not isinstance(data, list):
+        raise ValueError(f"LLM returned non-list JSON: {raw[:200]!r}")
+    return data
+
+
+def parse_batch_interactions(raw: str, chunk_ids: List[str]) -> Dict[str, List[Dict]]:
     """
-    Go through label_chunk rows in the 'drug_interactions' section,
-    call the LLM, and insert InteractionRule rows.
+    Per-chunk arrays from a batched answer, for the ids that are present and
+    hold a list. Falls back to the text between the first '{' and the last
+    '}'. Raises ValueError if there is no usable object.
     """
-    session: Session = SessionLocal()
+    raw = _strip_fences(raw)
     try:
-        # 1) get all rx_cui values that have any drug_interactions text
-        rx_cuis = (
-            session.query(LabelChunk.rx_cui)
-            .filter(LabelChunk.section == "drug_interactions")
-            .distinct()
-            .all()
-        )
-        rx_cuis = [row[0] for row in rx_cuis]
-        print(f"Found {len(rx_cuis)} drugs with drug_interactions text")
-
-        for a_rx_cui in rx_cuis:
-            print(f"\n=== Processing interactions for a_rx_cui={a_rx_cui} ===")
-
-            chunks = (
-                session.query(LabelChunk)
-                .filter(
-                    LabelChunk.rx_cui == a_rx_cui,
-                    LabelChunk.section == "drug_interactions",
-                )
-                .all()
-            )
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        start, end = raw.find("{"), raw.rfind("}")
+        if start == -1 or end <= start:
+            metrics.json_parse_failure(TASK_INTERACTIONS, recovered=False)
+            raise ValueError(f"no JSON object in LLM answer: {raw[:200]!r}")
+        try:
+            data = json.loads(raw[start:end + 1])
+        except json.JSONDecodeError as e:
+            metrics.json_parse_failure(TASK_INTERACTIONS, recovered=False)
+            raise ValueError(f"unparseable JSON object in LLM answer: {raw[start:start + 200]!r}") from e
+        metrics.json_parse_failure(TASK_INTERACTIONS, recovered=True)
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM returned non-object JSON: {raw[:200]!r}")
+    return {cid: data[cid] for cid in chunk_ids if isinstance(data.get(cid), list)}
+
+
+@lru_cache(maxsize=1)
+def _shared_matcher() -> DrugMatcher:
+    return build_interaction_matcher()
+
+
+def call_llm_to_extract_interactions(a_rx_cui: str, chunk_text: str,
+                                     candidates: Optional[List[Match]] = None) -> List[Dict]:
+    """
+    Call the configured LLM provider to extract structured interactions from text.
 
-            for chunk in chunks:
-                print(f"  → Chunk id={chunk.id}, length={len(chunk.chunk_text)}")
-                interactions = call_llm_to_extract_interactions(
-                    a_rx_cui=a_rx_cui,
-                    chunk_text=chunk.chunk_text,
-                )
+    Returns a list of dicts like:
+    [
+      {
+        "other_drug": "warfarin",
+        "severity": "major",
+        "mechanism": "...",
+        "guidance": "..."
+      }
+    ]
+    Chunks without candidates (see find_candidates) yield [] without a call;
+    errors are printed and yield [].
+    """
+    if candidates is None:
+        candidates = find_candidates(_shared_matcher(), a_rx_cui, chunk_text)
+    if not candidates:
+        return []
+    try:
+        provider = get_provider()
+    except ProviderUnavailable as e:
+        print(f"⚠️ LLM provider is not configured ({e}); returning [] from call_llm_to_extract_interactions")
+        return []
 
-                if not interactions:
-                    continue
+    try:
+        raw = provider.generate(
+            _interaction_prompt(a_rx_cui, chunk_text, candidates),
+            task=TASK_INTERACTIONS,
+            json_mode=False,
+            temperature=0.1,
+            validate=parse_interactions,
+        )
+        return parse_interactions(raw)
+    except Exception as e:
+        print(f"❌ LLM extraction failed for rx_cui={a_rx_cui}: {repr(e)}")
+        return []
 
-                for item in interactions:
-                    other = (item.get("other_drug") or "").strip()
-                    if not other:
-                        continue
 
-                    # 🔒 NEW: require that the other_drug string actually appears in the text
-                    # This kills a ton of hallucinations where the LLM invents a plausible drug.
-                    chunk_text_lower = (chunk.chunk_text or "").lower()
-                    other_lower = other.lower()
+async def extract_interactions_async(a_rx_cui: str, chunk_text: str, candidates: List[Match]) -> List[Dict]:
+    """Async single-chunk extraction for the job. Raises on LLM or parse errors."""
+    raw = await get_provider().generate_async(
+        _interaction_prompt(a_rx_cui, chunk_text, candidates),
+        task=TASK_INTERACTIONS,
+        json_mode=False,
+        temperature=0.1,
+        timeout=settings.llm_deadline_s,
+        validate=parse_interactions,
+    )
+    return parse_interactions(raw)
 
-                    if other_lower not in chunk_text_lower:
-                        # Optional: debug log
-                        print(
-                            f"Skipping hallucinated interaction: a_rx_cui={a_rx_cui}, "
-                            f"other_drug='{other}' not found in chunk text"
-                        )
-                        continue
 
-                    severity = (item.get("severity") or "unknown").strip()
-                    mechanism = (item.get("mechanism") or "").strip()
-                    guidance = (item.get("guidance") or "").strip()
+async def extract_batch_async(chunks: List[Tuple[str, str, str, List[Match]]]) -> Dict[str, List[Dict]]:
+    """
+    One LLM call for several chunks ((chunk id, source rx_cui, text, candidates) each).
+    Returns arrays for the chunk ids the answer covers; raises on LLM or
+    parse errors.
+    """
+    chunk_ids = [c[0] for c in chunks]
+
+    def complete(raw: str) -> None:
+        # persist only answers that cover every chunk of the batch
+        missing = set(chunk_ids) - set(parse_batch_interactions(raw, chunk_ids))
+        if missing:
+            raise ValueError(f"batched answer is missing {len(missing)} chunk(s)")
+
+    raw = await get_provider().generate_async(
+        _batch_prompt(chunks),
+        task=TASK_INTERACTIONS,
+        json_mode=True,
+        temperature=0.1,
+        timeout=settings.llm_deadline_s,
+        validate=complete,
+    )
+    return parse_batch_interactions(raw, chunk_ids)
+
+
+def pack_batches(chunks: List[Tuple], max_tokens: int, max_chunks: int) -> List[List[Tuple]]:
+    """
+    Group chunks (text at index 2) in order into batches of at most
+    `max_tokens` estimated tokens of text and `max_chunks` chunks. A chunk
+    over the budget on its own gets a batch to itself. max_tokens <= 0
+    disables batching.
+    """
+    if max_tokens <= 0 or max_chunks <= 1:
+        return [[c] for c in chunks]
+    batches: List[List[Tuple]] = []
+    current: List[Tuple] = []
+    used = 0
+    for c in chunks:
+        n = count_tokens(c[2])
+        if current and (used + n > max_tokens or len(current) >= max_chunks):
+            batches.append(current)
+            current, used = [], 0
+        current.append(c)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _mentioned(matcher: DrugMatcher, other: str, candidates: List[Match]) -> bool:
+    """Whether `other` names one of the chunk's candidates (same name, or same RxCUI e.g. brand vs generic)."""
+    keys = {_key(m.matched) for m in candidates}
+    if _key(other) in keys:
+        return True
+    rx_cuis = {m.rx_cui for m in candidates if m.rx_cui}
+    return any(m.rx_cui in rx_cuis or _key(m.matched) in keys for m in matcher.find(other, fuzzy=False))
+
+
+def rules_from_items(a_rx_cui: str, chunk_id: int, items: List[Dict], matcher: DrugMatcher,
+                     candidates: List[Match], index: RxCuiIndex) -> List[Dict[str, Any]]:
+    """
+    InteractionRule rows for one chunk: the other drug resolved to an RxCUI
+    where possible, the pair in canonical order, the chunk as evidence.
+    Drops items whose other_drug is not one of the chunk's candidates (this
+    kills a ton of hallucinations where the LLM invents a plausible drug)
+    and the source drug itself; several items for one pair are merged.
+    """
+    rows = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        other = str(item.get("other_drug") or "").strip()
+        if not other or not _mentioned(matcher, other, candidates):
+            continue
+        b_rx_cui = index.resolve(other) or other
+        if b_rx_cui == a_rx_cui:
+            continue
+        severity = str(item.get("severity") or "unknown").strip()
+        lo, hi = pair_key(a_rx_cui, b_rx_cui)
+        rows.append({
+            "a_rx_cui": lo,
+            "b_rx_cui": hi,
+            "severity": severity,
+            "severity_rank": severity_rank(severity),
+            "mechanism": str(item.get("mechanism") or "").strip(),
+            "guidance": str(item.get("guidance") or "").strip(),
+            "evidence_ids": [chunk_id],
+        })
+    return merge_rules(rows)
+
+
+def merge_rules(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    One row per pair (an upsert can't touch a row twice): the most severe
+    rule's text, every row's evidence.
+    """
+    merged: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for r in rows:
+        key = (r["a_rx_cui"], r["b_rx_cui"])
+        cur = merged.get(key)
+        if cur is None:
+            merged[key] = dict(r)
+            continue
+        evidence = sorted(set(cur["evidence_ids"]) | set(r["evidence_ids"]))
+        if r["severity_rank"] > cur["severity_rank"]:
+            cur.update(r)
+        cur["evidence_ids"] = evidence
+    return list(merged.values())
 
-                    existing = (
-                        session.query(InteractionRule)
-                        .filter(
-                            InteractionRule.a_rx_cui == a_rx_cui,
-                            InteractionRule.b_rx_cui == other,
-                            InteractionRule.mechanism == mechanism,
-                        )
-                        .first()
-                    )
 
-                    if existing:
-                        continue  # skip duplicate
+# ---------------- job ----------------
 
-                    rule = InteractionRule(
-                        a_rx_cui=a_rx_cui,
-                        b_rx_cui=other,
-                        severity=severity,
-                        mechanism=mechanism,
-                        guidance=guidance,
-                    )
+def chunk_hash(a_rx_cui: str, chunk_text: str) -> str:
+    return hashlib.sha256(f"{a_rx_cui}\n{chunk_text or ''}".encode("utf-8")).hexdigest()
 
-                    session.add(rule)
 
+def _upsert_rules(rows: List[Dict[str, Any]]):
+    """
+    Upsert on uq_interaction_rule_pair: a more severe rule replaces the
+    stored text, evidence ids accumulate. A provisional rule (LLM fallback
+    of /interactions) is replaced outright. Returns one row per new pair.
+    """
+    stmt = pg_insert(InteractionRule).values(rows)
+    new, old = stmt.excluded, InteractionRule.__table__.c
+    replace = or_(old.provisional, new.severity_rank > old.severity_rank)
+    return stmt.on_conflict_do_update(
+        index_elements=["a_rx_cui", "b_rx_cui"],
+        set_={
+            "severity": case((replace, new.severity), else_=old.severity),
+            "mechanism": case((replace, new.mechanism), else_=old.mechanism),
+            "guidance": case((replace, new.guidance), else_=old.guidance),
+            "severity_rank": case(
+                (old.provisional, new.severity_rank), else_=func.greatest(old.severity_rank, new.severity_rank),
+            ),
+            "evidence_ids": case((old.provisional, new.evidence_ids), else_=literal_column(
+                "ARRAY(SELECT DISTINCT e FROM unnest(interaction_rule.evidence_ids || excluded.evidence_ids) AS e ORDER BY e)"
+            )),
+            "provisional": False,
+        },
+    ).returning(literal_column("xmax = 0").label("inserted"))
+
+
+def _checkpoint(c_hash: str, chunk_id: int, a_rx_cui: str, status: str, rules_found: int,
+                error: Optional[str] = None):
+    stmt = pg_insert(InteractionExtraction).values(
+        chunk_hash=c_hash, prompt_version=EXTRACTION_VERSION, chunk_id=chunk_id, a_rx_cui=a_rx_cui,
+        status=status, rules_found=rules_found, error=error,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=["chunk_hash", "prompt_version"],
+        set_={
+            "chunk_id": chunk_id, "status": status, "rules_found": rules_found,
+            "error": error, "updated_at": func.now(),
+        },
+    )
+
+
+async def _pending_chunks(db: AsyncSession, limit: Optional[int], force: bool) -> List[Tuple[int, str, str, str]]:
+    """(chunk id, rx_cui, text, chunk hash) of interaction chunks without a done checkpoint."""
+    rows = (await db.execute(
+        select(LabelChunk.id, LabelChunk.rx_cui, LabelChunk.chunk_text)
+        .where(LabelChunk.section == "drug_interactions")
+        .order_by(LabelChunk.id)
+    )).all()
+
+    done: Set[str] = set()
+    if not force:
+        done = set((await db.execute(
+            select(InteractionExtraction.chunk_hash).where(
+                InteractionExtraction.prompt_version == EXTRACTION_VERSION,
+                InteractionExtraction.status == DONE,
+            )
+        )).scalars())
+
+    pending, seen = [], set()
+    for chunk_id, rx_cui, chunk_text in rows:
+        c_hash = chunk_hash(rx_cui, chunk_text)
+        # identical text re-ingested under several chunk ids is extracted once
+        if c_hash in done or c_hash in seen:
+            continue
+        seen.add(c_hash)
+        pending.append((chunk_id, rx_cui, chunk_text, c_hash))
+        if limit and len(pending) >= limit:
+            break
+    return pending
+
+
+class _Progress:
+    def __init__(self, total: int, every_s: float = 10.0):
+        self.total, self.every_s = total, every_s
+        self.done = self.failed = self.rules = self.calls = 0
+        self.t0 = self._last = time.monotonic()
+
+    def add(self, chunks: int, failed: int, rules: int) -> None:
+        self.calls += 1
+        self.done += chunks
+        self.failed += failed
+        self.rules += rules
+        now = time.monotonic()
+        if now - self._last >= self.every_s or self.done == self.total:
+            self._last = now
+            print(self.line())
+
+    def line(self) -> str:
+        elapsed = max(time.monotonic() - self.t0, 1e-6)
+        rate = self.done / elapsed
+        eta = (self.total - self.done) / rate if rate else float("inf")
+        return (
+            f"   {self.done}/{self.total} chunks ({self.failed} failed) in {self.calls} LLM calls, "
+            f"{self.rules} new rules, {rate:.2f} chunks/s, ETA {eta:.0f}s"
+        )
 
 
-                session.commit()
-                print(f"    Saved {len(interactions)} interactions from chunk {chunk.id}")
+def _error(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"[:2000]
+
+
+def _with_candidates(matcher: DrugMatcher, pending: List[Tuple[int, str, str, str]]) -> List[Tuple]:
+    """Pending chunks that mention at least one other drug, with their candidates appended."""
+    out = []
+    for chunk_id, rx_cui, chunk_text, c_hash in pending:
+        candidates = find_candidates(matcher, rx_cui, chunk_text)
+        if candidates:
+            out.append((chunk_id, rx_cui, chunk_text, c_hash, candidates))
+    return out
+
+
+async def _process_batch(batch: List[Tuple[int, str, str, str, List[Match]]], matcher: DrugMatcher,
+                         index: RxCuiIndex, slots: asyncio.Semaphore, progress: _Progress) -> None:
+    """One LLM call for `batch`, then its rules and checkpoints in one transaction."""
+    ids = [f"c{c[0]}" for c in batch]
+    results: Dict[str, List[Dict]] = {}
+    error: Optional[str] = None
+    async with slots:
+        try:
+            if len(batch) == 1:
+                _, a_rx_cui, chunk_text, _, candidates = batch[0]
+                results[ids[0]] = await extract_interactions_async(a_rx_cui, chunk_text, candidates)
+            else:
+                results = await extract_batch_async([(cid, c[1], c[2], c[4]) for cid, c in zip(ids, batch)])
+        except Exception as e:
+            print(f"❌ chunks {', '.join(ids)}: {e!r}")
+            error = _error(e)
+
+    rows: List[Dict[str, Any]] = []
+    checkpoints = []
+    for cid, (chunk_id, a_rx_cui, _, c_hash, candidates) in zip(ids, batch):
+        if cid in results:
+            chunk_rows = rules_from_items(a_rx_cui, chunk_id, results[cid], matcher, candidates, index)
+            rows.extend(chunk_rows)
+            checkpoints.append(_checkpoint(c_hash, chunk_id, a_rx_cui, DONE, len(chunk_rows)))
+        else:
+            # left out of a batched answer: retried on the next run
+            checkpoints.append(_checkpoint(c_hash, chunk_id, a_rx_cui, FAILED, 0, error or "missing from batched answer"))
+
+    async with AsyncSessionLocal() as db:
+        inserted = 0
+        if rows:
+            inserted = sum(1 for (new,) in await db.execute(_upsert_rules(merge_rules(rows))) if new)
+        for stmt in checkpoints:
+            await db.execute(stmt)
+        await db.commit()
+    progress.add(len(batch), len(batch) - len(results), inserted)
+
+
+async def run_extraction(concurrency: Optional[int] = None, limit: Optional[int] = None,
+                         force: bool = False, batch_tokens: Optional[int] = None,
+                         batch_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extract interactions from every pending drug_interactions chunk that
+    mentions another drug, packed into multi-chunk prompts, at most
+    `concurrency` LLM calls in flight. Safe to interrupt and rerun.
 
-    finally:
-        session.close()
+    Chunks without candidates get no checkpoint: the scan is cheap, and a
+    catalog that has grown since may match them on the next run.
+    """
+    concurrency = concurrency or settings.interaction_extract_concurrency
+    batch_tokens = settings.interaction_batch_max_tokens if batch_tokens is None else batch_tokens
+    batch_size = batch_size or settings.interaction_batch_max_chunks
+    async with AsyncSessionLocal() as db:
+        pending = await _pending_chunks(db, limit, force)
+    matcher = await asyncio.to_thread(build_interaction_matcher)
+    index = await asyncio.to_thread(refresh_rxcui_index)
+    scanned = len(pending)
+    pending = await asyncio.to_thread(_with_candidates, matcher, pending)
+    batches = pack_batches(pending, batch_tokens, batch_size)
+
+    print(
+        f"🔍 {scanned} pending interaction chunk(s), {scanned - len(pending)} mention no other drug "
+        f"({matcher.size} names scanned); {len(pending)} in {len(batches)} LLM call(s) "
+        f"(version {EXTRACTION_VERSION}, concurrency {concurrency})"
+    )
+    progress = _Progress(len(pending))
+    if batches:
+        slots = asyncio.Semaphore(concurrency)
+        await asyncio.gather(*(_process_batch(batch, matcher, index, slots, progress) for batch in batches))
+
+    print(f"✅ Interaction extraction complete: {progress.line().strip()}")
+    return {"skipped_no_candidates": scanned - len(pending), "chunks": progress.done, "failed": progress.failed, "llm_calls": progress.calls, "new_rules": progress.rules}
+
+
+async def run_extraction_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """background_job handler; payload may carry concurrency, limit, force, batch_tokens and batch_size."""
+    return await run_extraction(
+        payload.get("concurrency"), payload.get("limit"), bool(payload.get("force")),
+        payload.get("batch_tokens"), payload.get("batch_size"),
+    )
+
+
+def extract_interactions_for_all_drugs() -> Dict[str, Any]:
+    return asyncio.run(run_extraction())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Extract drug-drug interaction rules from label chunks")
+    parser.add_argument("--concurrency", type=int, default=settings.interaction_extract_concurrency,
+                        help="LLM calls in flight")
+    parser.add_argument("--limit", type=int, default=None, help="process at most this many pending chunks")
+    parser.add_argument("--force", action="store_true", help="ignore checkpoints and re-extract every chunk")
+    parser.add_argument("--batch-tokens", type=int, default=settings.interaction_batch_max_tokens,
+                        help="label text tokens per LLM call (0 = one chunk per call)")
+    parser.add_argument("--batch-size", type=int, default=settings.interaction_batch_max_chunks,
+                        help="chunks per LLM call")
+    args = parser.parse_args()
+    asyncio.run(run_extraction(args.concurrency, args.limit, args.force, args.batch_tokens, args.batch_size))
 
 
 if __name__ == "__main__":
-    extract_interactions_for_all_drugs()
+    main()
@@ -0,0 +1,123 @@
+# apps/api/src/services/etl/normalize_interactions.py
+# Backfill: replace free-text drug names in interaction_rule with RxCUIs, so
+# rules written by older extractor runs match RxCUI lookups.
+#
+# Only the distinct non-RxCUI values are resolved (in memory, with the
+# RxCuiIndex); the rewrite is then set-based SQL in one transaction:
+#   1. load the name -> RxCUI map into a temp table;
+#   2. compute every renamed rule's new canonical pair (least, greatest),
+#      together with rules already stored under one of those pairs;
+#   3. per pair keep the most severe extracted rule (then the oldest; LLM
+#      provisional rules only if nothing else) with the union of
+#      the group's evidence ids; delete the rest and rules that would pair a
+#      drug with itself;
+#   4. UPDATE the kept rules to their new pair.
+#
+#   python -m src.services.etl.normalize_interactions [--dry-run]
+
+import argparse
+from typing import Dict
+
+from sqlalchemy import text
+
+from src.db.session import get_session
+from src.services.retrieval.rxcui_index import refresh as refresh_rxcui_index
+
+_NAMES = text("""
+    SELECT n.name
+    FROM (SELECT a_rx_cui AS name FROM interaction_rule UNION SELECT b_rx_cui FROM interaction_rule) n
+    WHERE NOT EXISTS (SELECT 1 FROM drug d WHERE d.rx_cui = n.name)
+""")
+
+_CREATE_MAP = text("""
+    CREATE TEMP TABLE rule_name_map (name text PRIMARY KEY, rx_cui text NOT NULL) ON COMMIT DROP
+""")
+
+_INSERT_MAP = text("INSERT INTO rule_name_map (name, rx_cui) VALUES (:name, :rx_cui)")
+
+_CREATE_TARGET = text("""
+    CREATE TEMP TABLE rule_target ON COMMIT DROP AS
+    SELECT r.id,
+           LEAST(COALESCE(ma.rx_cui, r.a_rx_cui) COLLATE "C", COALESCE(mb.rx_cui, r.b_rx_cui) COLLATE "C") AS a,
+           GREATEST(COALESCE(ma.rx_cui, r.a_rx_cui) COLLATE "C", COALESCE(mb.rx_cui, r.b_rx_cui) COLLATE "C") AS b,
+           r.severity_rank, r.evidence_ids, r.provisional
+    FROM interaction_rule r
+    LEFT JOIN rule_name_map ma ON ma.name = r.a_rx_cui
+    LEFT JOIN rule_name_map mb ON mb.name = r.b_rx_cui
+    WHERE ma.rx_cui IS NOT NULL OR mb.rx_cui IS NOT NULL
+""")
+
+# rules already stored under a pair that renamed rules move to
+_ADD_OCCUPANTS = text("""
+    INSERT INTO rule_target (id, a, b, severity_rank, evidence_ids, provisional)
+    SELECT r.id, r.a_rx_cui, r.b_rx_cui, r.severity_rank, r.evidence_ids, r.provisional
+    FROM interaction_rule r
+    JOIN (SELECT DISTINCT a, b FROM rule_target) t ON t.a = r.a_rx_cui AND t.b = r.b_rx_cui
+    WHERE r.id NOT IN (SELECT id FROM rule_target)
+""")
+
+_CREATE_WINNER = text("""
+    CREATE TEMP TABLE rule_winner ON COMMIT DROP AS
+    SELECT DISTINCT ON (t.a, t.b) t.id, t.a, t.b,
+           ARRAY(
+               SELECT DISTINCT e FROM rule_target t2, unnest(t2.evidence_ids) AS e
+               WHERE t2.a = t.a AND t2.b = t.b ORDER BY e
+           ) AS evidence_ids
+    FROM rule_target t
+    WHERE t.a <> t.b
+    ORDER BY t.a, t.b, t.provisional, t.severity_rank DESC, t.id
+""")
+
+_DELETE_LOSERS = text("""
+    DELETE FROM interaction_rule
+    WHERE id IN (SELECT id FROM rule_target) AND id NOT IN (SELECT id FROM rule_winner)
+""")
+
+_UPDATE = text("""
+    UPDATE interaction_rule r
+    SET a_rx_cui = w.a, b_rx_cui = w.b, evidence_ids = w.evidence_ids
+    FROM rule_winner w
+    WHERE r.id = w.id
+""")
+
+
+def normalize_interaction_rules(dry_run: bool = False) -> Dict[str, int]:
+    index = refresh_rxcui_index()
+    if not index.size:
+        print("⚠️ Drug catalog is empty or unreachable; nothing to resolve against")
+        return {"names": 0, "resolved": 0, "deleted": 0, "updated": 0}
+
+    with get_session() as db:
+        names = [n for (n,) in db.execute(_NAMES).all() if n]
+        mapping = index.resolve_many(names)
+        print(f"🔎 {len(names)} distinct non-RxCUI drug value(s), {len(mapping)} resolve to an RxCUI")
+        for name in sorted(set(names) - set(mapping))[:20]:
+            print(f"    unresolved: {name}")
+
+        if dry_run or not mapping:
+            for name, rx_cui in sorted(mapping.items())[:50]:
+                print(f"    {name} -> {rx_cui}")
+            return {"names": len(names), "resolved": len(mapping), "deleted": 0, "updated": 0}
+
+        db.execute(_CREATE_MAP)
+        db.execute(_INSERT_MAP, [{"name": n, "rx_cui": r} for n, r in mapping.items()])
+        db.execute(_CREATE_TARGET)
+        db.execute(_ADD_OCCUPANTS)
+        db.execute(_CREATE_WINNER)
+        deleted = db.execute(_DELETE_LOSERS).rowcount or 0
+        updated = db.execute(_UPDATE).rowcount or 0
+        db.commit()
+
+    print(f"✅ Canonicalized {updated} rule(s), merged or removed {deleted} duplicate/self rule(s)")
+    return {"names": len(names), "resolved": len(mapping), "deleted": deleted, "updated": updated}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resolve interaction_rule drug names to RxCUIs")
+    parser.add_argument("--dry-run", action="store_true", help="print the mapping without writing")
+    args = parser.parse_args()
+    normalize_interaction_rules(args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
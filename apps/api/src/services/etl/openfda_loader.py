@@ -6,6 +6,7 @@ from typing import Optional
 from src.services.clients.openfda_client import OpenFDAClient
 from src.db.session import SessionLocal
 from src.db.models import Drug, LabelChunk
+from src.services.retrieval import rxcui_index
 
 
 def simple_chunk_text(s: str, max_chars: int = 2000):
@@ -134,6 +135,9 @@ class OpenFDALoader:
                 print(f"Ingested labels so far: {fetched}, chunks total: {total_chunks}")
                 time.sleep(0.2)
 
+            # new drugs/brands must resolve in this process right away
+            rxcui_index.refresh()
+
             return {
                 "labels_processed": total_labels,
                 "chunks_created": total_chunks,
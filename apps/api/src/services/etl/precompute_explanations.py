@@ -0,0 +1,132 @@
+# apps/api/src/services/etl/precompute_explanations.py
+# Fill the drug_explanation table with "key facts and warnings" answers for
+# the top-N drugs so /explain can serve them with one indexed lookup.
+#
+# Resumable: drugs that already have a row for the current
+# (question_template, model, corpus_version) are skipped, and failed drugs
+# are not written, so simply re-running picks up where the last run stopped.
+#
+# Rows are keyed on the catalog RxCUI (tracked medications are resolved
+# through the RxCUI index, they may hold the typed name) and generated from
+# the drug's generic name, the same name the web client sends as drugId, so
+# retrieval targets the drug's own label.
+#
+#   python -m src.services.etl.precompute_explanations --top-n 200 --concurrency 4
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Set, Tuple
+
+from sqlalchemy import func
+
+from src.core.config import settings
+from src.db.session import get_session
+from src.db.models import Drug, DrugExplanation, UserMedication
+from src.services.explanation_service import (
+    KEY_FACTS_TEMPLATE,
+    current_model,
+    generate_explanation,
+    save_precomputed,
+)
+from src.services.retrieval.rxcui_index import refresh as refresh_rxcui_index
+
+
+def top_drugs(n: int) -> List[Tuple[str, str]]:
+    """
+    (rx_cui, generic name) of the most-tracked catalog drugs first (by number
+    of UserMedication rows), then the rest of the catalog in insertion order
+    until we have n.
+    """
+    index = refresh_rxcui_index()
+    with get_session() as db:
+        popular = (
+            db.query(UserMedication.rx_cui, func.count(UserMedication.id).label("n"))
+            .group_by(UserMedication.rx_cui)
+            .order_by(func.count(UserMedication.id).desc())
+            .all()
+        )
+        rx_cuis: List[str] = []
+        for value, _ in popular:
+            rx_cui = index.resolve(value)
+            if rx_cui and rx_cui not in rx_cuis:
+                rx_cuis.append(rx_cui)
+        rx_cuis = rx_cuis[:n]
+        names = dict(db.query(Drug.rx_cui, Drug.generic_name).filter(Drug.rx_cui.in_(rx_cuis)).all())
+        out = [(rx, names.get(rx) or rx) for rx in rx_cuis]
+        if len(out) < n:
+            rest = (
+                db.query(Drug.rx_cui, Drug.generic_name)
+                .filter(~Drug.rx_cui.in_(rx_cuis))
+                .order_by(Drug.id)
+                .limit(n - len(out))
+                .all()
+            )
+            out.extend((rx, name or rx) for rx, name in rest)
+    return out
+
+
+def already_done() -> Set[str]:
+    with get_session() as db:
+        rows = (
+            db.query(DrugExplanation.rx_cui)
+            .filter(
+                DrugExplanation.question_template == KEY_FACTS_TEMPLATE,
+                DrugExplanation.model == current_model(),
+                DrugExplanation.corpus_version == settings.corpus_version,
+            )
+            .all()
+        )
+    return {r[0] for r in rows}
+
+
+def _process(rx_cui: str, name: str) -> str:
+    resp, outcome = generate_explanation(name, "")
+    if outcome == "ok":
+        with get_session() as db:
+            save_precomputed(db, rx_cui, resp)
+    return outcome
+
+
+def run(top_n: int = 200, concurrency: int = 4, force: bool = False) -> dict:
+    targets = top_drugs(top_n)
+    if not force:
+        done = already_done()
+        targets = [(rx, name) for rx, name in targets if rx not in done]
+    print(
+        f"Precomputing {len(targets)} explanation(s) "
+        f"(model={current_model()}, corpus={settings.corpus_version}, concurrency={concurrency})"
+    )
+
+    counts = {"ok": 0, "empty": 0, "error": 0}
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(_process, rx, name): rx for rx, name in targets}
+        for i, fut in enumerate(as_completed(futures), start=1):
+            rx = futures[fut]
+            try:
+                outcome = fut.result()
+            except Exception as e:
+                print(f"  ❌ rx_cui={rx}: {type(e).__name__}: {e}")
+                outcome = "error"
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if outcome != "ok":
+                print(f"  → rx_cui={rx}: {outcome} (will retry on next run)")
+            if i % 10 == 0 or i == len(targets):
+                print(f"  {i}/{len(targets)} done in {time.perf_counter() - t0:.1f}s")
+
+    print("Result:", counts)
+    return counts
+
+
+def main():
+    p = argparse.ArgumentParser(description="Precompute /explain key-facts answers into drug_explanation.")
+    p.add_argument("--top-n", type=int, default=200, help="Number of drugs to precompute")
+    p.add_argument("--concurrency", type=int, default=4, help="Max concurrent LLM calls")
+    p.add_argument("--force", action="store_true", help="Regenerate drugs that already have a row")
+    args = p.parse_args()
+    run(top_n=args.top_n, concurrency=args.concurrency, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# apps/api/src/services/explanation_service.py
+# Build /explain responses and read/write the precomputed drug_explanation store.
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..db.models import DrugExplanation
+from ..schemas.explain import ExplainResponse, Citation
+from .llm.explainer import explain_with_llm, explain_with_llm_async
+from .retrieval.rxcui_index import get_rxcui_index
+from .retrieval.retrieve import retrieve_with_citations, retrieve_with_citations_async
+
+logger = logging.getLogger(__name__)
+
+# question_template for no-question ("key facts and warnings") calls
+KEY_FACTS_TEMPLATE = "key_facts"
+# question_template for per-drug entries of the medication overview
+# (v2: generated from the catalog generic name; v1 rows could carry a user's display name)
+MED_SUMMARY_TEMPLATE = "med_summary:v2"
+
+
+def current_model() -> str:
+    if settings.llm_provider == "hf":
+        return settings.hf_model
+    if settings.llm_provider == "stub":
+        return "stub"
+    # gemini, record and replay all answer with (or as) the Gemini model
+    return settings.gemini_model
+
+
+def rx_cui_from_drug_id(drug_id: str) -> Optional[str]:
+    """
+    The web client sends a drug name (or "rxn:5640") as drugId; the store is
+    keyed on the catalog RxCUI. None when it doesn't resolve to a catalog
+    drug, so nothing is read or written under a free-text key. May load the
+    RxCUI index from the database; call off the event loop.
+    """
+    return get_rxcui_index().resolve(drug_id)
+
+
+def retrieval_query(drug_id: str, q: str) -> str:
+    return q if q else f"key facts and warnings about {drug_id}"
+
+
+def build_response(drug_id: str, q: str, citations: List[Dict], llm: Dict) -> Tuple[Dict, str]:
+    """
+    Turn LLM output ({"bullets", "used_ids"[, "error"]}) into an ExplainResponse
+    dict, keeping only the citations the model actually used.
+    """
+    keep = citations
+    used: List[int] = []
+    if llm.get("used_ids"):
+        idx = {c["id"]: c for c in citations}
+        sel = [idx[i] for i in llm["used_ids"] if i in idx]
+        if sel:
+            keep = sel
+            used = [c["id"] for c in sel]
+
+    resp = ExplainResponse(
+        drugId=drug_id,
+        question=q or None,
+        summary=(llm.get("bullets") or [f"{drug_id}: explanation unavailable from current context."]),
+        citations=[Citation(**c) for c in keep],
+        usedCitationIds=used,
+    ).model_dump()
+    outcome = "error" if (llm.get("error") or not llm.get("bullets")) else "ok"
+    return resp, outcome
+
+
+def db_error_response(drug_id: str, q: str, e: Exception) -> Dict:
+    # Log the real DB error and surface it to the client for debugging
+    logger.exception("DB error in retrieve_with_citations: %s", e)
+    msg = f"Database error: {type(e).__name__}: {e}"
+    return ExplainResponse(
+        drugId=drug_id,
+        question=q or None,
+        summary=[
+            msg,
+            "Check that the label_chunk table exists and pgvector is configured."
+        ],
+        citations=[],
+    ).model_dump()
+
+
+def empty_response(drug_id: str, q: str) -> Dict:
+    # No DB error; just no chunks found
+    return ExplainResponse(
+        drugId=drug_id,
+        question=q or None,
+        summary=[f"No context available for '{drug_id}'. Try loading chunks first."],
+        citations=[],
+    ).model_dump()
+
+
+def generate_explanation(drug_id: str, q: str) -> Tuple[Dict, str]:
+    """
+    Retrieve context and call the LLM.
+
+    Returns (response dict, outcome) where outcome is one of
+    "ok", "empty" (no context chunks) or "error" (DB or LLM failure).
+    """
+    try:
+        retrieved = retrieve_with_citations(retrieval_query(drug_id, q), k=4)
+        citations = retrieved.get("citations", [])
+    except SQLAlchemyError as e:
+        return db_error_response(drug_id, q, e), "error"
+
+    if not citations:
+        return empty_response(drug_id, q), "empty"
+
+    llm = explain_with_llm(drug_id, q, citations)
+    return build_response(drug_id, q, citations, llm)
+
+
+async def generate_explanation_async(drug_id: str, q: str) -> Tuple[Dict, str]:
+    """Async variant of generate_explanation (same return shape)."""
+    try:
+        retrieved = await retrieve_with_citations_async(retrieval_query(drug_id, q), k=4)
+        citations = retrieved.get("citations", [])
+    except SQLAlchemyError as e:
+        return db_error_response(drug_id, q, e), "error"
+
+    if not citations:
+        return empty_response(drug_id, q), "empty"
+
+    llm = await explain_with_llm_async(drug_id, q, citations)
+    return build_response(drug_id, q, citations, llm)
+
+
+def _precomputed_query(rx_cui: str, template: str):
+    return select(DrugExplanation.response).where(
+        DrugExplanation.rx_cui == rx_cui,
+        DrugExplanation.question_template == template,
+        DrugExplanation.model == current_model(),
+        DrugExplanation.corpus_version == settings.corpus_version,
+    ).limit(1)
+
+
+def _precomputed_upsert(rx_cui: str, response: Dict, template: str):
+    return pg_insert(DrugExplanation).values(
+        rx_cui=rx_cui,
+        question_template=template,
+        model=current_model(),
+        corpus_version=settings.corpus_version,
+        response=response,
+    ).on_conflict_do_update(
+        constraint="uq_drug_explanation_key",
+        set_={"response": response},
+    )
+
+
+def save_precomputed(db: Session, rx_cui: str, response: Dict, template: str = KEY_FACTS_TEMPLATE) -> None:
+    db.execute(_precomputed_upsert(rx_cui, response, template))
+    db.commit()
+
+
+async def get_precomputed_async(db: AsyncSession, rx_cui: str, template: str = KEY_FACTS_TEMPLATE) -> Optional[Dict]:
+    return (await db.execute(_precomputed_query(rx_cui, template))).scalar_one_or_none()
+
+
+async def get_precomputed_many_async(
+    db: AsyncSession, rx_cuis: List[str], template: str = KEY_FACTS_TEMPLATE,
+) -> Dict[str, Dict]:
+    """{rx_cui: response} for every rx_cui that has a stored answer."""
+    rows = await db.execute(
+        select(DrugExplanation.rx_cui, DrugExplanation.response).where(
+            DrugExplanation.rx_cui.in_(rx_cuis),
+            DrugExplanation.question_template == template,
+            DrugExplanation.model == current_model(),
+            DrugExplanation.corpus_version == settings.corpus_version,
+        )
+    )
+    return {rx_cui: response for rx_cui, response in rows.all()}
+
+
+async def save_precomputed_async(db: AsyncSession, rx_cui: str, response: Dict, template: str = KEY_FACTS_TEMPLATE) -> None:
+    await db.execute(_precomputed_upsert(rx_cui, response, template))
+    await db.commit()
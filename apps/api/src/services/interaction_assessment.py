@@ -0,0 +1,216 @@
+# apps/api/src/services/interaction_assessment.py
+# LLM fallback for POST /interactions: assess a drug pair that has no
+# interaction_rule yet from the two drugs' own label text.
+#
+# - one query fetches both drugs' drug_interactions and warnings_and_cautions
+#   chunks; chunks that name the other drug go first, then they are packed
+#   into INTERACTION_ASSESS_CONTEXT_TOKENS;
+# - the LLM answers with a severity and the [C<i>] citations it relied on;
+#   an interaction claim without a valid citation (or with an unknown
+#   severity) counts as a failed assessment; only the model's own "none" is
+#   stored as "assessed, no interaction";
+# - the answer is written once per canonical pair as a provisional
+#   interaction_rule (INSERT ... ON CONFLICT DO NOTHING), so the pair is never
+#   sent to the LLM again, by any user or process; the extractor replaces it
+#   when it finds a rule for the pair in a label;
+# - concurrent requests for one pair share a single assessment (singleflight).
+#
+# Pairs without any label text, or whose LLM call or answer fails, are not stored and
+# are retried on a later request.
+
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..core import singleflight
+from ..core.config import settings
+from ..db.models import Drug, InteractionRule, LabelChunk
+from ..db.session import AsyncSessionLocal
+from .interaction_graph import NO_INTERACTION, SEVERITY_RANK, Rule, invalidate, pair_key, severity_rank
+from .llm.context_packer import count_tokens
+from .llm.providers import TASK_INTERACTION_ASSESS, get_provider
+from .retrieval.drug_matcher import DrugMatcher, get_drug_matcher
+
+logger = logging.getLogger(__name__)
+
+ASSESS_SECTIONS = ("drug_interactions", "warnings_and_cautions")
+
+SYSTEM_ASSESS = """You are a clinical pharmacology assistant reviewing FDA drug label text.
+Requirements:
+- Judge ONLY from the provided CONTEXT; do not use outside knowledge.
+- If the context does not describe an interaction between the two drugs (by name or by a class
+  that clearly includes the drug), answer severity "none".
+- Cite the snippets you relied on by their [C<i>] index.
+- Return strict JSON only.
+"""
+
+ASSESS_PROMPT = """DRUG A: {a_name} (RxCUI {a_rx_cui})
+DRUG B: {b_name} (RxCUI {b_rx_cui})
+
+CONTEXT (label excerpts):
+{context}
+
+TASK:
+Does taking drug A together with drug B cause a clinically relevant interaction, according to the context?
+
+Return JSON:
+{{"severity": "contraindicated" | "major" | "moderate" | "minor" | "none",
+  "mechanism": "one sentence on what happens and why (empty if none)",
+  "guidance": "one sentence of consumer-level guidance, no dosing instructions",
+  "used_citation_ids": [1, 2]}}
+"""
+
+_JSON_BLOCK = re.compile(r"\{[\s\S]*\}")
+
+# chunk id, rx_cui, section, text, drug name
+_Chunk = Tuple[int, str, str, str, Optional[str]]
+
+
+async def _label_chunks(a_rx_cui: str, b_rx_cui: str) -> List[_Chunk]:
+    """Both drugs' interaction and warning chunks, with their generic names, in one query."""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(LabelChunk.id, LabelChunk.rx_cui, LabelChunk.section, LabelChunk.chunk_text, Drug.generic_name)
+            .outerjoin(Drug, Drug.rx_cui == LabelChunk.rx_cui)
+            .where(LabelChunk.rx_cui.in_((a_rx_cui, b_rx_cui)), LabelChunk.section.in_(ASSESS_SECTIONS))
+            .order_by(LabelChunk.id)
+        )).all()
+    return [tuple(r) for r in rows]
+
+
+def select_context(a_rx_cui: str, b_rx_cui: str, chunks: List[_Chunk], max_tokens: int,
+                   matcher: DrugMatcher) -> List[_Chunk]:
+    """
+    Chunks to show the LLM, within `max_tokens`: those that name the other
+    drug (per the catalog `matcher`) first, then drug_interactions before
+    warnings_and_cautions, each drug's label in turn.
+    """
+    def names_other(c: _Chunk) -> bool:
+        other = b_rx_cui if c[1] == a_rx_cui else a_rx_cui
+        return any(m.rx_cui == other for m in matcher.find(c[3] or "", fuzzy=False))
+
+    ranked = sorted(chunks, key=lambda c: (not names_other(c), ASSESS_SECTIONS.index(c[2]), c[0]))
+    out, used = [], 0
+    for c in ranked:
+        tokens = count_tokens(c[3] or "")
+        if out and used + tokens > max_tokens:
+            continue
+        out.append(c)
+        used += tokens
+    return out
+
+
+def _prompt(a_rx_cui: str, b_rx_cui: str, context: List[_Chunk]) -> str:
+    names = {c[1]: c[4] for c in context if c[4]}
+    lines = []
+    for i, (_, rx_cui, section, chunk_text, name) in enumerate(context, start=1):
+        snippet = (chunk_text or "").replace("\n", " ").strip()
+        lines.append(f"[C{i}] ({name or rx_cui} – {section}): {snippet}")
+    return ASSESS_PROMPT.format(
+        a_name=names.get(a_rx_cui, a_rx_cui), a_rx_cui=a_rx_cui,
+        b_name=names.get(b_rx_cui, b_rx_cui), b_rx_cui=b_rx_cui,
+        context="\n".join(lines),
+    )
+
+
+def parse_assessment(raw: str, context: List[_Chunk]) -> Dict:
+    """
+    {"severity", "severity_rank", "mechanism", "guidance", "evidence_ids"}
+    with the cited [C<i>] indices mapped to label_chunk ids. Raises
+    ValueError for unknown severities and uncited interaction claims, so they
+    are retried rather than stored.
+    """
+    text = (raw or "").strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        m = _JSON_BLOCK.search(text)
+        if not m:
+            raise
+        data = json.loads(m.group(0))
+    if not isinstance(data, dict):
+        raise ValueError(f"LLM returned non-object JSON: {text[:200]!r}")
+
+    cited = []
+    for i in data.get("used_citation_ids") or []:
+        if isinstance(i, int) and not isinstance(i, bool) and 1 <= i <= len(context):
+            cited.append(context[i - 1][0])
+    evidence = sorted(set(cited))
+
+    severity = str(data.get("severity") or "").strip().lower()
+    if severity != NO_INTERACTION:
+        if severity not in SEVERITY_RANK:
+            raise ValueError(f"unknown severity {severity!r}")
+        if not evidence:
+            raise ValueError(f"{severity} interaction claimed without a valid citation")
+    return {
+        "severity": severity,
+        "severity_rank": severity_rank(severity),
+        "mechanism": str(data.get("mechanism") or "").strip() if severity != NO_INTERACTION else "",
+        "guidance": str(data.get("guidance") or "").strip(),
+        "evidence_ids": evidence,
+    }
+
+
+async def _store(a_rx_cui: str, b_rx_cui: str, assessment: Dict) -> Rule:
+    """Insert the provisional rule unless the pair got one meanwhile; returns the pair's stored rule."""
+    values = dict(assessment, a_rx_cui=a_rx_cui, b_rx_cui=b_rx_cui, provisional=True)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            pg_insert(InteractionRule).values(**values).on_conflict_do_nothing(index_elements=["a_rx_cui", "b_rx_cui"])
+        )
+        await db.commit()
+        row = (await db.execute(
+            select(InteractionRule).where(InteractionRule.a_rx_cui == a_rx_cui, InteractionRule.b_rx_cui == b_rx_cui)
+        )).scalar_one()
+    # this process sees the new rule on its next request
+    invalidate()
+    return Rule(row.id, row.a_rx_cui, row.b_rx_cui, row.severity, row.mechanism, row.guidance,
+                tuple(row.evidence_ids or ()), row.provisional)
+
+
+async def _assess(a_rx_cui: str, b_rx_cui: str) -> Optional[Rule]:
+    try:
+        chunks = await _label_chunks(a_rx_cui, b_rx_cui)
+        if not chunks:
+            return None
+        # the catalog matcher loads (and periodically reloads) from the database
+        matcher = await asyncio.to_thread(get_drug_matcher)
+        context = select_context(a_rx_cui, b_rx_cui, chunks, settings.interaction_assess_context_tokens, matcher)
+        raw = await get_provider().generate_async(
+            _prompt(a_rx_cui, b_rx_cui, context),
+            task=TASK_INTERACTION_ASSESS,
+            system=SYSTEM_ASSESS,
+            json_mode=True,
+            temperature=0.0,
+            timeout=settings.llm_deadline_s,
+            validate=lambda text: parse_assessment(text, context),
+        )
+        return await _store(a_rx_cui, b_rx_cui, parse_assessment(raw, context))
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("interaction assessment %s/%s: database error: %s", a_rx_cui, b_rx_cui, e)
+    except Exception as e:
+        logger.warning("interaction assessment %s/%s failed: %s: %s", a_rx_cui, b_rx_cui, type(e).__name__, e)
+    return None
+
+
+async def assess_pair(a_rx_cui: str, b_rx_cui: str) -> Optional[Rule]:
+    """
+    The provisional rule for a pair without an interaction_rule (severity
+    "none" if the labels don't describe an interaction); None when it
+    couldn't be assessed.
+    """
+    a, b = pair_key(a_rx_cui, b_rx_cui)
+    return await singleflight.do_async(f"interaction-assess:{a}:{b}", lambda: _assess(a, b))
+
+
+async def assess_pairs(pairs: List[Tuple[str, str]]) -> List[Rule]:
+    """assess_pair for up to INTERACTION_ASSESS_MAX_PAIRS pairs, concurrently."""
+    results = await asyncio.gather(*(assess_pair(a, b) for a, b in pairs[:settings.interaction_assess_max_pairs]))
+    return [r for r in results if r is not None]
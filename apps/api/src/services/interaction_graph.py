@@ -0,0 +1,180 @@
+# apps/api/src/services/interaction_graph.py
+# In-process, symmetric view of interaction_rule for /interactions.
+#
+# interaction_rule stores one row per pair in canonical order (a < b); rules
+# are keyed by that pair here too, and every drug
+# keeps the set of drugs it interacts with, so checking an N-drug list is N
+# set intersections instead of SQL, and a pair is found from either side.
+#
+# Provisional rules written by the LLM fallback (interaction_assessment.py)
+# are served like extracted ones; those with severity "none" only mark the
+# pair as already assessed, so it isn't sent to the LLM again.
+#
+# A statement trigger bumps interaction_rule_version on every write to
+# interaction_rule (extractor, backfills, manual fixes). Each process checks
+# that counter at most every INTERACTION_GRAPH_CHECK_S seconds and reloads
+# the graph when it moved.
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.config import settings
+from src.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+# higher is worse; anything else ("unknown", free text) ranks 0
+SEVERITY_RANK = {"contraindicated": 4, "major": 3, "moderate": 2, "minor": 1}
+# severity of a provisional rule for a pair assessed as not interacting
+NO_INTERACTION = "none"
+
+_VERSION = text("SELECT version FROM interaction_rule_version WHERE id = 1")
+_RULES = text("""
+    SELECT id, a_rx_cui, b_rx_cui, severity, mechanism, guidance, evidence_ids, provisional
+    FROM interaction_rule
+""")
+
+
+def severity_rank(severity: Optional[str]) -> int:
+    return SEVERITY_RANK.get((severity or "").strip().lower(), 0)
+
+
+def pair_key(a: str, b: str) -> Tuple[str, str]:
+    return (a, b) if a <= b else (b, a)
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: int
+    a_rx_cui: str
+    b_rx_cui: str
+    severity: str
+    mechanism: str
+    guidance: str
+    # label_chunk ids the rule was extracted from
+    evidence_ids: Tuple[int, ...] = ()
+    # LLM assessment, not extracted from a label
+    provisional: bool = False
+
+    @property
+    def rank(self) -> int:
+        return severity_rank(self.severity)
+
+    def facing(self, rx_cui: str) -> "Rule":
+        """The same rule with `rx_cui` as a_rx_cui."""
+        if self.a_rx_cui == rx_cui:
+            return self
+        return Rule(self.id, self.b_rx_cui, self.a_rx_cui, self.severity, self.mechanism, self.guidance,
+                    self.evidence_ids, self.provisional)
+
+
+class InteractionGraph:
+    def __init__(self, rules: Iterable[Rule], version: int = -1):
+        self.version = version
+        self._pairs: Dict[Tuple[str, str], List[Rule]] = {}
+        self._adj: Dict[str, Set[str]] = {}
+        # pairs assessed as not interacting
+        self._cleared: Set[Tuple[str, str]] = set()
+        n = 0
+        for r in rules:
+            if not r.a_rx_cui or not r.b_rx_cui or r.a_rx_cui == r.b_rx_cui:
+                continue
+            if r.provisional and r.severity == NO_INTERACTION:
+                self._cleared.add(pair_key(r.a_rx_cui, r.b_rx_cui))
+                continue
+            self._pairs.setdefault(pair_key(r.a_rx_cui, r.b_rx_cui), []).append(r)
+            self._adj.setdefault(r.a_rx_cui, set()).add(r.b_rx_cui)
+            self._adj.setdefault(r.b_rx_cui, set()).add(r.a_rx_cui)
+            n += 1
+        for rules_ in self._pairs.values():
+            rules_.sort(key=lambda r: (-r.rank, r.id))
+        self.size = n
+
+    def rules(self, a: str, b: str) -> List[Rule]:
+        """Rules for the pair in either direction, most severe first."""
+        return self._pairs.get(pair_key(a, b), [])
+
+    def known(self, a: str, b: str) -> bool:
+        """Whether the pair has a rule or was already assessed as not interacting."""
+        key = pair_key(a, b)
+        return key in self._pairs or key in self._cleared
+
+    def pairs_among(self, rx_cuis: Iterable[str]) -> List[Tuple[str, str, List[Rule]]]:
+        """
+        Every interacting pair within `rx_cuis` as (a, b, rules) with a < b,
+        most severe pair first.
+        """
+        ids = set(rx_cuis)
+        out = []
+        for a in ids:
+            for b in self._adj.get(a, set()) & ids:
+                if a < b:
+                    out.append((a, b, self._pairs[(a, b)]))
+        out.sort(key=lambda p: (-p[2][0].rank, p[0], p[1]))
+        return out
+
+    def for_drug(self, rx_cui: str) -> List[Rule]:
+        """Every rule involving `rx_cui`, facing it, most severe first."""
+        out = [r.facing(rx_cui) for b in self._adj.get(rx_cui, ()) for r in self.rules(rx_cui, b)]
+        out.sort(key=lambda r: (-r.rank, r.b_rx_cui, r.id))
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {"version": self.version, "rules": self.size, "pairs": len(self._pairs), "drugs": len(self._adj),
+                "cleared_pairs": len(self._cleared)}
+
+
+# ---------------- process-wide graph ----------------
+
+_GRAPH: Optional[InteractionGraph] = None
+_CHECKED_AT = 0.0
+_LOCK = threading.Lock()
+
+
+def _load(db, version: int) -> InteractionGraph:
+    t0 = time.perf_counter()
+    graph = InteractionGraph(
+        (Rule(*row[:6], tuple(row[6] or ()), bool(row[7])) for row in db.execute(_RULES)), version,
+    )
+    logger.info("interaction graph: %s in %.0f ms", graph.stats(), (time.perf_counter() - t0) * 1000)
+    return graph
+
+
+def get_interaction_graph() -> InteractionGraph:
+    """
+    The current graph. Reloads when interaction_rule_version has moved; if
+    the database can't be read, keeps serving the last graph (empty at first).
+    """
+    global _GRAPH, _CHECKED_AT
+    with _LOCK:
+        if _GRAPH is not None and time.monotonic() - _CHECKED_AT < settings.interaction_graph_check_s:
+            return _GRAPH
+        try:
+            with get_session() as db:
+                version = db.execute(_VERSION).scalar()
+                version = -1 if version is None else int(version)
+                if _GRAPH is None or version != _GRAPH.version or version == -1:
+                    _GRAPH = _load(db, version)
+        except (SQLAlchemyError, OSError) as e:
+            logger.warning("interaction graph: could not refresh: %s", e)
+            if _GRAPH is None:
+                _GRAPH = InteractionGraph([])
+        _CHECKED_AT = time.monotonic()
+        return _GRAPH
+
+
+def invalidate() -> None:
+    """Check the version on the next access (after writing rules in this process)."""
+    global _CHECKED_AT
+    _CHECKED_AT = 0.0
+
+
+async def get_interaction_graph_async() -> InteractionGraph:
+    return await asyncio.to_thread(get_interaction_graph)
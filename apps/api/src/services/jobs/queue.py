@@ -0,0 +1,210 @@
+# apps/api/src/services/jobs/queue.py
+# Postgres-backed job queue (table background_job); no external broker.
+#
+# Producers call enqueue()/enqueue_async(). A queued job with the same
+# (kind, dedupe_key) absorbs repeat enqueues, so a burst of medication edits
+# yields one recomputation. Workers claim with FOR UPDATE SKIP LOCKED, so any
+# number of worker processes can poll the same table without double-running.
+# A running job holds a lease (locked_at) that its worker renews with
+# heartbeat() while the handler runs; the reaper takes back jobs whose lease
+# expired (worker died) and fails them once they have used JOB_MAX_ATTEMPTS.
+# It also deletes done and failed jobs older than JOB_RETENTION_S, except the
+# newest done job per (kind, dedupe_key), which latest_done() serves.
+
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from src.core.config import settings
+from src.db.models import BackgroundJob
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _insert(kind: str, dedupe_key: str, payload: Dict[str, Any]):
+    return (
+        pg_insert(BackgroundJob)
+        .values(kind=kind, dedupe_key=dedupe_key, payload=payload, status=QUEUED, attempts=0)
+        .on_conflict_do_nothing(
+            index_elements=["kind", "dedupe_key"],
+            index_where=text("status = 'queued'"),
+        )
+        .returning(BackgroundJob.id)
+    )
+
+
+def _queued_id(kind: str, dedupe_key: str):
+    return select(BackgroundJob.id).where(
+        BackgroundJob.kind == kind,
+        BackgroundJob.dedupe_key == dedupe_key,
+        BackgroundJob.status == QUEUED,
+    )
+
+
+def enqueue(db: Session, kind: str, dedupe_key: str, payload: Dict[str, Any]) -> int:
+    """Queue a job (or reuse the one already queued for this key) and commit. Returns its id."""
+    job_id = db.execute(_insert(kind, dedupe_key, payload)).scalar()
+    if job_id is None:
+        job_id = db.execute(_queued_id(kind, dedupe_key)).scalar()
+    db.commit()
+    return job_id
+
+
+async def enqueue_async(db: AsyncSession, kind: str, dedupe_key: str, payload: Dict[str, Any]) -> int:
+    job_id = (await db.execute(_insert(kind, dedupe_key, payload))).scalar()
+    if job_id is None:
+        job_id = (await db.execute(_queued_id(kind, dedupe_key))).scalar()
+    await db.commit()
+    return job_id
+
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[BackgroundJob]:
+    return await db.get(BackgroundJob, job_id)
+
+
+async def latest_done(db: AsyncSession, kind: str, dedupe_key: str) -> Optional[BackgroundJob]:
+    return (
+        await db.execute(
+            select(BackgroundJob)
+            .where(
+                BackgroundJob.kind == kind,
+                BackgroundJob.dedupe_key == dedupe_key,
+                BackgroundJob.status == DONE,
+            )
+            .order_by(BackgroundJob.id.desc())
+            .limit(1)
+        )
+    ).scalars().first()
+
+
+# ---------------- worker side ----------------
+
+_CLAIM = text("""
+    UPDATE background_job
+    SET status = 'running', locked_at = now(), updated_at = now(), attempts = attempts + 1
+    WHERE id = (
+        SELECT id FROM background_job
+        WHERE status = 'queued' AND run_after <= now()
+        ORDER BY run_after, id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, kind, payload, attempts
+""")
+
+
+async def claim(db: AsyncSession) -> Optional[Dict[str, Any]]:
+    """Take the oldest runnable job, or None if there is nothing to do."""
+    row = (await db.execute(_CLAIM)).mappings().first()
+    await db.commit()
+    return dict(row) if row else None
+
+
+async def heartbeat(db: AsyncSession, job_id: int) -> bool:
+    """Renew a running job's lease. False if the job is no longer ours (the reaper took it back)."""
+    result = await db.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id, BackgroundJob.status == RUNNING)
+        .values(locked_at=func.now(), updated_at=func.now())
+    )
+    await db.commit()
+    return bool(result.rowcount)
+
+
+async def complete(db: AsyncSession, job_id: int, result: Dict[str, Any]) -> None:
+    await db.execute(
+        update(BackgroundJob)
+        .where(BackgroundJob.id == job_id)
+        .values(status=DONE, result=result, error=None, locked_at=None, updated_at=func.now())
+    )
+    await db.commit()
+
+
+async def fail(db: AsyncSession, job_id: int, attempts: int, error: str) -> None:
+    """Retry with exponential backoff until JOB_MAX_ATTEMPTS, then mark failed."""
+    if attempts < settings.job_max_attempts:
+        values = dict(
+            status=QUEUED,
+            run_after=func.now() + func.make_interval(0, 0, 0, 0, 0, 0, 2 ** attempts),
+        )
+    else:
+        values = dict(status=FAILED)
+    try:
+        await db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(error=error[:2000], locked_at=None, updated_at=func.now(), **values)
+        )
+        await db.commit()
+    except IntegrityError:
+        # a newer job for the same key is already queued; this one just fails
+        await db.rollback()
+        await db.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id)
+            .values(status=FAILED, error=error[:2000], locked_at=None, updated_at=func.now())
+        )
+        await db.commit()
+
+
+_SUPERSEDE_EXPIRED = text("""
+    UPDATE background_job j
+    SET status = 'failed', error = 'lease expired; superseded by a newer job', locked_at = NULL, updated_at = now()
+    WHERE j.status = 'running'
+      AND j.locked_at < now() - make_interval(secs => :lease)
+      AND EXISTS (
+          SELECT 1 FROM background_job n
+          WHERE n.kind = j.kind AND n.dedupe_key = j.dedupe_key AND n.id > j.id
+      )
+""")
+
+# a job that keeps taking its worker down must not be retried forever
+_FAIL_EXPIRED = text("""
+    UPDATE background_job
+    SET status = 'failed', error = 'lease expired on the last attempt', locked_at = NULL, updated_at = now()
+    WHERE status = 'running'
+      AND locked_at < now() - make_interval(secs => :lease)
+      AND attempts >= :max_attempts
+""")
+
+_REQUEUE_EXPIRED = text("""
+    UPDATE background_job
+    SET status = 'queued', locked_at = NULL, updated_at = now()
+    WHERE status = 'running' AND locked_at < now() - make_interval(secs => :lease)
+""")
+
+
+async def requeue_expired(db: AsyncSession) -> int:
+    """
+    Put running jobs whose worker died (lease expired) back in the queue.
+    If a newer job exists for the same key, or the job has used
+    JOB_MAX_ATTEMPTS, the stale one is failed instead.
+    """
+    params = {"lease": settings.job_lease_s}
+    await db.execute(_SUPERSEDE_EXPIRED, params)
+    await db.execute(_FAIL_EXPIRED, dict(params, max_attempts=settings.job_max_attempts))
+    result = await db.execute(_REQUEUE_EXPIRED, params)
+    await db.commit()
+    return result.rowcount or 0
+
+
+_PURGE_FINISHED = text("""
+    DELETE FROM background_job j
+    WHERE j.status IN ('done', 'failed')
+      AND j.updated_at < now() - make_interval(secs => :retention)
+      AND j.id <> COALESCE((
+          SELECT max(n.id) FROM background_job n
+          WHERE n.kind = j.kind AND n.dedupe_key = j.dedupe_key AND n.status = 'done'
+      ), 0)
+""")
+
+
+async def purge_finished(db: AsyncSession) -> int:
+    """Delete finished jobs past JOB_RETENTION_S; the newest done job per key stays for latest_done()."""
+    result = await db.execute(_PURGE_FINISHED, {"retention": settings.job_retention_s})
+    await db.commit()
+    return result.rowcount or 0
@@ -0,0 +1,127 @@
+# apps/api/src/services/jobs/worker.py
+# Job worker: claims background_job rows and runs their handler.
+#
+# Run one or more of these next to the API (each process runs
+# JOB_WORKER_CONCURRENCY claim loops):
+#
+#   python -m src.services.jobs.worker --concurrency 4
+
+import argparse
+import asyncio
+import logging
+import signal
+from typing import Any, Awaitable, Callable, Dict
+
+from src.core.config import settings
+from src.db.session import AsyncSessionLocal
+from src.services.etl.interaction_from_labels import EXTRACT_INTERACTIONS_JOB, run_extraction_job
+from src.services.med_overview_service import OVERVIEW_JOB, run_overview_job
+from src.services.jobs import queue
+
+logger = logging.getLogger(__name__)
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    OVERVIEW_JOB: run_overview_job,
+    EXTRACT_INTERACTIONS_JOB: run_extraction_job,
+}
+
+
+async def _heartbeat(job: Dict[str, Any]) -> None:
+    """Renew the job's lease while its handler runs (extraction jobs run for hours)."""
+    while True:
+        await asyncio.sleep(settings.job_lease_s / 3)
+        try:
+            async with AsyncSessionLocal() as db:
+                if not await queue.heartbeat(db, job["id"]):
+                    logger.warning("job %s (%s) lost its lease", job["id"], job["kind"])
+        except Exception as e:
+            # a missed beat is fine; the lease covers a few of them
+            logger.warning("heartbeat for job %s failed: %s", job["id"], e)
+
+
+async def run_one() -> bool:
+    """Claim and run a single job. Returns False if the queue was empty."""
+    async with AsyncSessionLocal() as db:
+        job = await queue.claim(db)
+    if job is None:
+        return False
+
+    handler = HANDLERS.get(job["kind"])
+    beat = asyncio.ensure_future(_heartbeat(job))
+    try:
+        if handler is None:
+            raise LookupError(f"no handler for job kind {job['kind']!r}")
+        result = await handler(job["payload"])
+    except Exception as e:
+        logger.exception("job %s (%s) failed on attempt %d", job["id"], job["kind"], job["attempts"])
+        async with AsyncSessionLocal() as db:
+            await queue.fail(db, job["id"], job["attempts"], f"{type(e).__name__}: {e}")
+        return True
+    finally:
+        beat.cancel()
+
+    async with AsyncSessionLocal() as db:
+        await queue.complete(db, job["id"], result)
+    logger.info("job %s (%s) done", job["id"], job["kind"])
+    return True
+
+
+async def _claim_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            worked = await run_one()
+        except Exception as e:
+            # DB hiccup while claiming/completing; back off and keep going
+            logger.exception("worker loop error: %s", e)
+            worked = False
+        if not worked:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.job_poll_interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _reaper_loop(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            async with AsyncSessionLocal() as db:
+                n = await queue.requeue_expired(db)
+                purged = await queue.purge_finished(db)
+            if n:
+                logger.warning("requeued %d job(s) with expired leases", n)
+            if purged:
+                logger.info("deleted %d finished job(s) past retention", purged)
+        except Exception as e:
+            logger.exception("reaper error: %s", e)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.job_lease_s / 2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run(concurrency: int) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # finish the jobs in hand, then exit
+        loop.add_signal_handler(sig, stop.set)
+
+    logger.info("job worker started with %d loop(s)", concurrency)
+    await asyncio.gather(
+        _reaper_loop(stop),
+        *(_claim_loop(stop) for _ in range(max(1, concurrency))),
+    )
+
+
+def main():
+    p = argparse.ArgumentParser(description="Run the background job worker.")
+    p.add_argument("--concurrency", type=int, default=settings.job_worker_concurrency,
+                   help="Concurrent jobs in this process")
+    args = p.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# apps/api/src/services/llm/context_packer.py
+# Fit retrieved citations for the medication-list overview into a token budget.
+#
+# - every medication keeps its best snippet (trimmed if needed), so no drug
+#   drops out of the prompt entirely;
+# - near-identical snippets (shared label text across drugs, combination
+#   products) are kept once, by word-shingle Jaccard similarity;
+# - remaining snippets are added by relevance score until the per-drug or
+#   total budget runs out.
+#
+# The per-drug share shrinks as the list grows (total // n_meds), so prompt
+# size is bounded by MED_CONTEXT_TOTAL_TOKENS no matter how many meds a
+# patient has.
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from src.core.config import settings
+
+_WORD = re.compile(r"\w+")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Provider-agnostic estimate (~4 characters per token for English label
+    text). Good enough for budgeting; we never need an exact count here.
+    """
+    return max(1, math.ceil(len(text or "") / 4))
+
+
+def _shingles(text: str, n: int = 3) -> Set[Tuple[str, ...]]:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _jaccard(a: Set, b: Set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _trim(text: str, max_tokens: int) -> str:
+    # leave room for the ellipsis so the result still counts as <= max_tokens
+    limit = max_tokens * 4 - 1
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + "…"
+
+
+def _relevance(c: Dict[str, Any], rank: int) -> float:
+    # vector similarity when we have it, otherwise fall back to retrieval rank
+    score = c.get("score")
+    return float(score) if score is not None else 1.0 / (1 + rank)
+
+
+def pack_med_list_context(
+    medications: List[Dict[str, Any]],
+    citations: List[Dict[str, Any]],
+    total_budget: Optional[int] = None,
+    per_drug_budget: Optional[int] = None,
+    dedupe_threshold: Optional[float] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Select and order citations for the med-list overview's per-drug summaries.
+
+    `citations` carry "drug_name" (the medication they were retrieved for)
+    and optionally "score". Returns (packed citations ordered by relevance,
+    packing stats). Citation ids are preserved.
+    """
+    total_budget = settings.med_context_total_tokens if total_budget is None else total_budget
+    per_drug_cap = settings.med_context_per_drug_tokens if per_drug_budget is None else per_drug_budget
+    threshold = settings.med_context_dedupe_threshold if dedupe_threshold is None else dedupe_threshold
+
+    n_meds = max(1, len(medications))
+    # the min-snippet floor applies only while every drug's share still fits the total
+    share = total_budget // n_meds
+    per_drug_budget = min(max(settings.med_context_min_snippet_tokens, min(per_drug_cap, share)), share)
+
+    ranks: Dict[str, int] = {}
+    scored: List[Tuple[float, Dict[str, Any]]] = []
+    for c in citations:
+        drug = c.get("drug_name") or c.get("rx_cui") or ""
+        rank = ranks.get(drug, 0)
+        ranks[drug] = rank + 1
+        scored.append((_relevance(c, rank), c))
+    scored.sort(key=lambda sc: sc[0], reverse=True)
+
+    stats = {
+        "medications": len(medications),
+        "input_snippets": len(citations),
+        "input_tokens": sum(count_tokens(c.get("snippet") or "") for c in citations),
+        "total_budget": total_budget,
+        "per_drug_budget": per_drug_budget,
+        "deduped": 0,
+        "dropped_over_budget": 0,
+        "truncated": 0,
+    }
+
+    kept: List[Tuple[float, Dict[str, Any]]] = []
+    kept_shingles: List[Set] = []
+    used_by_drug: Dict[str, int] = {}
+    used_total = 0
+
+    def duplicate(sh: Set) -> bool:
+        return any(_jaccard(sh, other) >= threshold for other in kept_shingles)
+
+    def take(score: float, c: Dict[str, Any], sh: Set, tokens: int, snippet: str) -> None:
+        nonlocal used_total
+        drug = c.get("drug_name") or c.get("rx_cui") or ""
+        kept.append((score, {**c, "snippet": snippet}))
+        kept_shingles.append(sh)
+        used_by_drug[drug] = used_by_drug.get(drug, 0) + tokens
+        used_total += tokens
+
+    # Pass 1: best snippet per drug, trimmed to the per-drug share
+    firsts = {}
+    for score, c in scored:
+        drug = c.get("drug_name") or c.get("rx_cui") or ""
+        firsts.setdefault(drug, (score, c))
+    taken = set()
+    for drug, (score, c) in firsts.items():
+        snippet = c.get("snippet") or ""
+        sh = _shingles(snippet)
+        if duplicate(sh):
+            stats["deduped"] += 1
+            taken.add(id(c))
+            continue
+        if count_tokens(snippet) > per_drug_budget:
+            snippet = _trim(snippet, per_drug_budget)
+            stats["truncated"] += 1
+        tokens = count_tokens(snippet)
+        if used_total + tokens > total_budget:
+            stats["dropped_over_budget"] += 1
+            taken.add(id(c))
+            continue
+        take(score, c, sh, tokens, snippet)
+        taken.add(id(c))
+
+    # Pass 2: everything else by relevance, whole snippets only
+    for score, c in scored:
+        if id(c) in taken:
+            continue
+        snippet = c.get("snippet") or ""
+        sh = _shingles(snippet)
+        if duplicate(sh):
+            stats["deduped"] += 1
+            continue
+        drug = c.get("drug_name") or c.get("rx_cui") or ""
+        tokens = count_tokens(snippet)
+        if used_by_drug.get(drug, 0) + tokens > per_drug_budget or used_total + tokens > total_budget:
+            stats["dropped_over_budget"] += 1
+            continue
+        take(score, c, sh, tokens, snippet)
+
+    kept.sort(key=lambda sc: sc[0], reverse=True)
+    packed = [c for _, c in kept]
+    stats["kept_snippets"] = len(packed)
+    stats["packed_tokens"] = used_total
+    return packed, stats
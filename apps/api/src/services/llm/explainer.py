@@ -1,16 +1,18 @@
 # apps/api/src/services/llm/explainer.py
-import os, json, re
-from typing import List, Dict
+import json, re, time
+from typing import List, Dict, Iterator, Optional, Tuple
 import logging
 from ..retrieval.retrieve import retrieve_with_citations
+from .resilience import (
+    Deadline, DeadlineExceeded, get_breaker, guarded, guarded_async, hedged, hedged_async,
+)
+from . import metrics
+from .providers import (
+    LLMProvider, ProviderUnavailable, TASK_DRUG_SUMMARY, TASK_EXPLAIN, get_provider,
+)
 from src.core.config import settings
 logger = logging.getLogger(__name__)
 
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "") or settings.gemini_api_key
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash") or settings.gemini_model
-HF_MODEL = os.getenv("HF_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
-
 SYSTEM = """You are a medical explanation assistant for consumers.
 Requirements:
 - Explain in plain language at ~8th-grade level.
@@ -34,39 +36,21 @@ INSTRUCTIONS:
 - Return JSON: {{"bullets": string[], "used_citation_ids": number[]}} ONLY.
 """
 
-SYSTEM_MED_LIST = """
+SYSTEM_DRUG_SUMMARY = """
 You are a medical explanation assistant for consumers.
 
 Requirements:
 - Explain in plain language at about an 8th-grade reading level.
 - Summarize ONLY from the provided CONTEXT; if something is unknown, say so.
 - Do NOT give dosing instructions, do NOT tell the user to change how they take their medication.
-- Focus on what the medicines do overall, what conditions they treat, and major safety themes.
-- Be concise and organized.
 
 Output MUST be valid JSON with this structure:
 
 {
-  "overview_bullets": [
-    "Overall, your medicines help with ...",
-    "...",
-    "..."
-  ],
-  "per_drug": [
-    {
-      "medication_id": 1,
-      "name": "Lisinopril",
-      "summary": "Short plain-language summary of what this drug does for the user.",
-      "used_citation_ids": [1, 3]
-    },
-    {
-      "medication_id": 2,
-      "name": "Metformin",
-      "summary": "...",
-      "used_citation_ids": [4]
-    }
-  ],
-  "used_citation_ids": [1, 3, 4]
+  "summary": "1–2 sentence plain-language summary of what this medicine does.",
+  "treats": "short condition group, e.g. \"blood pressure\" or \"diabetes\" (null if unclear)",
+  "caution": "one short high-level safety theme, e.g. \"may cause dizziness\" (null if none)",
+  "used_citation_ids": [1, 2]
 }
 """
 
@@ -94,6 +78,7 @@ def _postprocess_json(text: str) -> Dict:
                     data = json.loads(m.group(0))
                 except Exception:
                     data = {}
+            metrics.json_parse_failure(TASK_EXPLAIN, recovered=bool(data))
     bullets = [str(b).strip() for b in (data.get("bullets") or [])][:6]
     used_raw = data.get("used_citation_ids") or data.get("usedIds") or []
     used: List[int] = []
@@ -109,244 +94,326 @@ def _postprocess_json(text: str) -> Dict:
     used = [u for u in used if not (u in seen or seen.add(u))]
     return {"bullets": bullets, "used_ids": used}
 
-# ---------------- Gemini branch ----------------
+def _require_bullets(text: str) -> None:
+    """Provider `validate` hook: only answers with bullets are persisted."""
+    if not _postprocess_json(text)["bullets"]:
+        raise ValueError("explain answer has no bullets")
 
-_genai_models_cache: Dict[str, object] = {}
+# ---------------- provider calls ----------------
 
-def _gemini_generate(prompt: str) -> Dict:
-    if not GEMINI_API_KEY:
-        return {"bullets": ["Gemini API key not configured."], "used_ids": []}
+def _error(code: str, message: str) -> Dict:
+    return {"bullets": [message], "used_ids": [], "error": code}
 
-    try:
-        import google.generativeai as genai
-    except Exception as e:
-        return {"bullets": [f"Gemini SDK not installed: {e}"], "used_ids": []}
-
-    genai.configure(api_key=GEMINI_API_KEY)
-
-    # Prefer 2.5 models; try your configured one first
-    candidates = [
-        GEMINI_MODEL,                 # from .env
-        "gemini-2.5-flash",
-        "gemini-2.5-flash-lite",
-        "gemini-flash-latest",
-        "gemini-pro-latest",
-    ]
-    # remove blanks and keep order without duplicates
-    seen = set()
+def _call(provider: LLMProvider, model_name: str, prompt: str, deadline: Deadline) -> str:
+    """One attempt against one model, bounded by the request deadline."""
+    return provider.generate(
+        prompt, task=TASK_EXPLAIN, system=SYSTEM, model=model_name,
+        temperature=0.2, max_output_tokens=450, timeout=deadline.attempt_timeout(),
+        validate=_require_bullets,
+    )
+
+async def _call_async(provider: LLMProvider, model_name: str, prompt: str, deadline: Deadline) -> str:
+    return await provider.generate_async(
+        prompt, task=TASK_EXPLAIN, system=SYSTEM, model=model_name,
+        temperature=0.2, max_output_tokens=450, timeout=deadline.attempt_timeout(),
+        validate=_require_bullets,
+    )
+
+def _local_json(text: str) -> Dict:
+    # local models tend to wrap the JSON in prose
+    m = _JSON_BLOCK.search(text)
+    if m and m.group(0) != text.strip():
+        metrics.json_parse_failure(TASK_EXPLAIN, recovered=True)
+    return _postprocess_json(m.group(0) if m else text)
+
+def _usable_models(provider: LLMProvider) -> List[str]:
+    """
+    Candidate models in order, skipping those whose circuit breaker is open.
+    Only reads breaker state; allow() is called right before each attempt so
+    a half-open breaker's probe isn't spent on a model that is never called.
+    """
     ordered = []
-    for m in candidates:
-        if m and m not in seen:
-            seen.add(m)
+    for m in provider.models():
+        if get_breaker(m).available():
             ordered.append(m)
+        else:
+            metrics.breaker_skip(TASK_EXPLAIN, m)
+    return ordered
 
-    last_err = None
-    tried: List[str] = []
-
-    for model_name in ordered:
-        tried.append(model_name)
-        try:
-            # cache model objects per name
-            model = _genai_models_cache.get(model_name)
-            if model is None:
-                model = genai.GenerativeModel(
-                    model_name,
-                    generation_config={
-                        "response_mime_type": "application/json",
-                        "temperature": 0.2,
-                        "max_output_tokens": 450,
-                    },
-                    system_instruction=SYSTEM,
-                )
-                _genai_models_cache[model_name] = model
+class _Fallback:
+    """
+    Model-fallback bookkeeping shared by _generate and _generate_async: which
+    candidate (and hedge secondary) to call next, what was tried, the last
+    error. Callers only make the call itself, sync or async.
+    """
 
-            req = (
-                # Single-part prompt is fine; JSON mode is set above
-                prompt
-            )
-            resp = model.generate_content([req])
-            text = getattr(resp, "text", "") or ""
-            if not text and getattr(resp, "candidates", None):
-                # try to recover text from candidates if present
-                for cand in resp.candidates:
-                    content = getattr(cand, "content", None)
-                    parts = getattr(content, "parts", None) if content else None
-                    if parts:
-                        for p in parts:
-                            if getattr(p, "text", None):
-                                text = p.text
-                                break
-                        if text:
-                            break
-            if not text:
-                # try next model
-                last_err = RuntimeError("Empty response body")
+    def __init__(self, provider: LLMProvider, deadline: Deadline):
+        self.provider = provider
+        self.deadline = deadline
+        self.ordered = _usable_models(provider)
+        self.i = 0
+        self.tried: List[str] = []
+        self.last_err = None
+
+    def next(self) -> Optional[Tuple[str, Optional[str]]]:
+        """(primary, hedge secondary or None) for the next attempt, or None when out of models or time."""
+        while self.i < len(self.ordered) and not self.deadline.expired:
+            primary = self.ordered[self.i]
+            secondary = self.ordered[self.i + 1] \
+                if settings.llm_hedging_enabled and self.i + 1 < len(self.ordered) else None
+            self.i += 1
+            if not get_breaker(primary).allow():
+                metrics.breaker_skip(TASK_EXPLAIN, primary)
                 continue
+            return primary, secondary
+        return None
+
+    def failed(self, primary: str, secondary: Optional[str], ran: List[str], err: Exception) -> None:
+        # the secondary counts as tried (and is skipped) only if the hedge fired
+        self.last_err = err
+        self.tried.extend(ran)
+        if secondary in ran:
+            self.i += 1
+        if self.i < len(self.ordered):
+            metrics.fallback(TASK_EXPLAIN, primary)
+
+    def exhausted(self) -> Dict:
+        metrics.exhausted(TASK_EXPLAIN)
+        last_err = self.last_err
+        if self.deadline.expired and not isinstance(last_err, DeadlineExceeded):
+            last_err = DeadlineExceeded(f"LLM deadline of {self.deadline.seconds:.1f}s exceeded")
+        msg = f"LLM error after trying {self.tried}: {type(last_err).__name__}: {str(last_err)}" if last_err else \
+              f"LLM error: no usable model from candidates {self.provider.models()} (circuit breakers open)"
+        return _error("all_models_failed", msg)
+
+def _generate(prompt: str, deadline: Optional[Deadline] = None) -> Dict:
+    try:
+        provider = get_provider()
+    except ProviderUnavailable as e:
+        return _error(e.code, str(e))
 
+    if provider.name == "hf":
+        try:
+            return _local_json(provider.generate(prompt, task=TASK_EXPLAIN, system=SYSTEM,
+                                                 validate=_require_bullets))
+        except ProviderUnavailable as e:
+            logger.warning("Local LLM runtime unavailable: %s", e.__cause__ or e)
+            return _error(e.code, str(e))
+
+    deadline = deadline or Deadline(settings.llm_deadline_s)
+    attempts = _Fallback(provider, deadline)
+    while True:
+        pick = attempts.next()
+        if pick is None:
+            return attempts.exhausted()
+        primary, secondary = pick
+        ran: List[str] = []
+        try:
+            if secondary is None:
+                ran.append(primary)
+                text = guarded(primary, lambda m=primary: _call(provider, m, prompt, deadline))
+            else:
+                # race the next candidate if the primary is slower than its p95
+                _, text = hedged(
+                    (primary, lambda m=primary: _call(provider, m, prompt, deadline)),
+                    (secondary, lambda m=secondary: _call(provider, m, prompt, deadline)),
+                    deadline,
+                    started=ran,
+                )
             return _postprocess_json(text)
-
         except Exception as e:
             # try next model
-            last_err = e
-            continue
-
-    msg = f"Gemini error after trying {tried}: {type(last_err).__name__}: {str(last_err)}" if last_err else \
-          f"Gemini error: no usable model from candidates {ordered}"
-    return {"bullets": [msg], "used_ids": []}
+            attempts.failed(primary, secondary, ran, e)
 
-# ---------------- HF fallback ----------------
-
-def _hf_generate(prompt: str) -> Dict:
+async def _generate_async(prompt: str, deadline: Optional[Deadline] = None) -> Dict:
+    """Async variant of _generate: same breakers, deadline and hedging."""
     try:
-        from transformers import AutoModelForCausalLM, AutoTokenizer
-        import torch
-    except Exception:
-        return {
-            "bullets": ["LLM provider not available. Set LLM_PROVIDER=gemini or install transformers."],
-            "used_ids": [],
-        }
+        provider = get_provider()
+    except ProviderUnavailable as e:
+        return _error(e.code, str(e))
 
-    tok = AutoTokenizer.from_pretrained(HF_MODEL)
-    model = AutoModelForCausalLM.from_pretrained(
-        HF_MODEL,
-        torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-        device_map="auto",
-    )
-    ids = tok(prompt, return_tensors="pt").to(model.device)
-    out = model.generate(
-        **ids, max_new_tokens=500, temperature=0.2, do_sample=False, eos_token_id=tok.eos_token_id
-    )
-    text = tok.decode(out[0], skip_special_tokens=True)
-    m = _JSON_BLOCK.search(text)
-    text = m.group(0) if m else text
-    return _postprocess_json(text)
+    if provider.name == "hf":
+        try:
+            return _local_json(await provider.generate_async(prompt, task=TASK_EXPLAIN, system=SYSTEM,
+                                                             validate=_require_bullets))
+        except ProviderUnavailable as e:
+            logger.warning("Local LLM runtime unavailable: %s", e.__cause__ or e)
+            return _error(e.code, str(e))
+
+    deadline = deadline or Deadline(settings.llm_deadline_s)
+    attempts = _Fallback(provider, deadline)
+    while True:
+        pick = attempts.next()
+        if pick is None:
+            return attempts.exhausted()
+        primary, secondary = pick
+        ran: List[str] = []
+        try:
+            if secondary is None:
+                ran.append(primary)
+                text = await guarded_async(primary, lambda m=primary: _call_async(provider, m, prompt, deadline))
+            else:
+                _, text = await hedged_async(
+                    (primary, lambda m=primary: _call_async(provider, m, prompt, deadline)),
+                    (secondary, lambda m=secondary: _call_async(provider, m, prompt, deadline)),
+                    deadline,
+                    started=ran,
+                )
+            return _postprocess_json(text)
+        except Exception as e:
+            attempts.failed(primary, secondary, ran, e)
 
 # ---------------- Public API ----------------
 
-def explain_with_llm(drug: str, question: str, citations: List[Dict]) -> Dict:
-    """
-    Returns: {"bullets": List[str], "used_ids": List[int]}
-    """
+def _build_explain_prompt(drug: str, question: str, citations: List[Dict]) -> str:
     ctx = _build_context(citations)
     user = USER_TEMPLATE.format(
         drug=drug,
         question=question or "key facts and warnings",
         context=ctx
     )
-    prompt = (
+    return (
         f"{SYSTEM}\n\n{user}\n\n"
         'Return ONLY valid JSON like: {"bullets": ["..."], "used_citation_ids": [1,2]}'
     )
 
-    if LLM_PROVIDER == "gemini":
-        return _gemini_generate(prompt)
-
-    return _hf_generate(prompt)
-
-def build_med_list_context(medications: List[Dict[str, any]], citations: List[Dict[str, any]]) -> str:
+def explain_with_llm(drug: str, question: str, citations: List[Dict]) -> Dict:
     """
-    Build a text context block listing the user's meds and citations.
-
-    medications: [
-      {"id": 1, "name": "Lisinopril", "rx_cui": "123"},
-      ...
-    ]
-
-    citations: [
-      {"id": 1, "rx_cui": "...", "section": "...", "snippet": "...", "drug_name": "..."},
-      ...
-    ]
+    Returns: {"bullets": List[str], "used_ids": List[int]}
+    On provider failure the dict also carries an "error" code and the
+    bullets hold a human-readable message.
     """
-    lines = []
-    lines.append("PATIENT MEDICATION LIST:")
-    for m in medications:
-        lines.append(f"- [{m['id']}] {m['name']} (rx_cui={m.get('rx_cui')})")
-    lines.append("")
-    lines.append("CONTEXT (citations):")
-    for c in citations:
-        cid = c["id"]
-        section = c.get("section") or "Unknown section"
-        rx_cui = c.get("rx_cui")
-        drug_name = c.get("drug_name") or ""
-        header = f"[C{cid}] ({drug_name or rx_cui} – {section})"
-        snippet = c.get("snippet") or ""
-        lines.append(f"{header}: {snippet}")
-    return "\n".join(lines)
+    return _generate(_build_explain_prompt(drug, question, citations))
 
+async def explain_with_llm_async(drug: str, question: str, citations: List[Dict]) -> Dict:
+    """Async variant of explain_with_llm (same return shape)."""
+    return await _generate_async(_build_explain_prompt(drug, question, citations))
 
-def explain_med_list_with_llm(
-    medications: List[Dict[str, any]],
-    citations: List[Dict[str, any]],
-) -> Dict[str, any]:
+def stream_explain_with_llm(drug: str, question: str, citations: List[Dict]) -> Iterator[str]:
     """
-    Call the LLM to generate an overview of the user's med list, using the
-    provided list of medications and citations.
-
-    Returns a dict matching MedListOverviewResponse (field names pre-alias):
-    {
-      "overview_bullets": [...],
-      "per_drug": [
-        {
-          "medication_id": int,
-          "name": str,
-          "summary": str,
-          "used_citation_ids": [int, ...]
-        },
-        ...
-      ],
-      "used_citation_ids": [int, ...]
-    }
+    Yield raw text chunks of the model's JSON answer as they arrive. Feed them
+    to json_stream.ArrayStringStream to get bullets incrementally, and run the
+    joined text through parse_explain_output() at the end.
+
+    Candidate models are tried in order until one starts streaming; a failure
+    after output has started is raised. Raises RuntimeError if no model works.
     """
-    from google import generativeai as genai  # assuming you're already using this
+    prompt = _build_explain_prompt(drug, question, citations)
+
+    provider = get_provider()
+    if provider.name == "hf":
+        # local HF generation is not token-streamed; emit the whole answer at once
+        result = _generate(prompt)
+        if result.get("error"):
+            raise RuntimeError(result["bullets"][0])
+        yield json.dumps({"bullets": result["bullets"], "used_citation_ids": result["used_ids"]})
+        return
+
+    deadline = Deadline(settings.llm_deadline_s)
+    last_err = None
+    failed = None
+    for model_name in provider.models():
+        breaker = get_breaker(model_name)
+        if deadline.expired:
+            continue
+        if not breaker.allow():
+            metrics.breaker_skip(TASK_EXPLAIN, model_name)
+            continue
+        if failed is not None:
+            # the previous candidate failed before streaming anything
+            metrics.fallback(TASK_EXPLAIN, failed)
+            failed = None
+        started = False
+        t0 = time.monotonic()
+        try:
+            stream = provider.stream(
+                prompt, task=TASK_EXPLAIN, system=SYSTEM, model=model_name,
+                temperature=0.2, max_output_tokens=450, timeout=deadline.attempt_timeout(),
+                validate=_require_bullets,
+            )
+            for text in stream:
+                if text:
+                    started = True
+                    yield text
+            if started:
+                breaker.record_success(time.monotonic() - t0)
+                return
+            last_err = RuntimeError("Empty response body")
+            breaker.record_failure(last_err)
+            failed = model_name
+        except Exception as e:
+            breaker.record_failure(e)
+            if started:
+                raise
+            last_err = e
+            failed = model_name
+    metrics.exhausted(TASK_EXPLAIN)
+    raise RuntimeError(f"LLM streaming failed: {type(last_err).__name__}: {last_err}")
 
-    context_text = build_med_list_context(medications, citations)
+def parse_explain_output(text: str) -> Dict:
+    """Parse a complete explainer answer into {"bullets", "used_ids"}."""
+    return _postprocess_json(text)
 
-    user_prompt = f"""
-You are given a patient's medication list and contextual snippets from trusted drug information sources.
+def _drug_summary_prompt(medication: Dict[str, any], citations: List[Dict[str, any]]) -> str:
+    return f"""
+MEDICATION: {medication['name']} (rx_cui={medication.get('rx_cui')})
 
-{context_text}
+CONTEXT (citations):
+{_build_context(citations)}
 
 TASK:
-- Provide 3–6 short bullets explaining what this combination of medicines is doing overall for the patient.
-- Group medicines by what they treat (e.g., blood pressure, diabetes, cholesterol) in your wording.
-- Mention major safety themes only at a high level (e.g., "may cause dizziness" or "can affect blood sugar"), without giving specific dosing instructions.
-- For each individual drug, provide a 1–2 sentence summary in plain language.
+- Summarize what this medicine does and what it is used for, in 1–2 sentences.
+- Name the condition group it treats and one major safety theme, if the context supports them.
 - ONLY use information that is explicit or strongly implied in the context.
 
-Remember: Output MUST be valid JSON and match the schema in the instructions.
+Return ONLY valid JSON matching the schema in the instructions.
 """
 
-    # Configure Gemini client (same pattern as explain_with_llm)
-    genai.configure(api_key=settings.gemini_api_key or GEMINI_API_KEY)
-    model = genai.GenerativeModel(
-        model_name=settings.gemini_model or GEMINI_MODEL,
-        system_instruction=SYSTEM_MED_LIST,
-        generation_config={"response_mime_type": "application/json"},
-    )
-
+def _parse_drug_summary(raw: str) -> Dict[str, any]:
+    """Raises ValueError for answers without a summary."""
+    text = raw or "{}"
     try:
-        response = model.generate_content(user_prompt)
-        raw = response.text or "{}"
-        data = json.loads(raw)
-
-        # Basic normalization
-        overview = data.get("overview_bullets") or []
-        per_drug = data.get("per_drug") or []
-        used_ids = data.get("used_citation_ids") or []
+        data = json.loads(text)
+    except Exception:
+        m = _JSON_BLOCK.search(text)
+        metrics.json_parse_failure(TASK_DRUG_SUMMARY, recovered=bool(m))
+        data = json.loads(m.group(0)) if m else {}
+    used = [int(i) for i in (data.get("used_citation_ids") or []) if isinstance(i, int) and not isinstance(i, bool)]
+    result = {
+        "summary": str(data.get("summary") or "").strip(),
+        "treats": (str(data["treats"]).strip() or None) if data.get("treats") else None,
+        "caution": (str(data["caution"]).strip() or None) if data.get("caution") else None,
+        "used_citation_ids": used,
+    }
+    if not result["summary"]:
+        raise ValueError("empty summary")
+    return result
 
-        return {
-            "overview_bullets": overview,
-            "per_drug": per_drug,
-            "used_citation_ids": used_ids,
-        }
+async def summarize_drug_with_llm_async(
+    medication: Dict[str, any],
+    citations: List[Dict[str, any]],
+) -> Dict[str, any]:
+    """
+    One medication's overview entry: {"summary", "treats", "caution",
+    "used_citation_ids"}. Carries "error" instead when the LLM call fails, so
+    callers don't cache it.
+    """
+    try:
+        raw = await get_provider().generate_async(
+            _drug_summary_prompt(medication, citations),
+            task=TASK_DRUG_SUMMARY,
+            system=SYSTEM_DRUG_SUMMARY,
+            temperature=0.2,
+            timeout=settings.llm_deadline_s,
+            validate=_parse_drug_summary,
+        )
+        return _parse_drug_summary(raw)
     except Exception as e:
-        logger.exception("Failed to generate med list overview with LLM: %s", e)
-        # Fallback: simple message
+        logger.exception("Failed to summarize %s with LLM: %s", medication.get("name"), e)
         return {
-            "overview_bullets": [
-                "We could not generate an overview of your medications right now.",
-                "Please try again later.",
-            ],
-            "per_drug": [],
+            "summary": "We could not generate a summary for this medication right now.",
+            "treats": None,
+            "caution": None,
             "used_citation_ids": [],
+            "error": f"{type(e).__name__}: {e}",
         }
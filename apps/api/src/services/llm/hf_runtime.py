@@ -0,0 +1,224 @@
+# apps/api/src/services/llm/hf_runtime.py
+# Process-wide local LLM runtime for LLM_PROVIDER=hf.
+#
+# The tokenizer and model are loaded once (at startup via warm_up(), or on
+# first use) instead of per request. Concurrent prompts go through a queue;
+# a single worker thread drains it and runs them as one padded `generate`
+# call, up to HF_MAX_BATCH_SIZE prompts per batch.
+#
+# Pick a small CPU-friendly model with HF_MODEL (e.g. Qwen/Qwen2.5-0.5B-Instruct)
+# and set HF_QUANTIZE_INT8=true to apply dynamic int8 quantization on CPU.
+#
+# Offline benchmark:
+#   python -m src.services.llm.hf_runtime --prompts 16 --concurrency 8
+
+import argparse
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLLMRuntime:
+    def __init__(
+        self,
+        model_name: str,
+        quantize_int8: bool = False,
+        max_batch_size: int = 8,
+        batch_wait_ms: int = 20,
+        max_new_tokens: int = 500,
+    ):
+        self.model_name = model_name
+        self.quantize_int8 = quantize_int8
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self.max_new_tokens = max_new_tokens
+        self.tok = None
+        self.model = None
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+
+    def load(self) -> None:
+        # raises ImportError if transformers/torch are not installed
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        import torch
+
+        t0 = time.perf_counter()
+        tok = AutoTokenizer.from_pretrained(self.model_name)
+        # decoder-only models must be left-padded for batched generation
+        tok.padding_side = "left"
+        if tok.pad_token is None:
+            tok.pad_token = tok.eos_token
+
+        on_gpu = torch.cuda.is_available()
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_name,
+            torch_dtype=torch.float16 if on_gpu else torch.float32,
+            device_map="auto" if on_gpu else None,
+        )
+        if self.quantize_int8 and not on_gpu:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        model.eval()
+
+        self.tok, self.model = tok, model
+        self._worker = threading.Thread(target=self._run, name="hf-runtime", daemon=True)
+        self._worker.start()
+        logger.info(
+            "Loaded local LLM %s (int8=%s, gpu=%s) in %.1fs",
+            self.model_name, self.quantize_int8 and not on_gpu, on_gpu, time.perf_counter() - t0,
+        )
+
+    def submit(self, prompt: str) -> Future:
+        """Queue a prompt; the Future resolves to the generated text once its batch runs."""
+        fut: Future = Future()
+        self._queue.put((prompt, fut))
+        return fut
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Queue a prompt and block until its batch has been generated. Returns only the new text."""
+        fut = self.submit(prompt)
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            # drop it from the queue if its batch hasn't started yet
+            fut.cancel()
+            raise
+
+    @staticmethod
+    def _take(batch: List[Tuple[str, Future]], item: Tuple[str, Future]) -> None:
+        # callers that timed out or disconnected cancel their future; skip those,
+        # and mark the rest running so they can no longer be cancelled mid-batch
+        if item[1].set_running_or_notify_cancel():
+            batch.append(item)
+
+    def _next_batch(self) -> List[Tuple[str, Future]]:
+        batch: List[Tuple[str, Future]] = []
+        while not batch:
+            self._take(batch, self._queue.get())
+        deadline = time.monotonic() + self.batch_wait_s
+        while len(batch) < self.max_batch_size:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                self._take(batch, self._queue.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        import torch
+
+        while True:
+            batch = self._next_batch()
+            prompts = [p for p, _ in batch]
+            try:
+                enc = self.tok(prompts, return_tensors="pt", padding=True).to(self.model.device)
+                with torch.inference_mode():
+                    out = self.model.generate(
+                        **enc,
+                        max_new_tokens=self.max_new_tokens,
+                        do_sample=False,
+                        eos_token_id=self.tok.eos_token_id,
+                        pad_token_id=self.tok.pad_token_id,
+                    )
+                # drop the (left-padded) prompt tokens from every row
+                new_tokens = out[:, enc["input_ids"].shape[1]:]
+                texts = self.tok.batch_decode(new_tokens, skip_special_tokens=True)
+                for (_, fut), text in zip(batch, texts):
+                    fut.set_result(text)
+            except Exception as e:
+                logger.exception("Local LLM batch of %d failed: %s", len(batch), e)
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+
+
+_RUNTIME: Optional[LocalLLMRuntime] = None
+_RUNTIME_LOCK = threading.Lock()
+
+
+def get_runtime() -> LocalLLMRuntime:
+    """Return the process-wide runtime, loading the model on first use."""
+    global _RUNTIME
+    with _RUNTIME_LOCK:
+        if _RUNTIME is None:
+            rt = LocalLLMRuntime(
+                settings.hf_model,
+                quantize_int8=settings.hf_quantize_int8,
+                max_batch_size=settings.hf_max_batch_size,
+                batch_wait_ms=settings.hf_batch_wait_ms,
+                max_new_tokens=settings.hf_max_new_tokens,
+            )
+            rt.load()
+            _RUNTIME = rt
+        return _RUNTIME
+
+
+def warm_up() -> None:
+    """
+    Load the model at startup so the first request doesn't pay for it. A
+    failure is logged, not raised: the app still starts, and the load is
+    retried on first use (HFProvider reports it as provider_unavailable).
+    """
+    try:
+        get_runtime()
+    except ImportError as e:
+        logger.warning("LLM_PROVIDER=hf but transformers/torch are not installed: %s", e)
+    except Exception as e:
+        logger.exception("Could not load local LLM %s at startup: %s", settings.hf_model, e)
+
+
+# ---------- offline benchmark ----------
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark the local HF runtime.")
+    p.add_argument("--prompts", type=int, default=16, help="Total prompts to generate")
+    p.add_argument("--concurrency", type=int, default=8, help="Concurrent callers")
+    p.add_argument("--max-new-tokens", type=int, default=None, help="Override HF_MAX_NEW_TOKENS")
+    args = p.parse_args()
+
+    if args.max_new_tokens:
+        settings.hf_max_new_tokens = args.max_new_tokens
+
+    t0 = time.perf_counter()
+    rt = get_runtime()
+    print(f"Model {rt.model_name} loaded in {time.perf_counter() - t0:.1f}s")
+
+    prompt = (
+        "DRUG: metformin\nQUESTION: key facts and warnings\n\nCONTEXT (citations):\n"
+        "[C1] (overview, rx_cui=6809): Metformin helps lower blood glucose.\n\n"
+        'Return ONLY valid JSON like: {"bullets": ["..."], "used_citation_ids": [1]}'
+    )
+    latencies: List[float] = []
+
+    def one(_):
+        s = time.perf_counter()
+        rt.generate(prompt)
+        latencies.append(time.perf_counter() - s)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.prompts)))
+    wall = time.perf_counter() - t0
+
+    latencies.sort()
+    print(f"{args.prompts} prompts, concurrency {args.concurrency}: {wall:.1f}s wall, "
+          f"{args.prompts / wall:.2f} prompts/s")
+    print(f"latency p50={latencies[len(latencies) // 2]:.2f}s "
+          f"p95={latencies[int(0.95 * (len(latencies) - 1))]:.2f}s")
+    print("batching:", rt.stats)
+
+
+if __name__ == "__main__":
+    main()
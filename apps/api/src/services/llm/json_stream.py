@@ -0,0 +1,79 @@
+# apps/api/src/services/llm/json_stream.py
+# Incremental JSON scanner for streamed LLM output.
+#
+# The explainer asks for {"bullets": [...], "used_citation_ids": [...]}.
+# When the model streams tokens we want each bullet as soon as its closing
+# quote arrives, without waiting for the whole object to parse. This scanner
+# tracks just enough JSON structure (containers, keys, strings) to do that.
+
+import json
+from typing import List, Optional, Tuple
+
+
+class ArrayStringStream:
+    """
+    Feed raw text chunks; get back string elements of the array stored under
+    `key` as soon as each one is complete. Text before the first "{" (e.g. a
+    ```json fence) is ignored.
+    """
+
+    def __init__(self, key: str = "bullets"):
+        self.key = key
+        # stack of (container, key that owns it); container is "{" or "["
+        self._stack: List[Tuple[str, Optional[str]]] = []
+        self._expect_key = False
+        self._last_key: Optional[str] = None
+        self._in_string = False
+        self._escape = False
+        self._buf: List[str] = []
+
+    def feed(self, chunk: str) -> List[str]:
+        out: List[str] = []
+        for ch in chunk:
+            if self._in_string:
+                self._buf.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    done = self._finish_string()
+                    if done is not None:
+                        out.append(done)
+                continue
+
+            if ch == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._buf = [ch]
+            elif ch == "{":
+                self._stack.append(("{", self._last_key))
+                self._expect_key = True
+            elif ch == "[":
+                if self._stack:
+                    self._stack.append(("[", self._last_key))
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+            elif ch == ":":
+                self._expect_key = False
+            elif ch == ",":
+                self._expect_key = bool(self._stack) and self._stack[-1][0] == "{"
+        return out
+
+    def _finish_string(self) -> Optional[str]:
+        raw = "".join(self._buf)
+        self._buf = []
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        top, owner = self._stack[-1]
+        if top == "{" and self._expect_key:
+            self._last_key = value
+            return None
+        if top == "[" and owner == self.key and len(self._stack) == 2:
+            return str(value).strip()
+        return None
@@ -0,0 +1,183 @@
+# apps/api/src/services/llm/label_cache.py
+# Per-user fuzzy cache for /ai/parse-pill-label.
+#
+# Rescans of the same bottle (refills, retries after a blurry shot) produce
+# slightly different OCR text, so exact keys rarely hit. Each parsed label is
+# stored under a 64-bit SimHash of its cleaned tokens; a new scan within
+# settings.pill_cache_max_hamming bits of a stored one from the same user
+# returns the stored parse.
+#
+# A SimHash candidate is then verified: strengths and SIG amounts must match
+# exactly ("500 MG" vs "850 MG" is near-identical text but a different
+# parse), and
+# every word must have a counterpart within one edit on the other label, so
+# an added "TWICE" is never absorbed as noise.
+
+import hashlib
+import re
+from collections import deque
+from functools import lru_cache
+from threading import Lock
+from time import time
+from typing import Any, Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from src.core.config import settings
+from . import metrics
+from ..retrieval.drug_matcher import edit_distance, normalize
+
+_BITS = 64
+_TOKEN = re.compile(r"[a-z0-9]{2,}")
+# raw tokens before OCR folding ("|" and "$" are misread letters)
+_RAW_TOKEN = re.compile(r"[a-z0-9|$]+")
+# a token that starts with a digit or holds a run of digits carries a number;
+# a lone digit inside a word ("metf0rmin") is a misread letter and is folded
+_NUMBER = re.compile(r"^\d|\d\d")
+# letters OCR swaps with each other; folded only for fingerprinting
+_CONFUSABLE = str.maketrans({"l": "i", "j": "i"})
+# numbers that change the meaning of a label: strengths and SIG amounts/intervals
+_AMOUNT = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(mcg|mg|ml|g|units?|%|tablets?|tabs?|capsules?|caps?|puffs?|drops?|sprays?|hours?|times)(?![a-z])",
+    re.IGNORECASE,
+)
+
+# scope -> recent (fingerprint, amounts, words, result, expires_at), newest last
+_STORE: Dict[str, Deque[Tuple[int, FrozenSet[str], FrozenSet[str], Any, float]]] = {}
+_LOCK = Lock()
+# how often store() also sweeps expired entries out of every other scope
+_SWEEP_INTERVAL_S = 60.0
+_SWEPT_AT = 0.0
+
+_STATS = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0}
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _words(text: str) -> FrozenSet[str]:
+    words = set()
+    # filter on the raw token: normalize() folds digits inside words ("500mg" -> "soomg")
+    for raw in _RAW_TOKEN.findall((text or "").lower()):
+        if _NUMBER.search(raw):
+            continue
+        words.update(t for t in _TOKEN.findall(normalize(raw).translate(_CONFUSABLE)) if t.isalpha())
+    return frozenset(words)
+
+
+def _features(text: str) -> List[str]:
+    """
+    Character trigrams of each word (with word boundaries), so a misread
+    letter changes a few features instead of a whole token. Tokens with
+    digits (Rx#, phone, dates, quantities) change between refills and are
+    skipped; strengths are checked separately.
+    """
+    features = []
+    for tok in sorted(_words(text)):
+        padded = f" {tok} "
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over OCR-folded word trigrams."""
+    features = _features(text)
+    if not features:
+        return 0
+    weights = [0] * _BITS
+    for f in features:
+        h = _feature_hash(f)
+        for bit in range(_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(_BITS) if weights[bit] > 0)
+
+
+def _amounts(text: str) -> FrozenSet[str]:
+    return frozenset(f"{float(n):g}{u.lower().rstrip('s')[:3]}" for n, u in _AMOUNT.findall(text or ""))
+
+
+def _same_words(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    a_only, b_only = a - b, b - a
+    return all(any(edit_distance(w, o, cap=1) <= 1 for o in b_only) for w in a_only) and \
+        all(any(edit_distance(w, o, cap=1) <= 1 for o in a_only) for w in b_only)
+
+
+def _prune_locked(scope: str, now: float) -> None:
+    """Drop the scope's expired entries, and the scope itself once it is empty."""
+    entries = _STORE.get(scope)
+    if entries is None:
+        return
+    if any(e[4] < now for e in entries):
+        entries = _STORE[scope] = deque((e for e in entries if e[4] >= now), maxlen=entries.maxlen)
+    if not entries:
+        del _STORE[scope]
+
+
+def _sweep_locked(now: float) -> None:
+    global _SWEPT_AT
+    if now - _SWEPT_AT < _SWEEP_INTERVAL_S:
+        return
+    _SWEPT_AT = now
+    for scope in list(_STORE):
+        _prune_locked(scope, now)
+
+
+def lookup(scope: str, ocr_text: str) -> Optional[Any]:
+    """Stored parse of the closest previous scan in `scope` (typically the user id), or None."""
+    if not settings.pill_cache_enabled or not ocr_text:
+        return None
+    _STATS["lookups"] += 1
+    now = time()
+    with _LOCK:
+        _prune_locked(scope, now)
+        entries = list(_STORE.get(scope) or ())
+    if not entries:
+        _STATS["misses"] += 1
+        metrics.cache_lookup("pill_label", False)
+        return None
+
+    fp, amounts, words = simhash(ocr_text), _amounts(ocr_text), _words(ocr_text)
+    candidates = [
+        ((fp ^ e_fp).bit_count(), e_words, result)
+        for e_fp, e_amounts, e_words, result, expires in entries
+        if expires >= now and e_amounts == amounts
+    ]
+    best = None
+    for d, e_words, result in sorted(candidates, key=lambda c: c[0]):
+        if d > settings.pill_cache_max_hamming:
+            break
+        if _same_words(words, e_words):
+            best = result
+            break
+
+    metrics.cache_lookup("pill_label", best is not None)
+    if best is None:
+        _STATS["misses"] += 1
+        return None
+    _STATS["hits"] += 1
+    return best
+
+
+def store(scope: str, ocr_text: str, result: Any, ttl: Optional[float] = None) -> None:
+    if not settings.pill_cache_enabled or not ocr_text:
+        return
+    ttl = settings.pill_cache_ttl_s if ttl is None else ttl
+    now = time()
+    entry = (simhash(ocr_text), _amounts(ocr_text), _words(ocr_text), result, now + ttl)
+    with _LOCK:
+        _sweep_locked(now)
+        _prune_locked(scope, now)
+        entries = _STORE.setdefault(scope, deque(maxlen=settings.pill_cache_max_per_user))
+        entries.append(entry)
+    _STATS["stores"] += 1
+
+
+def stats() -> Dict[str, Any]:
+    lookups = _STATS["lookups"] or 1
+    return {
+        **_STATS,
+        "hit_rate": round(_STATS["hits"] / lookups, 4),
+        "max_hamming": settings.pill_cache_max_hamming,
+        "scopes": len(_STORE),
+        "entries": sum(len(e) for e in _STORE.values()),
+    }
@@ -0,0 +1,178 @@
+# apps/api/src/services/llm/metrics.py
+# In-process accounting for LLM calls, exposed at GET /metrics (Prometheus
+# text format) and GET /health/llm/metrics (JSON).
+#
+#   llm_call_seconds             histogram  feature, provider, model, outcome
+#   llm_input_tokens_total       counter    feature, provider, model
+#   llm_output_tokens_total      counter    feature, provider, model
+#   llm_fallbacks_total          counter    feature, model      (model failed, next candidate tried)
+#   llm_exhausted_total          counter    feature             (every candidate failed)
+#   llm_breaker_skips_total      counter    feature, model      (candidate skipped, breaker open)
+#   llm_json_parse_failures_total counter   feature, recovered  (first json.loads failed)
+#   llm_cache_lookups_total      counter    cache, result       (hit | miss)
+#
+# `feature` is the provider task (explain, drug_summary, pill_label, ...).
+# Token counts use the same ~4 chars/token estimate as the context packer, so
+# they are comparable across providers; treat them as estimates of spend.
+# Counters are per process; each API worker reports its own.
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Dict, Iterator, List, Tuple
+
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+_Labels = Tuple[Tuple[str, str], ...]
+
+_LOCK = Lock()
+_COUNTERS: Dict[str, Dict[_Labels, float]] = {}
+_HISTOGRAMS: Dict[str, Dict[_Labels, List[float]]] = {}  # [bucket counts..., +Inf count, sum]
+_MUTED: ContextVar[bool] = ContextVar("llm_metrics_muted", default=False)
+
+_HELP = {
+    "llm_call_seconds": "Upstream LLM call latency",
+    "llm_input_tokens_total": "Estimated prompt tokens sent (system + prompt)",
+    "llm_output_tokens_total": "Estimated response tokens received",
+    "llm_fallbacks_total": "Calls that failed on a model and moved to the next candidate",
+    "llm_exhausted_total": "Requests where every candidate model failed",
+    "llm_breaker_skips_total": "Candidate models skipped because their circuit breaker was open",
+    "llm_json_parse_failures_total": "LLM answers that were not valid JSON as returned",
+    "llm_cache_lookups_total": "Cache lookups in front of LLM calls",
+}
+
+
+def _labels(labels: Dict[str, object]) -> _Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+@contextmanager
+def muted() -> Iterator[None]:
+    """Drop everything recorded inside the block (e.g. a parse run only to validate an answer)."""
+    token = _MUTED.set(True)
+    try:
+        yield
+    finally:
+        _MUTED.reset(token)
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if _MUTED.get():
+        return
+    key = _labels(labels)
+    with _LOCK:
+        series = _COUNTERS.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _MUTED.get():
+        return
+    key = _labels(labels)
+    with _LOCK:
+        series = _HISTOGRAMS.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            h = series[key] = [0.0] * (len(_LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(_LATENCY_BUCKETS):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += 1
+        h[-1] += value
+
+
+# ---------------- call-site helpers ----------------
+
+def record_call(feature: str, provider: str, model: str, seconds: float, outcome: str,
+                input_tokens: int = 0, output_tokens: int = 0) -> None:
+    observe("llm_call_seconds", seconds, feature=feature, provider=provider, model=model, outcome=outcome)
+    if input_tokens:
+        inc("llm_input_tokens_total", input_tokens, feature=feature, provider=provider, model=model)
+    if output_tokens:
+        inc("llm_output_tokens_total", output_tokens, feature=feature, provider=provider, model=model)
+
+
+def fallback(feature: str, model: str) -> None:
+    inc("llm_fallbacks_total", feature=feature, model=model)
+
+
+def exhausted(feature: str) -> None:
+    inc("llm_exhausted_total", feature=feature)
+
+
+def breaker_skip(feature: str, model: str) -> None:
+    inc("llm_breaker_skips_total", feature=feature, model=model)
+
+
+def json_parse_failure(feature: str, recovered: bool) -> None:
+    inc("llm_json_parse_failures_total", feature=feature, recovered=str(recovered).lower())
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    inc("llm_cache_lookups_total", cache=cache, result="hit" if hit else "miss")
+
+
+# ---------------- export ----------------
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: _Labels, extra: _Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    with _LOCK:
+        for name, series in sorted(_COUNTERS.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+        for name, series in sorted(_HISTOGRAMS.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in sorted(series.items()):
+                for bound, n in zip(_LATENCY_BUCKETS, h):
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', f'{bound:g}'),))} {n:g}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {h[-2]:g}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {h[-2]:g}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {h[-1]:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def _quantile(h: List[float], q: float):
+    """Bucket upper bound containing the q-quantile (None if above the last bucket)."""
+    total = h[-2]
+    if not total:
+        return None
+    for bound, n in zip(_LATENCY_BUCKETS, h):
+        if n >= q * total:
+            return bound
+    return None
+
+
+def snapshot() -> Dict:
+    with _LOCK:
+        counters = {
+            name: [{**dict(labels), "value": value} for labels, value in sorted(series.items())]
+            for name, series in _COUNTERS.items()
+        }
+        histograms = {
+            name: [
+                {
+                    **dict(labels),
+                    "count": int(h[-2]),
+                    "mean_s": round(h[-1] / h[-2], 4) if h[-2] else None,
+                    "p50_le_s": _quantile(h, 0.5),
+                    "p95_le_s": _quantile(h, 0.95),
+                }
+                for labels, h in sorted(series.items())
+            ]
+            for name, series in _HISTOGRAMS.items()
+        }
+    return {"counters": counters, "histograms": histograms}
@@ -1,18 +1,17 @@
 # apps/api/src/services/llm/pill_parser.py
 
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import contextlib
 import json
 import logging
-import os
 from src.core.config import settings  
-from google import generativeai as genai  
+from ..retrieval.drug_matcher import DrugMatcher, get_drug_matcher
+from . import metrics
+from .providers import TASK_PILL_LABEL, get_provider
 import re
 
 logger = logging.getLogger(__name__)
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")  # default to 2.5
-HF_MODEL = os.getenv("HF_MODEL", "mistralai/Mistral-7B-Instruct-v0.2")
 
 PILL_PARSE_SYSTEM = """
 You are helping parse text from a prescription pill bottle or pharmacy label.
@@ -53,68 +52,192 @@ Output MUST be valid JSON with this exact schema:
 """
 
 
-def _very_basic_local_parse(ocr_text: str) -> Dict[str, Any]:
-    """
-    Fallback parser if Gemini fails.
-    Very rough heuristic:
-    - Strength: first "<number> mg" or "<number> mcg" or "<number> mL"
-    - Drug name: first ALLCAPS-ish word before the strength
-    - raw_sig: first line containing TAKE / BY MOUTH / PO
-    """
-    lines = [ln.strip() for ln in ocr_text.splitlines() if ln.strip()]
-    joined = " ".join(lines)
-
-    # strength like "500 MG" or "10 mg" or "5 mL"
-    strength_match = re.search(r"(\d+\s*(mg|MG|mcg|MCG|g|G|mL|ML))", joined)
-    strength = strength_match.group(1) if strength_match else None
-
-    drug_name = None
-    if strength_match:
-        idx = strength_match.start()
-        prefix = joined[:idx]
-        # Look for last ALLCAPS-ish word before strength
-        caps = re.findall(r"\b[A-Z][A-Z0-9]{2,}\b", prefix)
-        if caps:
-            drug_name = caps[-1].title()
-
-    # raw_sig: first line with TAKE / BY MOUTH / PO
-    raw_sig = None
+# ---------------- local parser ----------------
+#
+# Pharmacy labels are formulaic: a drug line with a strength, a SIG line that
+# starts with a verb, and a few stock warnings. The local parser handles those
+# in milliseconds; only labels it isn't confident about go to the LLM.
+
+_STRENGTH = re.compile(
+    r"(?<![\w.])(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(mcg|mg|g|ml|units?|iu|meq|%)(?![a-z])"
+    r"(?:\s*/\s*(\d+(?:\.\d+)?)?\s*(ml|l|tab|cap|dose|actuation|spray)(?![a-z]))?",
+    re.IGNORECASE,
+)
+_SIG_START = re.compile(
+    r"^\s*(take|give|apply|inhale|instill|use|place|insert|inject|chew|dissolve|spray|swallow|mix)\b",
+    re.IGNORECASE,
+)
+_SIG_CONTINUE = re.compile(
+    r"\b(by mouth|daily|once|twice|times|every|hours?|needed|with (food|meals|water)|"
+    r"at bedtime|in the (morning|evening)|for \d+ days|po|bid|tid|qid|qhs|prn)\b",
+    re.IGNORECASE,
+)
+_NOT_SIG = re.compile(r"^\s*(qty|quantity|refills?|rx\b|rx#|dr\.?\b|prescriber|date|exp|ndc|mfg)", re.IGNORECASE)
+_SIG_ABBREV = [
+    (re.compile(r"\bpo\b", re.I), "by mouth"),
+    (re.compile(r"\bqd\b", re.I), "once a day"),
+    (re.compile(r"\bbid\b", re.I), "twice a day"),
+    (re.compile(r"\btid\b", re.I), "three times a day"),
+    (re.compile(r"\bqid\b", re.I), "four times a day"),
+    (re.compile(r"\bqhs\b", re.I), "at bedtime"),
+    (re.compile(r"\bprn\b", re.I), "as needed"),
+    (re.compile(r"\btabs?\b", re.I), "tablet"),
+    (re.compile(r"\bcaps?\b", re.I), "capsule"),
+]
+_WARNINGS = [
+    (re.compile(r"\b(take )?with (food|meals)\b", re.I), "take with food"),
+    (re.compile(r"\bempty stomach\b", re.I), "take on an empty stomach"),
+    (re.compile(r"\bdrows(y|iness)\b", re.I), "may cause drowsiness"),
+    (re.compile(r"\b(avoid|no) alcohol|alcoholic beverages\b", re.I), "avoid alcohol"),
+    (re.compile(r"\bdo not (crush|chew)\b", re.I), "do not crush or chew"),
+    (re.compile(r"\bshake well\b", re.I), "shake well"),
+    (re.compile(r"\brefrigerate\b", re.I), "keep refrigerated"),
+    (re.compile(r"\bsun ?light|sun exposure\b", re.I), "avoid prolonged sunlight"),
+]
+
+# confidence contributions; they add up to 1.0 for a clean label
+_W_DRUG_EXACT = 0.45
+_W_DRUG_FUZZY = 0.3
+_W_DRUG_GUESS = 0.15
+_W_STRENGTH = 0.2
+_W_SIG = 0.25
+_W_SAME_LINE = 0.1
+# a fuzzy (one-edit) drug match is a guess at the drug's identity: keep the
+# total this far below PILL_LOCAL_CONFIDENCE_THRESHOLD so the LLM checks it
+_FUZZY_MARGIN = 0.05
+
+
+def _line_spans(text: str) -> List[Tuple[int, int, str]]:
+    spans, pos = [], 0
+    for ln in text.splitlines(keepends=True):
+        if ln.strip():
+            spans.append((pos, pos + len(ln), ln.strip()))
+        pos += len(ln)
+    return spans
+
+
+def _line_of(spans: List[Tuple[int, int, str]], offset: int) -> Optional[int]:
+    for i, (start, end, _) in enumerate(spans):
+        if start <= offset < end:
+            return i
+    return None
+
+
+def _find_sig(lines: List[str]) -> Optional[str]:
+    for i, ln in enumerate(lines):
+        if not _SIG_START.match(ln):
+            continue
+        sig = ln
+        # SIGs often wrap onto the next line ("TAKE 1 TABLET BY MOUTH" / "TWICE DAILY")
+        if i + 1 < len(lines):
+            nxt = lines[i + 1]
+            if not _NOT_SIG.match(nxt) and not _STRENGTH.search(nxt) and _SIG_CONTINUE.search(nxt):
+                sig = f"{sig} {nxt}"
+        return sig
     for ln in lines:
-        up = ln.upper()
-        if "TAKE" in up or "BY MOUTH" in up or " PO " in up:
-            raw_sig = ln
-            break
+        up = f" {ln.upper()} "
+        if "BY MOUTH" in up or " PO " in up:
+            return ln
+    return None
 
-    directions_summary = None
-    if raw_sig:
-        directions_summary = f"Label instructions: {raw_sig}"
 
-    confidence = 0.4 if (drug_name or strength or raw_sig) else 0.1
+def _summarize_sig(sig: str) -> str:
+    text = " ".join(sig.split()).lower()
+    for pattern, repl in _SIG_ABBREV:
+        text = pattern.sub(repl, text)
+    text = text.rstrip(" .")
+    return text[:1].upper() + text[1:] + "."
 
-    return {
-        "drug_name": drug_name,
-        "strength": strength,
-        "raw_sig": raw_sig,
-        "directions_summary": directions_summary,
-        "notes": None,
-        "confidence": confidence,
-    }
+
+def _find_notes(text: str) -> Optional[str]:
+    notes = []
+    for pattern, note in _WARNINGS:
+        if pattern.search(text) and note not in notes:
+            notes.append(note)
+    return "; ".join(notes) or None
+
+
+def _format_strength(m: re.Match) -> str:
+    amount, unit, per_amount, per_unit = m.groups()
+    out = f"{amount} {unit.lower() if unit.lower() != 'ml' else 'mL'}"
+    if per_unit:
+        per_unit = "mL" if per_unit.lower() == "ml" else per_unit.lower()
+        out += f"/{per_amount} {per_unit}" if per_amount else f"/{per_unit}"
+    return out.replace(" %", "%")
 
 
-def parse_pill_label_with_llm(ocr_text: str) -> Dict[str, Any]:
+def _guess_drug_name(text: str, strength: Optional[re.Match]) -> Optional[str]:
+    """No catalog hit: last ALLCAPS-ish word before the strength."""
+    if not strength:
+        return None
+    caps = re.findall(r"\b[A-Z][A-Z0-9]{2,}\b", text[:strength.start()])
+    return caps[-1].title() if caps else None
+
+
+def parse_pill_label_local(ocr_text: str, matcher: Optional[DrugMatcher] = None) -> Dict[str, Any]:
     """
-    Use Gemini to parse OCR text. If anything fails, fall back to a simple heuristic parser.
+    Parse a label without the LLM: drug from the Drug catalog (OCR-tolerant
+    matcher), strength and SIG from patterns, stock warnings as notes.
+    `confidence` is the parser's own score; see PILL_LOCAL_CONFIDENCE_THRESHOLD.
     """
-    try:
-        genai.configure(api_key=settings.gemini_api_key or GEMINI_API_KEY)
+    text = ocr_text or ""
+    spans = _line_spans(text)
+    lines = [ln for _, _, ln in spans]
 
-        model = genai.GenerativeModel(
-            model_name=settings.gemini_model or GEMINI_MODEL,
-            system_instruction=PILL_PARSE_SYSTEM,
-            generation_config={"response_mime_type": "application/json"},
+    strengths = list(_STRENGTH.finditer(text))
+    strength_lines = {_line_of(spans, m.start()) for m in strengths}
+
+    drug = None
+    matches = matcher.find(text) if matcher else []
+    if matches:
+        # the dispensed drug sits on the strength line; otherwise prefer exact, then earliest
+        drug = min(
+            matches,
+            key=lambda m: (_line_of(spans, m.start) not in strength_lines, not m.exact, m.start),
         )
 
-        user_prompt = f'''
+    strength = None
+    if strengths:
+        if drug:
+            drug_line = _line_of(spans, drug.start)
+            # first strength on the drug's line, else the first one after it
+            strength = next((m for m in strengths if _line_of(spans, m.start()) == drug_line), None) \
+                or next((m for m in strengths if m.start() >= drug.end), strengths[0])
+        else:
+            strength = strengths[0]
+
+    raw_sig = _find_sig(lines)
+
+    confidence = 0.0
+    if drug:
+        drug_name, rx_cui = drug.name, drug.rx_cui
+        confidence += _W_DRUG_EXACT if drug.exact else _W_DRUG_FUZZY
+    else:
+        drug_name, rx_cui = _guess_drug_name(text, strength), None
+        confidence += _W_DRUG_GUESS if drug_name else 0.0
+    if strength:
+        confidence += _W_STRENGTH
+        if drug and _line_of(spans, strength.start()) == _line_of(spans, drug.start):
+            confidence += _W_SAME_LINE
+    if raw_sig:
+        confidence += _W_SIG
+    if drug and not drug.exact:
+        confidence = min(confidence, settings.pill_local_confidence_threshold - _FUZZY_MARGIN)
+
+    return {
+        "drug_name": drug_name,
+        "rx_cui": rx_cui,
+        "strength": _format_strength(strength) if strength else None,
+        "raw_sig": raw_sig,
+        "directions_summary": _summarize_sig(raw_sig) if raw_sig else None,
+        "notes": _find_notes(text),
+        "confidence": round(min(confidence, 1.0), 2),
+        "source": "local",
+    }
+
+
+def _pill_prompt(ocr_text: str) -> str:
+    return f'''
 OCR_TEXT:
 """{ocr_text}"""
 
@@ -124,20 +247,63 @@ If multiple drugs appear, focus on the primary prescribed drug.
 Return ONLY JSON.
 '''
 
-        response = model.generate_content(user_prompt)
-        raw = response.text or "{}"
-        data = json.loads(raw)
-
-        return {
-            "drug_name": data.get("drug_name"),
-            "strength": data.get("strength"),
-            "raw_sig": data.get("raw_sig"),
-            "directions_summary": data.get("directions_summary"),
-            "notes": data.get("notes"),
-            "confidence": data.get("confidence"),
-        }
+
+def _parse_pill_json(raw: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(raw or "{}")
+    except ValueError:
+        metrics.json_parse_failure(TASK_PILL_LABEL, recovered=False)
+        raise
+
+    return {
+        "drug_name": data.get("drug_name"),
+        "strength": data.get("strength"),
+        "raw_sig": data.get("raw_sig"),
+        "directions_summary": data.get("directions_summary"),
+        "notes": data.get("notes"),
+        "confidence": data.get("confidence"),
+    }
+
+
+def _confident(local: Dict[str, Any]) -> bool:
+    return local["confidence"] >= settings.pill_local_confidence_threshold
+
+
+def _merge(local: Dict[str, Any], llm: Dict[str, Any], matcher: DrugMatcher) -> Dict[str, Any]:
+    """LLM fields win; anything it left null keeps the local value."""
+    merged = {**local, **{k: v for k, v in llm.items() if v is not None}, "source": "llm"}
+    if llm.get("drug_name") and llm["drug_name"] != local.get("drug_name"):
+        hits = matcher.find(llm["drug_name"])
+        merged["rx_cui"] = hits[0].rx_cui if hits else None
+    return merged
+
+
+async def parse_pill_label_with_llm_async(
+    ocr_text: str, llm_slots: Optional[asyncio.Semaphore] = None
+) -> Dict[str, Any]:
+    """
+    Parse locally first and call the configured LLM provider only when the
+    local parse is below PILL_LOCAL_CONFIDENCE_THRESHOLD. If the LLM fails,
+    the local result is returned. `llm_slots` bounds concurrent LLM
+    escalations for a batch; the local parse never waits on it.
+    """
+    # first call (and each refresh) reads the Drug catalog
+    matcher = await asyncio.to_thread(get_drug_matcher)
+    local = parse_pill_label_local(ocr_text, matcher)
+    if _confident(local):
+        return local
+    try:
+        async with llm_slots or contextlib.nullcontext():
+            raw = await get_provider().generate_async(
+                _pill_prompt(ocr_text),
+                task=TASK_PILL_LABEL,
+                system=PILL_PARSE_SYSTEM,
+                timeout=settings.llm_deadline_s,
+                validate=_parse_pill_json,
+            )
+        return _merge(local, _parse_pill_json(raw), matcher)
     except Exception as e:
         logger.exception(
-            "Gemini pill-label parsing failed, falling back to local heuristic: %s", e
+            "LLM pill-label parsing failed, falling back to local parse: %s", e
         )
-        return _very_basic_local_parse(ocr_text)
\ No newline at end of file
+        return local
@@ -0,0 +1,629 @@
+# apps/api/src/services/llm/providers.py
+# Pluggable text-in/text-out LLM providers, selected with LLM_PROVIDER.
+#
+#   gemini  – Google Gemini (google.generativeai)
+#   hf      – local transformers model (see hf_runtime.py)
+#   stub    – deterministic canned JSON per task, with configurable latency
+#             and output size; no network, no model weights
+#   record  – calls Gemini and writes every response to LLM_RECORD_DIR
+#   replay  – serves responses recorded by `record` from disk, keyed by a
+#             hash of (task, system prompt, prompt)
+#
+# Every provider is wrapped in InstrumentedProvider (latency, tokens and
+# outcome per call, see metrics.py). gemini and hf are additionally wrapped in
+# StoredProvider when LLM_STORE_ENABLED is set, so answers persist in
+# Postgres across restarts (see response_store.py); store hits never reach
+# the instrumented upstream call.
+#
+# Callers (explainer, pill_parser, interaction_from_labels,
+# interaction_assessment) keep their own prompt building and JSON parsing; only the upstream call goes through here.
+# They pass their parser as `validate` (raises on an unusable answer); the
+# persisting wrappers (StoredProvider, record mode) only keep answers it
+# accepts, so a rejected answer is asked for again instead of replayed.
+# `task` tells the stub which response schema to produce and is part of the
+# replay key.
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.core.config import settings
+from . import metrics, response_store
+from .context_packer import count_tokens
+from .resilience import is_timeout
+
+TASK_EXPLAIN = "explain"
+TASK_DRUG_SUMMARY = "drug_summary"
+TASK_PILL_LABEL = "pill_label"
+TASK_INTERACTIONS = "interactions"
+TASK_INTERACTION_ASSESS = "interaction_assess"
+
+# Bump a task's version to invalidate its stored responses (response_store.py)
+# when its parsing or meaning changes but the prompt text does not.
+PROMPT_VERSIONS: Dict[str, str] = {
+    TASK_EXPLAIN: "1",
+    TASK_DRUG_SUMMARY: "1",
+    TASK_PILL_LABEL: "1",
+    TASK_INTERACTIONS: "1",
+    TASK_INTERACTION_ASSESS: "1",
+}
+
+
+class ProviderUnavailable(RuntimeError):
+    """The configured provider cannot be used at all (missing key, SDK or model)."""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class ReplayMiss(LookupError):
+    pass
+
+
+# raises if the caller can't use an answer; see _accepted
+Validator = Callable[[str], Any]
+
+
+def _accepted(text: str, json_mode: bool, validate: Optional[Validator]) -> bool:
+    """Whether an answer may be persisted (or served back from persistence)."""
+    if not text:
+        return False
+    if validate is not None:
+        try:
+            # the caller parses the answer again; count its parse failures once
+            with metrics.muted():
+                validate(text)
+            return True
+        except Exception:
+            return False
+    if not json_mode:
+        return True
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+class LLMProvider:
+    name = "base"
+
+    def models(self) -> List[str]:
+        """Model names to try, in fallback order."""
+        raise NotImplementedError
+
+    def generate(
+        self,
+        prompt: str,
+        *,
+        task: str,
+        system: Optional[str] = None,
+        model: Optional[str] = None,
+        json_mode: bool = True,
+        temperature: Optional[float] = None,
+        max_output_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        validate: Optional[Validator] = None,
+    ) -> str:
+        """`validate` is only consulted by wrappers that persist answers."""
+        raise NotImplementedError
+
+    async def generate_async(self, prompt: str, **kw) -> str:
+        return await asyncio.to_thread(self.generate, prompt, **kw)
+
+    def stream(self, prompt: str, **kw) -> Iterator[str]:
+        """Yield the answer in chunks; providers without streaming yield it whole."""
+        yield self.generate(prompt, **kw)
+
+
+# ---------------- Gemini ----------------
+
+class GeminiProvider(LLMProvider):
+    name = "gemini"
+
+    def __init__(self):
+        api_key = os.getenv("GEMINI_API_KEY", "") or settings.gemini_api_key
+        if not api_key:
+            raise ProviderUnavailable("no_api_key", "Gemini API key not configured.")
+        try:
+            import google.generativeai as genai
+        except Exception as e:
+            raise ProviderUnavailable("sdk_missing", f"Gemini SDK not installed: {e}")
+        # configure once per process, not per request
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models: Dict[tuple, object] = {}
+        self._lock = Lock()
+
+    def models(self) -> List[str]:
+        # Prefer 2.5 models; try the configured one first
+        candidates = [
+            os.getenv("GEMINI_MODEL", "") or settings.gemini_model,
+            "gemini-2.5-flash",
+            "gemini-2.5-flash-lite",
+            "gemini-flash-latest",
+            "gemini-pro-latest",
+        ]
+        seen = set()
+        return [m for m in candidates if m and not (m in seen or seen.add(m))]
+
+    def _model(self, model, system, json_mode, temperature, max_output_tokens):
+        name = model or self.models()[0]
+        key = (name, system, json_mode, temperature, max_output_tokens)
+        with self._lock:
+            m = self._models.get(key)
+            if m is None:
+                config = {}
+                if json_mode:
+                    config["response_mime_type"] = "application/json"
+                if temperature is not None:
+                    config["temperature"] = temperature
+                if max_output_tokens is not None:
+                    config["max_output_tokens"] = max_output_tokens
+                m = self._genai.GenerativeModel(name, generation_config=config, system_instruction=system)
+                self._models[key] = m
+        return m
+
+    @staticmethod
+    def _text(resp) -> str:
+        text = getattr(resp, "text", "") or ""
+        if not text and getattr(resp, "candidates", None):
+            # try to recover text from candidates if present
+            for cand in resp.candidates:
+                content = getattr(cand, "content", None)
+                parts = getattr(content, "parts", None) if content else None
+                for p in parts or []:
+                    if getattr(p, "text", None):
+                        return p.text
+        if not text:
+            raise RuntimeError("Empty response body")
+        return text
+
+    @staticmethod
+    def _options(timeout):
+        return {"timeout": timeout} if timeout else None
+
+    def generate(self, prompt, *, task, system=None, model=None, json_mode=True,
+                 temperature=None, max_output_tokens=None, timeout=None) -> str:
+        m = self._model(model, system, json_mode, temperature, max_output_tokens)
+        return self._text(m.generate_content([prompt], request_options=self._options(timeout)))
+
+    async def generate_async(self, prompt, *, task, system=None, model=None, json_mode=True,
+                             temperature=None, max_output_tokens=None, timeout=None) -> str:
+        m = self._model(model, system, json_mode, temperature, max_output_tokens)
+        return self._text(await m.generate_content_async([prompt], request_options=self._options(timeout)))
+
+    def stream(self, prompt, *, task, system=None, model=None, json_mode=True,
+               temperature=None, max_output_tokens=None, timeout=None) -> Iterator[str]:
+        m = self._model(model, system, json_mode, temperature, max_output_tokens)
+        for chunk in m.generate_content([prompt], stream=True, request_options=self._options(timeout)):
+            text = getattr(chunk, "text", "") or ""
+            if text:
+                yield text
+
+
+# ---------------- local HF ----------------
+
+class HFProvider(LLMProvider):
+    name = "hf"
+
+    def models(self) -> List[str]:
+        return [settings.hf_model]
+
+    @staticmethod
+    def _runtime():
+        from .hf_runtime import get_runtime
+        try:
+            return get_runtime()
+        except Exception as e:
+            raise ProviderUnavailable(
+                "provider_unavailable",
+                "LLM provider not available. Set LLM_PROVIDER=gemini or install transformers.",
+            ) from e
+
+    @staticmethod
+    def _full_prompt(prompt: str, system: Optional[str]) -> str:
+        # no separate system turn; prepend it unless the caller already did
+        if not system or prompt.startswith(system):
+            return prompt
+        return f"{system}\n\n{prompt}"
+
+    def generate(self, prompt, *, task, system=None, timeout=None, **_) -> str:
+        return self._runtime().generate(self._full_prompt(prompt, system), timeout=timeout)
+
+    async def generate_async(self, prompt, *, task, system=None, timeout=None, **_) -> str:
+        # first use may load the model; keep that off the event loop
+        runtime = await asyncio.to_thread(self._runtime)
+        # on timeout (or caller cancellation) the queued prompt is cancelled
+        # and the batch worker skips it
+        return await asyncio.wait_for(
+            asyncio.wrap_future(runtime.submit(self._full_prompt(prompt, system))), timeout)
+
+
+# ---------------- deterministic stub ----------------
+
+_WORDS = (
+    "this medicine may help with symptoms and can cause side effects such as "
+    "dizziness nausea or headache talk to your pharmacist about other drugs"
+).split()
+
+
+class StubProvider(LLMProvider):
+    """
+    Canned, schema-valid answers for every task. The text depends only on the
+    prompt; latency is drawn from LLM_STUB_LATENCY_DIST with a seeded RNG so a
+    load test run is reproducible.
+    """
+    name = "stub"
+
+    def __init__(self):
+        self._rng = random.Random(settings.llm_stub_seed)
+        self._lock = Lock()
+
+    def models(self) -> List[str]:
+        return ["stub"]
+
+    # --- latency / failures ---
+
+    def _latency(self) -> Tuple[float, bool]:
+        base = settings.llm_stub_latency_ms / 1000.0
+        spread = settings.llm_stub_latency_spread
+        with self._lock:
+            if settings.llm_stub_latency_dist == "uniform":
+                s = self._rng.uniform(base * (1 - spread), base * (1 + spread))
+            elif settings.llm_stub_latency_dist == "lognormal":
+                # base is the median
+                s = self._rng.lognormvariate(math.log(base), spread) if base > 0 else 0.0
+            else:
+                s = base
+            fail = self._rng.random() < settings.llm_stub_error_rate
+        s += settings.llm_stub_output_tokens * settings.llm_stub_ms_per_token / 1000.0
+        return max(0.0, s), fail
+
+    # --- content ---
+
+    @staticmethod
+    def _words(n_tokens: int, seed: str) -> str:
+        # ~0.75 words per token
+        n = max(1, int(n_tokens * 0.75))
+        off = int(hashlib.sha256(seed.encode("utf-8")).hexdigest(), 16) % len(_WORDS)
+        return " ".join(_WORDS[(off + i) % len(_WORDS)] for i in range(n)).capitalize() + "."
+
+    def _answer(self, task: str, prompt: str) -> str:
+        tokens = settings.llm_stub_output_tokens
+        if task == TASK_EXPLAIN:
+            ids = [int(i) for i in re.findall(r"\[C(\d+)\]", prompt)]
+            ids = list(dict.fromkeys(ids))
+            n = 4
+            bullets = [self._words(tokens // n, f"{prompt}:{i}") for i in range(n)]
+            return json.dumps({"bullets": bullets, "used_citation_ids": ids[:2]})
+        if task == TASK_DRUG_SUMMARY:
+            ids = list(dict.fromkeys(int(i) for i in re.findall(r"\[C(\d+)\]", prompt)))
+            return json.dumps({
+                "summary": self._words(tokens, prompt),
+                "treats": "general health",
+                "caution": "may cause side effects",
+                "used_citation_ids": ids[:2],
+            })
+        if task == TASK_PILL_LABEL:
+            quoted = re.search(r'"""(.*?)"""', prompt, flags=re.S)
+            ocr = quoted.group(1) if quoted else prompt
+            strength = re.search(r"\d+\s*(?:mg|mcg|g|ml)\b", ocr, flags=re.I)
+            line = ocr[ocr.rfind("\n", 0, strength.start()) + 1:strength.start()] if strength else ocr
+            caps = re.findall(r"\b[A-Z][A-Z0-9]{2,}\b", line)
+            sig = re.search(r"^.*\bTAKE\b.*$", ocr, flags=re.M | re.I)
+            return json.dumps({
+                "drug_name": caps[0].title() if caps else None,
+                "strength": strength.group(0) if strength else None,
+                "raw_sig": sig.group(0).strip() if sig else None,
+                "directions_summary": f"Label instructions: {sig.group(0).strip()}" if sig else None,
+                "notes": None,
+                "confidence": 0.5,
+            })
+        if task == TASK_INTERACTIONS:
+            # batched extraction prompts expect {chunk id: [...]}
+            ids = re.findall(r"^=== (\S+) \(source drug", prompt, flags=re.M)
+            return json.dumps({cid: [] for cid in ids}) if ids else "[]"
+        if task == TASK_INTERACTION_ASSESS:
+            ids = list(dict.fromkeys(int(i) for i in re.findall(r"\[C(\d+)\]", prompt)))
+            return json.dumps({
+                "severity": "none",
+                "mechanism": "",
+                "guidance": self._words(tokens // 2, prompt),
+                "used_citation_ids": ids[:1],
+            })
+        return "{}"
+
+    def _prepare(self, task: str, prompt: str):
+        delay, fail = self._latency()
+        if fail:
+            raise RuntimeError("stub provider: injected failure")
+        return delay, self._answer(task, prompt)
+
+    def generate(self, prompt, *, task, timeout=None, **_) -> str:
+        delay, text = self._prepare(task, prompt)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"stub provider: {delay:.2f}s exceeds timeout {timeout:.2f}s")
+        time.sleep(delay)
+        return text
+
+    async def generate_async(self, prompt, *, task, timeout=None, **_) -> str:
+        delay, text = self._prepare(task, prompt)
+        if timeout is not None and delay > timeout:
+            await asyncio.sleep(timeout)
+            raise TimeoutError(f"stub provider: {delay:.2f}s exceeds timeout {timeout:.2f}s")
+        await asyncio.sleep(delay)
+        return text
+
+    def stream(self, prompt, *, task, timeout=None, **_) -> Iterator[str]:
+        delay, text = self._prepare(task, prompt)
+        n = 8
+        step = max(1, math.ceil(len(text) / n))
+        for i in range(0, len(text), step):
+            time.sleep(delay / n)
+            yield text[i:i + step]
+
+
+# ---------------- record / replay ----------------
+
+class RecordReplayProvider(LLMProvider):
+    """
+    mode="record": forward to `inner` and store each answer on disk.
+    mode="replay": answer only from disk; a miss raises ReplayMiss, or falls
+    back to the stub when LLM_REPLAY_MISS=stub.
+    """
+
+    def __init__(self, mode: str, directory: str, inner: Optional[LLMProvider] = None):
+        self.name = mode
+        self.mode = mode
+        self.dir = directory
+        self.inner = inner
+        self._stub: Optional[StubProvider] = None
+
+    def models(self) -> List[str]:
+        return self.inner.models() if self.inner else [settings.gemini_model]
+
+    @staticmethod
+    def key(task: str, system: Optional[str], prompt: str) -> str:
+        raw = json.dumps([task, system or "", prompt], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.dir, key[:2], f"{key}.json")
+
+    def _load(self, task, system, prompt) -> Optional[str]:
+        try:
+            with open(self._path(self.key(task, system, prompt)), encoding="utf-8") as f:
+                return json.load(f)["response"]
+        except FileNotFoundError:
+            return None
+
+    def _save(self, task, system, prompt, model, text) -> None:
+        path = self._path(self.key(task, system, prompt))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"task": task, "model": model, "system": system, "prompt": prompt,
+                       "response": text, "recorded_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _miss(self, task, prompt) -> StubProvider:
+        if settings.llm_replay_miss != "stub":
+            raise ReplayMiss(f"no recording for {task} prompt {self.key(task, None, prompt)[:12]}…")
+        if self._stub is None:
+            self._stub = StubProvider()
+        return self._stub
+
+    def _record(self, task, system, prompt, model, text, json_mode, validate) -> None:
+        if _accepted(text, json_mode, validate):
+            self._save(task, system, prompt, model, text)
+
+    def generate(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> str:
+        if self.mode == "replay":
+            text = self._load(task, system, prompt)
+            if text is None:
+                return self._miss(task, prompt).generate(prompt, task=task, system=system, model=model, **kw)
+            return text
+        text = self.inner.generate(prompt, task=task, system=system, model=model, **kw)
+        self._record(task, system, prompt, model, text, kw.get("json_mode", True), validate)
+        return text
+
+    async def generate_async(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> str:
+        if self.mode == "replay":
+            text = self._load(task, system, prompt)
+            if text is None:
+                return await self._miss(task, prompt).generate_async(
+                    prompt, task=task, system=system, model=model, **kw)
+            return text
+        text = await self.inner.generate_async(prompt, task=task, system=system, model=model, **kw)
+        self._record(task, system, prompt, model, text, kw.get("json_mode", True), validate)
+        return text
+
+    def stream(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> Iterator[str]:
+        if self.mode == "replay":
+            text = self._load(task, system, prompt)
+            if text is None:
+                yield from self._miss(task, prompt).stream(prompt, task=task, system=system, model=model, **kw)
+                return
+            yield text
+            return
+        chunks = []
+        for text in self.inner.stream(prompt, task=task, system=system, model=model, **kw):
+            chunks.append(text)
+            yield text
+        self._record(task, system, prompt, model, "".join(chunks), kw.get("json_mode", True), validate)
+
+
+# ---------------- instrumentation ----------------
+
+class InstrumentedProvider(LLMProvider):
+    """Record latency, estimated tokens and outcome of every upstream call."""
+
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+        self.name = inner.name
+
+    def models(self) -> List[str]:
+        return self.inner.models()
+
+    def _record(self, task, model, system, prompt, t0, text=None, error=None) -> None:
+        if error is None:
+            outcome = "ok"
+        else:
+            outcome = "timeout" if is_timeout(error) else "error"
+        metrics.record_call(
+            task, self.name, model or self.models()[0], time.perf_counter() - t0, outcome,
+            input_tokens=count_tokens((system or "") + prompt),
+            output_tokens=count_tokens(text) if text else 0,
+        )
+
+    def generate(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> str:
+        t0 = time.perf_counter()
+        try:
+            text = self.inner.generate(prompt, task=task, system=system, model=model, **kw)
+        except Exception as e:
+            self._record(task, model, system, prompt, t0, error=e)
+            raise
+        self._record(task, model, system, prompt, t0, text=text)
+        return text
+
+    async def generate_async(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> str:
+        t0 = time.perf_counter()
+        try:
+            text = await self.inner.generate_async(prompt, task=task, system=system, model=model, **kw)
+        except Exception as e:
+            self._record(task, model, system, prompt, t0, error=e)
+            raise
+        self._record(task, model, system, prompt, t0, text=text)
+        return text
+
+    def stream(self, prompt, *, task, system=None, model=None, validate=None, **kw) -> Iterator[str]:
+        t0 = time.perf_counter()
+        chunks = []
+        try:
+            for text in self.inner.stream(prompt, task=task, system=system, model=model, **kw):
+                chunks.append(text)
+                yield text
+        except Exception as e:
+            self._record(task, model, system, prompt, t0, error=e)
+            raise
+        self._record(task, model, system, prompt, t0, text="".join(chunks))
+
+
+# ---------------- durable response store ----------------
+
+class StoredProvider(LLMProvider):
+    """
+    Answer from the llm_response table when an identical call was made
+    before; otherwise call `inner` and store the answer. Answers are stored
+    only if the caller's `validate` accepts them (without one: if non-empty
+    and, in JSON mode, if they parse), so a rejected reply is retried next
+    time; a stored answer `validate` rejects is treated as a miss.
+    """
+
+    def __init__(self, inner: LLMProvider):
+        self.inner = inner
+        self.name = inner.name
+
+    def models(self) -> List[str]:
+        return self.inner.models()
+
+    @staticmethod
+    def _version(task: str) -> str:
+        return f"{settings.llm_store_version}:{PROMPT_VERSIONS.get(task, '1')}"
+
+    @staticmethod
+    def _versions() -> Dict[str, str]:
+        return {task: StoredProvider._version(task) for task in PROMPT_VERSIONS}
+
+    def _key(self, prompt, task, system, model, json_mode, temperature, max_output_tokens) -> Tuple[str, str]:
+        model = model or self.models()[0]
+        config = {"json": json_mode, "temperature": temperature, "max_output_tokens": max_output_tokens}
+        return response_store.response_key(self.name, model, system, prompt, config, self._version(task)), model
+
+    @staticmethod
+    def _usable(hit: Optional[str], json_mode: bool, validate: Optional[Validator]) -> bool:
+        usable = hit is not None and (validate is None or _accepted(hit, json_mode, validate))
+        metrics.cache_lookup("llm_store", usable)
+        return usable
+
+    def generate(self, prompt, *, task, system=None, model=None, json_mode=True,
+                 temperature=None, max_output_tokens=None, timeout=None, validate=None) -> str:
+        key, model = self._key(prompt, task, system, model, json_mode, temperature, max_output_tokens)
+        hit = response_store.get(key)
+        if self._usable(hit, json_mode, validate):
+            return hit
+        text = self.inner.generate(prompt, task=task, system=system, model=model, json_mode=json_mode,
+                                   temperature=temperature, max_output_tokens=max_output_tokens, timeout=timeout)
+        if _accepted(text, json_mode, validate):
+            response_store.put(key, task, self.name, model, self._version(task), text, self._versions())
+        return text
+
+    async def generate_async(self, prompt, *, task, system=None, model=None, json_mode=True,
+                             temperature=None, max_output_tokens=None, timeout=None, validate=None) -> str:
+        key, model = self._key(prompt, task, system, model, json_mode, temperature, max_output_tokens)
+        hit = await response_store.get_async(key)
+        if self._usable(hit, json_mode, validate):
+            return hit
+        text = await self.inner.generate_async(
+            prompt, task=task, system=system, model=model, json_mode=json_mode,
+            temperature=temperature, max_output_tokens=max_output_tokens, timeout=timeout)
+        if _accepted(text, json_mode, validate):
+            await response_store.put_async(key, task, self.name, model, self._version(task), text, self._versions())
+        return text
+
+    def stream(self, prompt, *, task, system=None, model=None, json_mode=True,
+               temperature=None, max_output_tokens=None, timeout=None, validate=None) -> Iterator[str]:
+        key, model = self._key(prompt, task, system, model, json_mode, temperature, max_output_tokens)
+        hit = response_store.get(key)
+        if self._usable(hit, json_mode, validate):
+            yield hit
+            return
+        chunks = []
+        for text in self.inner.stream(prompt, task=task, system=system, model=model, json_mode=json_mode,
+                                      temperature=temperature, max_output_tokens=max_output_tokens,
+                                      timeout=timeout):
+            chunks.append(text)
+            yield text
+        text = "".join(chunks)
+        if _accepted(text, json_mode, validate):
+            response_store.put(key, task, self.name, model, self._version(task), text, self._versions())
+
+
+# ---------------- selection ----------------
+
+_PROVIDER: Optional[LLMProvider] = None
+_PROVIDER_LOCK = Lock()
+
+
+def _build() -> LLMProvider:
+    kind = settings.llm_provider
+    if kind == "stub":
+        return InstrumentedProvider(StubProvider())
+    if kind == "record":
+        return RecordReplayProvider("record", settings.llm_record_dir, InstrumentedProvider(GeminiProvider()))
+    if kind == "replay":
+        return InstrumentedProvider(RecordReplayProvider("replay", settings.llm_record_dir))
+    provider = InstrumentedProvider(HFProvider() if kind == "hf" else GeminiProvider())
+    return StoredProvider(provider) if settings.llm_store_enabled else provider
+
+
+def get_provider() -> LLMProvider:
+    """
+    The process-wide provider for LLM_PROVIDER. Raises ProviderUnavailable
+    when it can't be built (e.g. no Gemini key); that is retried on the next call.
+    """
+    global _PROVIDER
+    with _PROVIDER_LOCK:
+        if _PROVIDER is None:
+            _PROVIDER = _build()
+        return _PROVIDER
@@ -0,0 +1,271 @@
+# apps/api/src/services/llm/resilience.py
+# Deadlines, per-model circuit breakers and hedged requests for LLM calls.
+#
+# - Deadline: a request-wide time budget; each attempt gets the remaining time.
+# - CircuitBreaker: one per candidate model. Opens after repeated failures or
+#   slow responses, rejects calls while open, lets one probe through after
+#   a cool-down (half-open) and closes again on success.
+# - hedged(): start the primary call, and if it hasn't answered after a
+#   p95-based delay, race a second model against it.
+
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import Lock
+from time import monotonic
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def attempt_timeout(self) -> float:
+        """Timeout for one upstream attempt: the per-attempt cap, bounded by what's left."""
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded(f"LLM deadline of {self.seconds:.1f}s exceeded")
+        return min(left, settings.llm_attempt_timeout_s)
+
+
+def is_timeout(e: BaseException) -> bool:
+    name = type(e).__name__
+    return isinstance(e, TimeoutError) or "Timeout" in name or "DeadlineExceeded" in name
+
+
+# ---------------- circuit breaker ----------------
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.latencies: Deque[float] = deque(maxlen=200)
+        self.counters = {"calls": 0, "failures": 0, "slow": 0, "timeouts": 0, "rejected": 0, "opened": 0}
+        self._lock = Lock()
+
+    def available(self) -> bool:
+        """Whether allow() would currently let a call through, without taking the half-open probe."""
+        with self._lock:
+            return self.state == self.CLOSED or monotonic() - self.opened_at >= settings.llm_breaker_open_s
+
+    def allow(self) -> bool:
+        """Call right before an attempt: in half-open state this uses up the single probe."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                if monotonic() - self.opened_at >= settings.llm_breaker_open_s:
+                    # let a single probe through per cool-down period
+                    self.state = self.HALF_OPEN
+                    self.opened_at = monotonic()
+                    return True
+                self.counters["rejected"] += 1
+                return False
+            return True
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.counters["calls"] += 1
+            self.latencies.append(latency)
+            if latency >= settings.llm_slow_call_s:
+                # slow answers are usable but count towards opening
+                self.counters["slow"] += 1
+                self._fail_locked()
+                return
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self, e: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["failures"] += 1
+            if e is not None and is_timeout(e):
+                self.counters["timeouts"] += 1
+            self._fail_locked()
+
+    def _fail_locked(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= settings.llm_breaker_failures:
+            if self.state != self.OPEN:
+                self.counters["opened"] += 1
+                logger.warning("circuit breaker for %s opened after %d failures", self.name, self.failures)
+            self.state = self.OPEN
+            self.opened_at = monotonic()
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < 20:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def snapshot(self) -> Dict:
+        p95 = self.p95()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+            **self.counters,
+        }
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        b = _BREAKERS.get(name)
+        if b is None:
+            b = _BREAKERS[name] = CircuitBreaker(name)
+        return b
+
+
+def guarded(name: str, fn: Callable[[], str]) -> str:
+    """Run one upstream call through `name`'s breaker, recording latency or failure."""
+    breaker = get_breaker(name)
+    t0 = monotonic()
+    try:
+        out = fn()
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    breaker.record_success(monotonic() - t0)
+    return out
+
+
+async def guarded_async(name: str, fn: Callable[[], Awaitable[str]]) -> str:
+    """Async variant of guarded()."""
+    breaker = get_breaker(name)
+    t0 = monotonic()
+    try:
+        out = await fn()
+    except Exception as e:
+        breaker.record_failure(e)
+        raise
+    breaker.record_success(monotonic() - t0)
+    return out
+
+
+# ---------------- hedging ----------------
+
+_HEDGE_STATS = {"fired": 0, "won": 0}
+_EXECUTOR = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+
+def hedge_delay(primary: str) -> float:
+    p95 = get_breaker(primary).p95()
+    delay = p95 if p95 is not None else settings.llm_hedge_default_delay_s
+    return max(settings.llm_hedge_min_delay_s, delay)
+
+
+def hedged(
+    primary: Tuple[str, Callable[[], str]],
+    secondary: Optional[Tuple[str, Callable[[], str]]],
+    deadline: Deadline,
+    started: Optional[List[str]] = None,
+) -> Tuple[str, str]:
+    """
+    Run primary; if it is still running after hedge_delay(primary) and a
+    secondary is given, start the secondary too. Returns (model, text) from
+    the first call that succeeds. Raises the last error if both fail, or
+    DeadlineExceeded if neither finishes in time. The models actually called
+    are appended to `started`, so callers can tell whether the hedge fired.
+    """
+    started = started if started is not None else []
+    p_name, p_fn = primary
+    pending = {_EXECUTOR.submit(guarded, p_name, p_fn): p_name}
+    started.append(p_name)
+
+    done, _ = wait(pending, timeout=min(hedge_delay(p_name), deadline.remaining()))
+    if not done and secondary is not None and not deadline.expired and get_breaker(secondary[0]).allow():
+        s_name, s_fn = secondary
+        _HEDGE_STATS["fired"] += 1
+        pending[_EXECUTOR.submit(guarded, s_name, s_fn)] = s_name
+        started.append(s_name)
+
+    last_err: Optional[BaseException] = None
+    while pending:
+        done, _ = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for fut in done:
+            name = pending.pop(fut)
+            err = fut.exception()
+            if err is None:
+                if name != p_name:
+                    _HEDGE_STATS["won"] += 1
+                return name, fut.result()
+            last_err = err
+    if pending:
+        raise DeadlineExceeded(f"LLM deadline of {deadline.seconds:.1f}s exceeded")
+    raise last_err or RuntimeError("LLM call failed")
+
+
+async def hedged_async(
+    primary: Tuple[str, Callable[[], Awaitable[str]]],
+    secondary: Optional[Tuple[str, Callable[[], Awaitable[str]]]],
+    deadline: Deadline,
+    started: Optional[List[str]] = None,
+) -> Tuple[str, str]:
+    """Async variant of hedged(); the losing call is cancelled."""
+    started = started if started is not None else []
+    p_name, p_fn = primary
+    pending = {asyncio.ensure_future(guarded_async(p_name, p_fn)): p_name}
+    started.append(p_name)
+
+    done, _ = await asyncio.wait(pending, timeout=min(hedge_delay(p_name), deadline.remaining()))
+    if not done and secondary is not None and not deadline.expired and get_breaker(secondary[0]).allow():
+        s_name, s_fn = secondary
+        _HEDGE_STATS["fired"] += 1
+        pending[asyncio.ensure_future(guarded_async(s_name, s_fn))] = s_name
+        started.append(s_name)
+
+    last_err: Optional[BaseException] = None
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=deadline.remaining(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                name = pending.pop(task)
+                err = task.exception()
+                if err is None:
+                    if name != p_name:
+                        _HEDGE_STATS["won"] += 1
+                    return name, task.result()
+                last_err = err
+    finally:
+        for task in pending:
+            task.cancel()
+    if pending:
+        raise DeadlineExceeded(f"LLM deadline of {deadline.seconds:.1f}s exceeded")
+    raise last_err or RuntimeError("LLM call failed")
+
+
+def stats() -> Dict:
+    return {
+        "deadline_s": settings.llm_deadline_s,
+        "hedging_enabled": settings.llm_hedging_enabled,
+        "hedges": dict(_HEDGE_STATS),
+        "breakers": {name: b.snapshot() for name, b in _BREAKERS.items()},
+    }
@@ -0,0 +1,165 @@
+# apps/api/src/services/llm/response_store.py
+# Durable, content-addressed store for LLM answers (table llm_response).
+#
+# Every call site goes through providers.get_provider(), which wraps the real
+# provider in StoredProvider when LLM_STORE_ENABLED is set, so explain,
+# drug summaries, pill labels and interaction extraction all share it and an
+# identical prompt is answered from Postgres after a restart or redeploy.
+#
+# The key hashes (provider, model, system prompt, prompt, generation config,
+# prompt version). Prompt text changes invalidate on their own; bump the
+# task's entry in providers.PROMPT_VERSIONS (or LLM_STORE_VERSION for all
+# tasks) when parsing or meaning changes without the text changing. Rows of
+# superseded versions are deleted on the next prune, and least recently used
+# rows go once the table holds more than LLM_STORE_MAX_MB of responses.
+
+import hashlib
+import json
+import logging
+from itertools import count
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core.config import settings
+from src.db.models import LLMResponse
+from src.db.session import AsyncSessionLocal, get_session
+
+logger = logging.getLogger(__name__)
+
+_writes = count(1)
+
+_TOUCH = text("""
+    UPDATE llm_response
+    SET hits = hits + 1, last_used_at = now()
+    WHERE key = :key
+    RETURNING response
+""")
+
+_DELETE_OLD_VERSION = text("""
+    DELETE FROM llm_response WHERE task = :task AND prompt_version <> :version
+""")
+
+# keep the most recently used rows whose sizes add up to :max_bytes
+_EVICT = text("""
+    DELETE FROM llm_response WHERE key IN (
+        SELECT key FROM (
+            SELECT key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, key) AS running
+            FROM llm_response
+        ) ranked
+        WHERE running > :max_bytes
+    )
+""")
+
+
+def response_key(
+    provider: str,
+    model: str,
+    system: Optional[str],
+    prompt: str,
+    config: Dict[str, Any],
+    prompt_version: str,
+) -> str:
+    raw = json.dumps(
+        [provider, model, system or "", prompt, config, prompt_version],
+        ensure_ascii=False, sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _upsert(key: str, task: str, provider: str, model: str, prompt_version: str, response: str):
+    return (
+        pg_insert(LLMResponse)
+        .values(
+            key=key, task=task, provider=provider, model=model, prompt_version=prompt_version,
+            response=response, size_bytes=len(response.encode("utf-8")), hits=0,
+        )
+        .on_conflict_do_update(
+            index_elements=["key"],
+            set_={"response": response, "size_bytes": len(response.encode("utf-8")), "last_used_at": func.now()},
+        )
+    )
+
+
+def _prune_due() -> bool:
+    every = settings.llm_store_prune_every
+    return every > 0 and next(_writes) % every == 0
+
+
+def _max_bytes() -> int:
+    return int(settings.llm_store_max_mb * 1024 * 1024)
+
+
+# ---------------- sync ----------------
+
+def get(key: str) -> Optional[str]:
+    try:
+        with get_session() as db:
+            hit = db.execute(_TOUCH, {"key": key}).scalar()
+            db.commit()
+            return hit
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("llm store lookup failed: %s", e)
+        return None
+
+
+def put(key: str, task: str, provider: str, model: str, prompt_version: str, response: str,
+        versions: Dict[str, str]) -> None:
+    try:
+        with get_session() as db:
+            db.execute(_upsert(key, task, provider, model, prompt_version, response))
+            db.commit()
+            if _prune_due():
+                prune(db, versions)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("llm store write failed: %s", e)
+
+
+def prune(db, versions: Dict[str, str]) -> int:
+    """Drop rows of superseded prompt versions, then evict LRU rows over the size cap."""
+    deleted = 0
+    for task, version in versions.items():
+        deleted += db.execute(_DELETE_OLD_VERSION, {"task": task, "version": version}).rowcount or 0
+    deleted += db.execute(_EVICT, {"max_bytes": _max_bytes()}).rowcount or 0
+    db.commit()
+    if deleted:
+        logger.info("llm store: pruned %d response(s)", deleted)
+    return deleted
+
+
+# ---------------- async ----------------
+
+async def get_async(key: str) -> Optional[str]:
+    try:
+        async with AsyncSessionLocal() as db:
+            hit = (await db.execute(_TOUCH, {"key": key})).scalar()
+            await db.commit()
+            return hit
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("llm store lookup failed: %s", e)
+        return None
+
+
+async def put_async(key: str, task: str, provider: str, model: str, prompt_version: str, response: str,
+                    versions: Dict[str, str]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_upsert(key, task, provider, model, prompt_version, response))
+            await db.commit()
+            if _prune_due():
+                await prune_async(db, versions)
+    except (SQLAlchemyError, OSError) as e:
+        logger.warning("llm store write failed: %s", e)
+
+
+async def prune_async(db, versions: Dict[str, str]) -> int:
+    deleted = 0
+    for task, version in versions.items():
+        deleted += (await db.execute(_DELETE_OLD_VERSION, {"task": task, "version": version})).rowcount or 0
+    deleted += (await db.execute(_EVICT, {"max_bytes": _max_bytes()})).rowcount or 0
+    await db.commit()
+    if deleted:
+        logger.info("llm store: pruned %d response(s)", deleted)
+    return deleted
@@ -0,0 +1,200 @@
+# apps/api/src/services/llm/semantic_cache.py
+# Per-drug semantic answer cache for /explain.
+#
+# Paraphrases like "what is it for?", "What is this used for" and "uses?"
+# have different exact cache keys but the same answer. We store each
+# answered question's embedding next to its answer, per drug, and on lookup
+# return the answer of the nearest stored question if cosine similarity
+# passes settings.semantic_cache_threshold.
+
+import logging
+from collections import deque
+from threading import Lock
+from time import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.core.config import settings
+from ..etl.embed import embed_text
+
+logger = logging.getLogger(__name__)
+
+# hits this close above the threshold are flagged as borderline for auditing
+_BORDERLINE_MARGIN = 0.03
+# how often store() also sweeps expired entries out of every other drug's scope
+_SWEEP_INTERVAL_S = 60.0
+
+
+class _DrugEntries:
+    def __init__(self, dim: int):
+        self.vecs = np.zeros((0, dim), dtype=np.float32)
+        self.questions: List[str] = []
+        self.answers: List[Any] = []
+        self.expires: List[float] = []
+
+
+_STORE: Dict[str, _DrugEntries] = {}
+_LOCK = Lock()
+_SWEPT_AT = 0.0
+
+_STATS = {
+    "lookups": 0,
+    "hits": 0,
+    "misses": 0,
+    "borderline_hits": 0,
+    "false_hits": 0,
+    "stores": 0,
+}
+_RECENT_HITS: deque = deque(maxlen=100)
+
+
+def _normalize_question(q: str) -> str:
+    return " ".join((q or "").lower().split())
+
+
+def _embed(q: str) -> Optional[np.ndarray]:
+    try:
+        return np.asarray(embed_text(_normalize_question(q)), dtype=np.float32)
+    except Exception as e:
+        logger.warning("semantic cache: embedding failed, skipping: %s", e)
+        return None
+
+
+def lookup(scope: str, question: str) -> Optional[Any]:
+    """
+    Return the stored answer for the most similar previous question in
+    `scope` (typically provider:model:drug), or None.
+    """
+    if not settings.semantic_cache_enabled or not question:
+        return None
+    _STATS["lookups"] += 1
+
+    entries = _STORE.get(scope)
+    if entries is None or not entries.questions:
+        _STATS["misses"] += 1
+        return None
+
+    qvec = _embed(question)
+    if qvec is None:
+        _STATS["misses"] += 1
+        return None
+
+    with _LOCK:
+        # embeddings are L2-normalized, so the dot product is the cosine
+        sims = entries.vecs @ qvec
+        sims[np.asarray(entries.expires) < time()] = -1.0
+        best = int(np.argmax(sims))
+        score = float(sims[best])
+        matched_q = entries.questions[best]
+        answer = entries.answers[best]
+
+    if score < settings.semantic_cache_threshold:
+        _STATS["misses"] += 1
+        return None
+
+    _STATS["hits"] += 1
+    borderline = score < settings.semantic_cache_threshold + _BORDERLINE_MARGIN
+    if borderline:
+        _STATS["borderline_hits"] += 1
+    _RECENT_HITS.append({
+        "scope": scope,
+        "question": question,
+        "matched_question": matched_q,
+        "similarity": round(score, 4),
+        "borderline": borderline,
+        "at": time(),
+    })
+    return answer
+
+
+def _prune_locked(entries: _DrugEntries, now: float) -> None:
+    keep = [i for i, exp in enumerate(entries.expires) if exp >= now]
+    if len(keep) == len(entries.expires):
+        return
+    entries.vecs = entries.vecs[keep]
+    entries.questions = [entries.questions[i] for i in keep]
+    entries.answers = [entries.answers[i] for i in keep]
+    entries.expires = [entries.expires[i] for i in keep]
+
+
+def _sweep_locked(now: float) -> None:
+    global _SWEPT_AT
+    if now - _SWEPT_AT < _SWEEP_INTERVAL_S:
+        return
+    _SWEPT_AT = now
+    for scope in list(_STORE):
+        _prune_locked(_STORE[scope], now)
+        if not _STORE[scope].questions:
+            del _STORE[scope]
+
+
+def store(scope: str, question: str, answer: Any, ttl: Optional[float] = None) -> None:
+    if not settings.semantic_cache_enabled or not question:
+        return
+    qvec = _embed(question)
+    if qvec is None:
+        return
+    ttl = settings.explain_cache_ttl_s if ttl is None else ttl
+    norm_q = _normalize_question(question)
+
+    with _LOCK:
+        now = time()
+        _sweep_locked(now)
+        entries = _STORE.setdefault(scope, _DrugEntries(qvec.shape[0]))
+        # expired entries are never served; drop them instead of letting them hold slots
+        _prune_locked(entries, now)
+        if norm_q in entries.questions:
+            i = entries.questions.index(norm_q)
+            entries.answers[i] = answer
+            entries.expires[i] = time() + ttl
+            return
+        entries.vecs = np.vstack([entries.vecs, qvec[None, :]])
+        entries.questions.append(norm_q)
+        entries.answers.append(answer)
+        entries.expires.append(time() + ttl)
+
+        # keep the most recent entries per drug
+        overflow = len(entries.questions) - settings.semantic_cache_max_per_drug
+        if overflow > 0:
+            entries.vecs = entries.vecs[overflow:]
+            del entries.questions[:overflow]
+            del entries.answers[:overflow]
+            del entries.expires[:overflow]
+    _STATS["stores"] += 1
+
+
+def report_false_hit(scope: str, question: str) -> bool:
+    """
+    Record that a semantic hit for `question` returned the wrong answer and
+    evict the stored entry it matched. Returns True if an entry was evicted.
+    """
+    _STATS["false_hits"] += 1
+    qvec = _embed(question)
+    entries = _STORE.get(scope)
+    if qvec is None or entries is None or not entries.questions:
+        return False
+    with _LOCK:
+        sims = entries.vecs @ qvec
+        best = int(np.argmax(sims))
+        if float(sims[best]) < settings.semantic_cache_threshold:
+            return False
+        entries.vecs = np.delete(entries.vecs, best, axis=0)
+        del entries.questions[best]
+        del entries.answers[best]
+        del entries.expires[best]
+    return True
+
+
+def stats() -> Dict[str, Any]:
+    lookups = _STATS["lookups"] or 1
+    hits = _STATS["hits"] or 1
+    return {
+        **_STATS,
+        "hit_rate": round(_STATS["hits"] / lookups, 4),
+        "false_hit_rate": round(_STATS["false_hits"] / hits, 4),
+        "threshold": settings.semantic_cache_threshold,
+        "scopes": len(_STORE),
+        "entries": sum(len(e.questions) for e in _STORE.values()),
+        "recent_hits": list(_RECENT_HITS),
+    }
@@ -0,0 +1,114 @@
+# apps/api/src/services/med_interactions_service.py
+# Build the GET /me/interactions response: every interacting pair in the
+# user's medication list, from the in-memory interaction graph.
+#
+# Two caches:
+# - per user, the medication list, dropped by add/remove in
+#   routers/medications.py; the cache is per process, so other processes
+#   rely on ME_INTERACTIONS_CACHE_TTL_S to pick the change up;
+# - per sorted RxCUI set and graph version, the interacting pairs, shared by
+#   every user on the same drugs; a rule change moves the graph version, so
+#   old entries are simply never read again.
+
+import asyncio
+import hashlib
+from typing import Any, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.cache import delete_cached, get_cached, set_cached
+from ..core.config import settings
+from ..schemas.interactions import (
+    InteractingMedication,
+    InteractionSeveritySummary,
+    UserInteraction,
+    UserInteractionsResponse,
+)
+from .interaction_graph import InteractionGraph, get_interaction_graph_async, severity_rank
+from .llm import metrics
+from .med_overview_service import load_med_list
+from .retrieval.rxcui_index import get_rxcui_index
+
+
+def _med_list_key(user_id) -> str:
+    return f"me-interactions:meds:{user_id}"
+
+
+def _pairs_key(rx_cuis: List[str], version: int) -> str:
+    digest = hashlib.sha256("|".join(sorted(set(rx_cuis))).encode("utf-8")).hexdigest()
+    return f"me-interactions:pairs:{version}:{digest}"
+
+
+def invalidate_user_interactions(user_id) -> None:
+    """Call after the user's medication list changes."""
+    delete_cached(_med_list_key(user_id))
+
+
+def _pairs(graph: InteractionGraph, rx_cuis: List[str]) -> List[Dict[str, Any]]:
+    key = _pairs_key(rx_cuis, graph.version)
+    pairs = get_cached(key)
+    metrics.cache_lookup("me_interactions", pairs is not None)
+    if pairs is None:
+        pairs = []
+        for a, b, rules in graph.pairs_among(rx_cuis):
+            top = rules[0]
+            pairs.append({
+                "a": a,
+                "b": b,
+                "severity": top.severity,
+                "mechanism": top.mechanism,
+                "guidance": top.guidance,
+                "evidence_ids": [f"chunk:{i}" for i in top.evidence_ids],
+                "provisional": top.provisional,
+            })
+        set_cached(key, pairs)
+    return pairs
+
+
+def _summary(interactions: List[UserInteraction]) -> InteractionSeveritySummary:
+    by_severity: Dict[str, int] = {}
+    for i in interactions:
+        label = (i.severity or "unknown").strip().lower() or "unknown"
+        by_severity[label] = by_severity.get(label, 0) + 1
+    highest = max(by_severity, key=severity_rank) if by_severity else None
+    return InteractionSeveritySummary(total=len(interactions), highest=highest, by_severity=by_severity)
+
+
+async def user_interactions(db: AsyncSession, user_id) -> UserInteractionsResponse:
+    med_list = get_cached(_med_list_key(user_id))
+    if med_list is None:
+        med_list = await load_med_list(db, user_id)
+        set_cached(_med_list_key(user_id), med_list, ttl=settings.me_interactions_cache_ttl_s)
+
+    # UserMedication.rx_cui may hold the name typed in the tracker; the graph is keyed
+    # on RxCUIs. First medication entry per RxCUI (the same drug added twice doesn't
+    # interact with itself).
+    index = await asyncio.to_thread(get_rxcui_index)
+    by_rx: Dict[str, Dict[str, Any]] = {}
+    for m in sorted(med_list, key=lambda m: m["id"]):
+        if m["rx_cui"]:
+            by_rx.setdefault(index.resolve(m["rx_cui"]) or m["rx_cui"], m)
+    rx_cuis = sorted(by_rx)
+
+    graph = await get_interaction_graph_async()
+    interactions = [
+        UserInteraction(
+            medications=[
+                InteractingMedication(medication_id=by_rx[rx]["id"], rx_cui=rx, name=by_rx[rx]["name"])
+                for rx in (p["a"], p["b"])
+            ],
+            severity=p["severity"],
+            mechanism=p["mechanism"],
+            guidance=p["guidance"],
+            evidence_ids=p["evidence_ids"],
+            provisional=p["provisional"],
+        )
+        for p in _pairs(graph, rx_cuis)
+    ]
+    n = len(rx_cuis)
+    return UserInteractionsResponse(
+        medications=len(med_list),
+        pairs_checked=n * (n - 1) // 2,
+        interactions=interactions,
+        summary=_summary(interactions),
+    )
@@ -0,0 +1,337 @@
+# apps/api/src/services/med_overview_service.py
+# Build the /me/medications/overview response from per-drug summaries.
+#
+# Each drug's summary is generated once per (rx_cui, model, corpus_version),
+# stored in drug_explanation (question_template="med_summary") and cached
+# in-process, so it is shared by every user taking that drug. Only missing
+# summaries are generated, in parallel. The shared summaries are built from
+# the catalog generic name, never from a user's display_name. The overview
+# bullets come from the summaries through a deterministic template (no second
+# LLM call), rendered with the user's own names in to_response(); the
+# user-independent composed part is memoized on the sorted RxCUI set.
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core import singleflight
+from ..core.cache import get_cached, set_cached
+from ..core.config import settings
+from ..db import models
+from ..db.session import AsyncSessionLocal
+from ..schemas.med_overview import MedListOverviewResponse, MedOverviewCitation
+from .explanation_service import (
+    MED_SUMMARY_TEMPLATE,
+    current_model,
+    get_precomputed_many_async,
+    save_precomputed_async,
+)
+from .llm import metrics
+from .llm.context_packer import pack_med_list_context
+from .llm.explainer import summarize_drug_with_llm_async
+from .retrieval.retrieve import retrieve_with_citations_async
+
+logger = logging.getLogger(__name__)
+
+# background_job kind for overview recomputation (see services/jobs/worker.py)
+OVERVIEW_JOB = "med_overview"
+
+_STAT_FIELDS = (
+    "input_snippets", "input_tokens", "kept_snippets", "packed_tokens",
+    "total_budget", "deduped", "dropped_over_budget", "truncated",
+)
+
+
+def overview_job_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+async def load_med_list(db: AsyncSession, user_id) -> List[Dict[str, Any]]:
+    user_meds = (
+        await db.execute(
+            select(models.UserMedication)
+            .where(models.UserMedication.user_id == user_id)
+        )
+    ).scalars().all()
+    return [
+        {
+            "id": med.id,
+            "name": med.display_name or med.rx_cui,
+            "rx_cui": med.rx_cui,
+        }
+        for med in user_meds
+    ]
+
+
+def med_list_fingerprint(med_list: List[Dict[str, Any]]) -> str:
+    parts = [f"{m['id']}:{m['name']}:{m['rx_cui']}" for m in sorted(med_list, key=lambda m: m["id"])]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def empty_overview() -> MedListOverviewResponse:
+    return MedListOverviewResponse(
+        overview_bullets=[
+            "We couldn't find any medications on your profile yet.",
+            "Add medications to your tracker to see an overview here.",
+        ],
+        per_drug=[],
+        citations=[],
+        used_citation_ids=[],
+    )
+
+
+def _summary_key(rx_cui: str) -> str:
+    return f"med-summary:{current_model()}:{settings.corpus_version}:{rx_cui}"
+
+
+def overview_memo_key(rx_cuis: List[str]) -> str:
+    digest = hashlib.sha256("|".join(sorted(set(rx_cuis))).encode("utf-8")).hexdigest()
+    return f"overview:v3:{current_model()}:{settings.corpus_version}:{digest}"
+
+
+# ---------------- per-drug summaries ----------------
+
+async def _canonical_names(rx_cuis: List[str]) -> Dict[str, str]:
+    """rx_cui -> catalog generic name; values not in the catalog map to themselves."""
+    names = {rx: rx for rx in rx_cuis}
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(models.Drug.rx_cui, models.Drug.generic_name).where(models.Drug.rx_cui.in_(rx_cuis))
+            )).all()
+    except SQLAlchemyError as e:
+        logger.warning("catalog name lookup failed: %s", e)
+        return names
+    names.update({rx: name for rx, name in rows if name})
+    return names
+
+
+async def _generate_summary(med: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Retrieve, pack and summarize one drug. `med` carries the catalog name
+    (shared by every user), not a display name. Citation ids are local to the drug.
+    """
+    try:
+        retrieval = await retrieve_with_citations_async(med["name"], k=3)
+        citations = [{**c, "drug_name": med["name"]} for c in retrieval.get("citations", [])]
+    except SQLAlchemyError as e:
+        logger.warning("retrieval failed for %s: %s", med["name"], e)
+        citations = []
+
+    packed, stats = pack_med_list_context([med], citations)
+    llm = await summarize_drug_with_llm_async(med, packed)
+    record = {
+        "name": med["name"],
+        "summary": llm["summary"],
+        "treats": llm.get("treats"),
+        "caution": llm.get("caution"),
+        "used_citation_ids": llm.get("used_citation_ids") or [],
+        "citations": [
+            {k: c.get(k) for k in ("id", "rx_cui", "section", "source_url", "snippet")}
+            for c in sorted(packed, key=lambda c: c["id"])
+        ],
+        "context_stats": stats,
+    }
+    if llm.get("error"):
+        record["error"] = llm["error"]
+    return record
+
+
+async def _store_summaries(generated: Dict[str, Dict[str, Any]]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            for rx_cui, record in generated.items():
+                await save_precomputed_async(db, rx_cui, record, template=MED_SUMMARY_TEMPLATE)
+    except SQLAlchemyError as e:
+        logger.warning("med_summary write-through failed: %s", e)
+
+
+async def get_drug_summaries(med_list: List[Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    {rx_cui: summary record} for every drug in the list, plus the rx_cuis that
+    had to be generated now. Lookup order: in-process cache, drug_explanation,
+    then the LLM (misses only, bounded concurrency).
+    """
+    first_med = {}
+    for m in med_list:
+        first_med.setdefault(m["rx_cui"], m)
+
+    found: Dict[str, Dict[str, Any]] = {}
+    for rx_cui in first_med:
+        cached = get_cached(_summary_key(rx_cui))
+        metrics.cache_lookup("med_summary", bool(cached))
+        if cached:
+            found[rx_cui] = cached
+
+    missing = [rx for rx in first_med if rx not in found]
+    if missing:
+        try:
+            async with AsyncSessionLocal() as db:
+                stored = await get_precomputed_many_async(db, missing, template=MED_SUMMARY_TEMPLATE)
+        except SQLAlchemyError as e:
+            logger.warning("med_summary lookup failed, generating: %s", e)
+            stored = {}
+        for rx_cui in missing:
+            metrics.cache_lookup("med_summary_db", rx_cui in stored)
+        for rx_cui, record in stored.items():
+            set_cached(_summary_key(rx_cui), record, ttl=settings.med_summary_cache_ttl_s)
+            found[rx_cui] = record
+
+    missing = [rx for rx in first_med if rx not in found]
+    if missing:
+        sem = asyncio.Semaphore(max(1, settings.med_summary_concurrency))
+        names = await _canonical_names(missing)
+
+        async def one(rx_cui: str) -> Dict[str, Any]:
+            drug = {"id": first_med[rx_cui]["id"], "name": names[rx_cui], "rx_cui": rx_cui}
+            async with sem:
+                # users sharing a drug share its generation
+                return await singleflight.do_async(_summary_key(rx_cui), lambda: _generate_summary(drug))
+
+        records = await asyncio.gather(*(one(rx) for rx in missing))
+        generated = {}
+        for rx_cui, record in zip(missing, records):
+            found[rx_cui] = record
+            if not record.get("error"):
+                set_cached(_summary_key(rx_cui), record, ttl=settings.med_summary_cache_ttl_s)
+                generated[rx_cui] = record
+        if generated:
+            await _store_summaries(generated)
+
+    return found, missing
+
+
+# ---------------- composition ----------------
+
+def compose_overview_bullets(summaries: Dict[str, Dict[str, Any]], names: Dict[str, str]) -> List[str]:
+    """
+    Deterministic 3–6 bullet overview built from per-drug summaries
+    ({rx_cui: record}), naming each drug as the user does (`names`).
+    """
+    ordered = [(names.get(rx) or s.get("name") or rx, s) for rx, s in sorted(summaries.items())]
+    groups: Dict[str, List[str]] = {}
+    for name, s in ordered:
+        groups.setdefault((s.get("treats") or "other conditions").strip().lower(), []).append(name)
+
+    bullets = []
+    if groups:
+        parts = [f"{treats} ({', '.join(names)})" for treats, names in groups.items()]
+        bullets.append("Overall, your medicines help with " + "; ".join(parts) + ".")
+
+    cautions = [(name, s) for name, s in ordered if s.get("caution")]
+    for name, s in cautions[:4]:
+        caution = s["caution"].rstrip(".")
+        bullets.append(f"{name}: {caution[:1].lower() + caution[1:]}.")
+
+    bullets.append(
+        "If you have questions about how these medicines work together, "
+        "ask your pharmacist or doctor."
+    )
+    return bullets
+
+
+def _aggregate_stats(records: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    stats = [r["context_stats"] for r in records if r.get("context_stats")]
+    if not stats:
+        return None
+    out = {f: sum(s.get(f, 0) for s in stats) for f in _STAT_FIELDS}
+    out["medications"] = len(stats)
+    out["per_drug_budget"] = max(s.get("per_drug_budget", 0) for s in stats)
+    return out
+
+
+async def compose_overview(med_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    User-independent part of the overview for this set of RxCUIs, memoized on
+    the sorted set; holds no display names (bullets are rendered per user in
+    to_response). context_stats covers only the drugs generated for it.
+    """
+    rx_cuis = [m["rx_cui"] for m in med_list]
+    memo_key = overview_memo_key(rx_cuis)
+    composed = get_cached(memo_key)
+    if composed:
+        return composed
+
+    summaries, generated = await get_drug_summaries(med_list)
+    composed = {
+        "summaries": summaries,
+        "context_stats": _aggregate_stats([summaries[rx] for rx in generated]),
+    }
+    if not any(s.get("error") for s in summaries.values()):
+        set_cached(memo_key, composed, ttl=settings.med_overview_memo_ttl_s)
+    return composed
+
+
+def to_response(med_list: List[Dict[str, Any]], composed: Dict[str, Any]) -> MedListOverviewResponse:
+    """Attach the user's medication ids/names, render the bullets and renumber citations globally."""
+    summaries = composed["summaries"]
+    names: Dict[str, str] = {}
+    for m in med_list:
+        names.setdefault(m["rx_cui"], m["name"])
+    citations: List[MedOverviewCitation] = []
+    used_ids: List[int] = []
+    id_maps: Dict[str, Dict[int, int]] = {}
+
+    for m in med_list:
+        rx_cui = m["rx_cui"]
+        if rx_cui in id_maps:
+            continue
+        record = summaries[rx_cui]
+        used_local = set(record.get("used_citation_ids") or [])
+        id_map = id_maps[rx_cui] = {}
+        for c in record.get("citations") or []:
+            new_id = len(citations) + 1
+            id_map[c["id"]] = new_id
+            citations.append(MedOverviewCitation(
+                id=new_id,
+                rxCui=c.get("rx_cui"),
+                section=c.get("section"),
+                sourceUrl=c.get("source_url"),
+                snippet=c.get("snippet") or "",
+                used=c["id"] in used_local,
+            ))
+            if c["id"] in used_local:
+                used_ids.append(new_id)
+
+    per_drug = []
+    for m in med_list:
+        record = summaries[m["rx_cui"]]
+        id_map = id_maps[m["rx_cui"]]
+        per_drug.append({
+            "medication_id": m["id"],
+            "name": m["name"],
+            "rx_cui": m["rx_cui"],
+            "summary": record.get("summary") or "",
+            "used_citation_ids": [id_map[i] for i in record.get("used_citation_ids") or [] if i in id_map],
+        })
+
+    return MedListOverviewResponse(
+        overview_bullets=compose_overview_bullets(summaries, names),
+        per_drug=per_drug,
+        citations=citations,
+        used_citation_ids=used_ids,
+        context_stats=composed.get("context_stats"),
+    )
+
+
+async def build_overview(med_list: List[Dict[str, Any]]) -> MedListOverviewResponse:
+    return to_response(med_list, await compose_overview(med_list))
+
+
+def cached_overview(med_list: List[Dict[str, Any]]) -> Optional[MedListOverviewResponse]:
+    """The overview if its composed part is already memoized, without any I/O."""
+    composed = get_cached(overview_memo_key([m["rx_cui"] for m in med_list]))
+    return to_response(med_list, composed) if composed else None
+
+
+async def run_overview_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """background_job handler: recompute a user's overview from their current list."""
+    async with AsyncSessionLocal() as db:
+        med_list = await load_med_list(db, payload["user_id"])
+    overview = await build_overview(med_list) if med_list else empty_overview()
+    return {"fingerprint": med_list_fingerprint(med_list), "overview": overview.model_dump()}
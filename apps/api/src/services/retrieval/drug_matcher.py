@@ -0,0 +1,248 @@
+# apps/api/src/services/retrieval/drug_matcher.py
+# Find drug names (generic and brand) from the Drug catalog inside free text.
+#
+# - Exact matches: one Aho-Corasick automaton over every normalised name, so
+#   a label or chunk is scanned once regardless of catalog size.
+# - OCR noise: letters commonly misread as digits are folded back before
+#   matching (0->o, 1->l, 5->s, ...), and single words that still don't match
+#   are looked up in a one-edit deletion index (SymSpell-style).
+#
+# Offsets in Match refer to the original text (normalisation keeps length).
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.db.models import Drug
+from src.db.session import get_session
+
+logger = logging.getLogger(__name__)
+
+_OCR_FOLD = str.maketrans({"0": "o", "1": "l", "5": "s", "8": "b", "|": "l", "$": "s"})
+_TOKEN = re.compile(r"[a-z0-9]+")
+_REFRESH_S = 15 * 60
+
+
+@dataclass(frozen=True)
+class Match:
+    rx_cui: str
+    name: str          # canonical generic name from the catalog
+    matched: str       # the text as it appeared
+    start: int
+    end: int
+    brand: bool
+    exact: bool
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercase, fold OCR digit/letter confusions inside words that contain
+    letters, and turn everything else into spaces. Keeps the string length
+    (so offsets map back to `text`): characters whose lowercase form is
+    longer, such as "İ", are left as they are and become spaces.
+    """
+    low = "".join(c if len(c.lower()) != 1 else c.lower() for c in (text or ""))
+    out = []
+    for m in re.finditer(r"[a-z0-9|$]+|[^a-z0-9|$]+", low):
+        tok = m.group(0)
+        if re.match(r"[a-z0-9|$]", tok):
+            # only fold when the token has real letters; "500" must stay a number
+            out.append(tok.translate(_OCR_FOLD) if re.search(r"[a-z]", tok) else tok)
+        else:
+            out.append(" " * len(tok))
+    return "".join(out)
+
+
+class AhoCorasick:
+    """Minimal Aho-Corasick automaton over str keys, each mapped to a payload."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, object]]] = [[]]
+        self._built = False
+
+    def add(self, key: str, payload) -> None:
+        node = 0
+        for ch in key:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((key, payload))
+        self._built = False
+
+    def build(self) -> None:
+        queue = list(self._goto[0].values())
+        for n in queue:
+            self._fail[n] = 0
+        i = 0
+        while i < len(queue):
+            node = queue[i]
+            i += 1
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        self._built = True
+
+    def iter(self, text: str) -> Iterable[Tuple[int, int, str, object]]:
+        """Yield (start, end, key, payload) for every occurrence, overlapping included."""
+        if not self._built:
+            self.build()
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for key, payload in self._out[node]:
+                yield i - len(key) + 1, i + 1, key, payload
+
+
+def _deletes(word: str) -> Set[str]:
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def edit_distance(a: str, b: str, cap: int = 2) -> int:
+    if abs(len(a) - len(b)) > cap:
+        return cap + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class DrugMatcher:
+    def __init__(self, entries: Iterable[Tuple[str, str, str, bool]], fuzzy_min_len: int = 5):
+        """entries: (name as written, rx_cui, canonical generic name, is_brand)."""
+        self._ac = AhoCorasick()
+        self._fuzzy: Dict[str, Set[str]] = {}
+        self._words: Dict[str, Tuple[str, str, bool]] = {}
+        self.size = 0
+        for raw, rx_cui, generic, brand in entries:
+            key = " ".join(_TOKEN.findall(normalize(raw)))
+            if len(key) < 3:
+                continue
+            self._ac.add(key, (rx_cui, generic, brand))
+            self.size += 1
+            if " " not in key and len(key) >= fuzzy_min_len:
+                self._words.setdefault(key, (rx_cui, generic, brand))
+                for d in _deletes(key) | {key}:
+                    self._fuzzy.setdefault(d, set()).add(key)
+        self._ac.build()
+        self._fuzzy_min_len = fuzzy_min_len
+
+    def find(self, text: str, fuzzy: bool = True) -> List[Match]:
+        """
+        Non-overlapping drug mentions in `text`, longest exact match first,
+        then single-word fuzzy matches (edit distance 1) in the gaps.
+        """
+        norm = normalize(text)
+        # collapse runs of spaces for matching multi-word names, keeping a map back
+        squeezed, index = [], []
+        prev_space = True
+        for i, ch in enumerate(norm):
+            if ch == " ":
+                if prev_space:
+                    continue
+                prev_space = True
+            else:
+                prev_space = False
+            squeezed.append(ch)
+            index.append(i)
+        s = "".join(squeezed)
+
+        hits = []
+        for start, end, key, (rx_cui, generic, brand) in self._ac.iter(s):
+            # whole words only
+            if start > 0 and s[start - 1] != " ":
+                continue
+            if end < len(s) and s[end] != " ":
+                continue
+            o_start, o_end = index[start], index[end - 1] + 1
+            hits.append(Match(rx_cui, generic, text[o_start:o_end], o_start, o_end, brand, True))
+
+        hits.sort(key=lambda m: (-(m.end - m.start), m.start))
+        taken: List[Match] = []
+        for m in hits:
+            if all(m.end <= t.start or m.start >= t.end for t in taken):
+                taken.append(m)
+
+        if fuzzy:
+            for tok in _TOKEN.finditer(norm):
+                w = tok.group(0)
+                if len(w) < self._fuzzy_min_len or not w.isalpha():
+                    continue
+                if any(tok.start() < t.end and tok.end() > t.start for t in taken):
+                    continue
+                best = self._closest(w)
+                if best:
+                    rx_cui, generic, brand = self._words[best]
+                    taken.append(Match(rx_cui, generic, text[tok.start():tok.end()],
+                                       tok.start(), tok.end(), brand, False))
+
+        return sorted(taken, key=lambda m: m.start)
+
+    def _closest(self, word: str) -> Optional[str]:
+        cands: Set[str] = set()
+        for d in _deletes(word) | {word}:
+            cands |= self._fuzzy.get(d, set())
+        best, best_d = None, 2
+        for c in sorted(cands):
+            dist = edit_distance(word, c, cap=1)
+            if dist < best_d:
+                best, best_d = c, dist
+        return best if best_d <= 1 else None
+
+
+# ---------------- process-wide catalog matcher ----------------
+
+_MATCHER: Optional[DrugMatcher] = None
+_LOADED_AT = 0.0
+_LOCK = threading.Lock()
+
+
+def catalog_entries() -> List[Tuple[str, str, str, bool]]:
+    """DrugMatcher entries for every generic and brand name in the Drug table."""
+    entries = []
+    with get_session() as db:
+        for rx_cui, generic, brands in db.query(Drug.rx_cui, Drug.generic_name, Drug.brand_names).all():
+            if generic:
+                entries.append((generic, rx_cui, generic, False))
+            for b in brands or []:
+                if b:
+                    entries.append((b, rx_cui, generic or b, True))
+    return entries
+
+
+def get_drug_matcher() -> DrugMatcher:
+    """
+    Matcher over the whole Drug catalog, rebuilt every 15 minutes. If the
+    catalog can't be read, an empty matcher is returned (and retried later).
+    """
+    global _MATCHER, _LOADED_AT
+    with _LOCK:
+        if _MATCHER is None or time.monotonic() - _LOADED_AT > _REFRESH_S:
+            t0 = time.perf_counter()
+            try:
+                _MATCHER = DrugMatcher(catalog_entries())
+                logger.info("drug matcher: %d names in %.0f ms", _MATCHER.size, (time.perf_counter() - t0) * 1000)
+            except Exception as e:
+                logger.warning("drug matcher: could not load catalog: %s", e)
+                if _MATCHER is None:
+                    _MATCHER = DrugMatcher([])
+            _LOADED_AT = time.monotonic()
+        return _MATCHER
@@ -1,7 +1,7 @@
 # apps/api/src/services/retrieval/retrieve.py
 
-from typing import Dict, List
-from .search import top_k
+from typing import Dict, List, Optional
+from .search import top_k, top_k_async
 
 
 def retrieve_with_citations(query: str, k: int = 4) -> Dict:
@@ -17,14 +17,31 @@ def retrieve_with_citations(query: str, k: int = 4) -> Dict:
             "rx_cui": "...",
             "section": "...",
             "source_url": null,
-            "snippet": "..."
+            "snippet": "...",
+            "score": 0.83
           },
           ...
         ]
       }
     """
-    rows = top_k(query, k=k)  # each row has id, rx_cui, section, chunk_text
+    rows = top_k(query, k=k)  # each row has id, rx_cui, section, chunk_text, distance
+    return _to_citations(rows)
 
+
+async def retrieve_with_citations_async(query: str, k: int = 4) -> Dict:
+    """Async variant of retrieve_with_citations (same return shape)."""
+    rows = await top_k_async(query, k=k)
+    return _to_citations(rows)
+
+
+def _score(distance: Optional[float]) -> Optional[float]:
+    # embeddings are unit-normalised, so cosine similarity = 1 - d^2 / 2
+    if distance is None:
+        return None
+    return round(1.0 - float(distance) ** 2 / 2.0, 4)
+
+
+def _to_citations(rows: List[Dict]) -> Dict:
     citations: List[Dict] = []
     for i, r in enumerate(rows, start=1):
         citations.append({
@@ -33,6 +50,7 @@ def retrieve_with_citations(query: str, k: int = 4) -> Dict:
             "section": r.get("section"),
             "source_url": None,                       # no column yet
             "snippet": (r.get("chunk_text") or "")[:450],
+            "score": _score(r.get("distance")),
         })
 
     return {"citations": citations}
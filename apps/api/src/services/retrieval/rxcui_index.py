@@ -0,0 +1,172 @@
+# apps/api/src/services/retrieval/rxcui_index.py
+# Drug name -> RxCUI normalization.
+#
+# One dict from normalised name to RxCUI, built from the Drug catalog:
+# generic names, brand names and openFDA substance names, each also with
+# salt / dosage-form words removed ("metformin hydrochloride er tablets" ->
+# "metformin"), plus a short list of common synonyms and abbreviations.
+# Names that still don't resolve go through the DrugMatcher (exact mention
+# inside a longer phrase, or one edit away) and resolve only if that finds a
+# single RxCUI.
+#
+# Built at API startup, rebuilt after label ingest (refresh()) and every 15
+# minutes otherwise, so other processes pick up new drugs too.
+
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from src.db.models import Drug
+from src.db.session import get_session
+from .drug_matcher import DrugMatcher
+
+logger = logging.getLogger(__name__)
+
+_REFRESH_S = 15 * 60
+_WORD = re.compile(r"[a-z0-9]+")
+
+# salt, hydrate and dosage-form words that don't change the ingredient
+_STRIP_WORDS = frozenset("""
+    hydrochloride hcl dihydrochloride hydrobromide sodium potassium calcium magnesium
+    sulfate sulphate bisulfate succinate tartrate bitartrate maleate mesylate besylate
+    citrate acetate phosphate bromide chloride fumarate hyclate monohydrate dihydrate
+    trihydrate anhydrous
+    er xr sr cr dr la xl ir odt oral tablet tablets tab tabs capsule capsules cap caps
+    solution suspension injection injectable extended delayed release
+""".split())
+
+# other names -> catalog generic name
+_SYNONYMS = {
+    "paracetamol": "acetaminophen",
+    "apap": "acetaminophen",
+    "asa": "aspirin",
+    "acetylsalicylic acid": "aspirin",
+    "hctz": "hydrochlorothiazide",
+    "salbutamol": "albuterol",
+    "adrenaline": "epinephrine",
+    "noradrenaline": "norepinephrine",
+    "frusemide": "furosemide",
+    "glibenclamide": "glyburide",
+    "lignocaine": "lidocaine",
+    "pethidine": "meperidine",
+    "ciclosporin": "cyclosporine",
+    "vitamin k": "phytonadione",
+    "vitamin d3": "cholecalciferol",
+}
+
+
+def _key(name: str) -> str:
+    return " ".join(_WORD.findall((name or "").lower()))
+
+
+def _stripped(key: str) -> str:
+    words = [w for w in key.split() if w not in _STRIP_WORDS]
+    return " ".join(words) if words else key
+
+
+class RxCuiIndex:
+    def __init__(self, entries: Iterable[Tuple[str, str, bool]]):
+        """entries: (name, rx_cui, is_brand). Generic names win over brand names on collisions."""
+        self._names: Dict[str, str] = {}
+        self.rx_cuis: Set[str] = set()
+        matcher_entries = []
+        brands = []
+        for name, rx_cui, brand in entries:
+            if not name or not rx_cui:
+                continue
+            self.rx_cuis.add(rx_cui)
+            matcher_entries.append((name, rx_cui, name, brand))
+            if brand:
+                brands.append((name, rx_cui))
+            else:
+                self._add(name, rx_cui)
+        for name, rx_cui in brands:
+            self._add(name, rx_cui)
+        for alias, generic in _SYNONYMS.items():
+            rx_cui = self._names.get(generic)
+            if rx_cui:
+                self._names.setdefault(alias, rx_cui)
+        self._matcher = DrugMatcher(matcher_entries)
+        self.size = len(self._names)
+
+    def _add(self, name: str, rx_cui: str) -> None:
+        key = _key(name)
+        if len(key) < 2:
+            return
+        self._names.setdefault(key, rx_cui)
+        self._names.setdefault(_stripped(key), rx_cui)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """RxCUI for a drug name or an RxCUI already; None if unknown or ambiguous."""
+        raw = (name or "").strip()
+        if raw.lower().startswith("rxn:"):
+            raw = raw[4:]
+        if raw in self.rx_cuis:
+            return raw
+        key = _key(raw)
+        if not key:
+            return None
+        hit = self._names.get(key) or self._names.get(_stripped(key))
+        if hit:
+            return hit
+        found = {m.rx_cui for m in self._matcher.find(raw)}
+        return found.pop() if len(found) == 1 else None
+
+    def resolve_many(self, names: Iterable[str]) -> Dict[str, str]:
+        """name -> RxCUI for the names that resolve."""
+        out = {}
+        for n in names:
+            rx_cui = self.resolve(n)
+            if rx_cui:
+                out[n] = rx_cui
+        return out
+
+
+# ---------------- process-wide index ----------------
+
+_INDEX: Optional[RxCuiIndex] = None
+_LOADED_AT = 0.0
+_LOCK = threading.Lock()
+
+
+def _load_entries() -> List[Tuple[str, str, bool]]:
+    entries = []
+    with get_session() as db:
+        for rx_cui, generic, brands, extra in db.query(Drug.rx_cui, Drug.generic_name, Drug.brand_names, Drug.extra).all():
+            if generic:
+                entries.append((generic, rx_cui, False))
+            for s in (extra or {}).get("substance_name") or []:
+                entries.append((s, rx_cui, False))
+            for b in brands or []:
+                entries.append((b, rx_cui, True))
+    return entries
+
+
+def _rebuild() -> RxCuiIndex:
+    global _INDEX, _LOADED_AT
+    t0 = time.perf_counter()
+    try:
+        _INDEX = RxCuiIndex(_load_entries())
+        logger.info("rxcui index: %d names in %.0f ms", _INDEX.size, (time.perf_counter() - t0) * 1000)
+    except Exception as e:
+        logger.warning("rxcui index: could not load catalog: %s", e)
+        if _INDEX is None:
+            _INDEX = RxCuiIndex([])
+    _LOADED_AT = time.monotonic()
+    return _INDEX
+
+
+def refresh() -> RxCuiIndex:
+    """Rebuild from the Drug table now (call after ingesting drugs)."""
+    with _LOCK:
+        return _rebuild()
+
+
+def get_rxcui_index() -> RxCuiIndex:
+    """Index over the whole Drug catalog; an empty index if it can't be read (retried later)."""
+    with _LOCK:
+        if _INDEX is None or time.monotonic() - _LOADED_AT > _REFRESH_S:
+            return _rebuild()
+        return _INDEX
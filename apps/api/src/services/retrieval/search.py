@@ -4,8 +4,8 @@ from typing import List, Dict, Iterable
 from sqlalchemy import text
 from sqlalchemy.exc import ProgrammingError
 
-from ..etl.embed import embed_texts
-from ...db.session import get_session  # use same session as rest of app
+from ..etl.embed import embed_texts, embed_texts_async
+from ...db.session import get_session, AsyncSessionLocal  # use same session as rest of app
 
 
 def _vec_literal(vec: Iterable[float]) -> str:
@@ -19,39 +19,60 @@ def _vec_literal(vec: Iterable[float]) -> str:
     return "[" + ",".join(f"{float(x):.6f}" for x in vec) + "]"
 
 
+_SQL_VEC = text("""
+    SELECT id, rx_cui, section, chunk_text,
+           emb <-> CAST(:qvec AS vector) AS distance
+    FROM label_chunk
+    ORDER BY emb <-> CAST(:qvec AS vector)
+    LIMIT :k
+""")
+
+# Fallback: no emb column, just return first k chunks
+_SQL_PLAIN = text("""
+    SELECT id, rx_cui, section, chunk_text, NULL AS distance
+    FROM label_chunk
+    ORDER BY id
+    LIMIT :k
+""")
+
+
 def top_k(query: str, k: int = 5) -> List[Dict]:
     """
     Try pgvector-based similarity search on label_chunk.emb.
     If the emb column doesn't exist (or pgvector isn't set up),
     gracefully fall back to a simple non-vector query.
 
-    Returns a list of dict rows: {id, rx_cui, section, chunk_text}
+    Returns a list of dict rows: {id, rx_cui, section, chunk_text, distance}
+    (distance is the L2 distance to the query, None on the fallback path)
     """
     # embed_texts returns a list of embeddings; each can be list or np.array
     qvec = embed_texts([query])[0]
     qlit = _vec_literal(qvec)
 
-    sql_vec = text("""
-        SELECT id, rx_cui, section, chunk_text
-        FROM label_chunk
-        ORDER BY emb <-> CAST(:qvec AS vector)
-        LIMIT :k
-    """)
-
-    # Fallback: no emb column, just return first k chunks
-    sql_plain = text("""
-        SELECT id, rx_cui, section, chunk_text
-        FROM label_chunk
-        ORDER BY id
-        LIMIT :k
-    """)
-
     with get_session() as s:
         try:
-            rows = s.execute(sql_vec, {"qvec": qlit, "k": k}).mappings().all()
+            rows = s.execute(_SQL_VEC, {"qvec": qlit, "k": k}).mappings().all()
         except ProgrammingError as e:
             # Most likely: column "emb" does not exist (no vector setup yet)
             s.rollback()
-            rows = s.execute(sql_plain, {"k": k}).mappings().all()
+            rows = s.execute(_SQL_PLAIN, {"k": k}).mappings().all()
+
+        return [dict(r) for r in rows]
+
+
+async def top_k_async(query: str, k: int = 5) -> List[Dict]:
+    """
+    Same as top_k, but embeds on the dedicated embedding executor and queries
+    through the asyncpg engine so the event loop is never blocked.
+    """
+    qvec = (await embed_texts_async([query]))[0]
+    qlit = _vec_literal(qvec)
+
+    async with AsyncSessionLocal() as s:
+        try:
+            rows = (await s.execute(_SQL_VEC, {"qvec": qlit, "k": k})).mappings().all()
+        except ProgrammingError as e:
+            await s.rollback()
+            rows = (await s.execute(_SQL_PLAIN, {"k": k})).mappings().all()
 
         return [dict(r) for r in rows]
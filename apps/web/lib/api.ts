@@ -204,6 +204,8 @@ export interface ParsedPillLabel {
   directionsSummary: string | null;
   notes: string | null;
   confidence: number | null;
+  rxCui?: string | null;
+  source?: "local" | "llm" | null;
 }
 
 
@@ -215,3 +217,15 @@ export async function parsePillLabel(
     body: JSON.stringify({ ocrText }),
   }) as Promise<ParsedPillLabel>;
 }
+
+
+// Several labels in one request (e.g. onboarding); results come back in input order.
+export async function parsePillLabels(
+  ocrTexts: string[]
+): Promise<ParsedPillLabel[]> {
+  const res = (await api("/ai/parse-pill-labels", {
+    method: "POST",
+    body: JSON.stringify({ ocrTexts }),
+  })) as { results: ParsedPillLabel[] };
+  return res.results;
+}